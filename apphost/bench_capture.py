@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+"""
+Compare capture engines (CAPTURE_ENGINE=xvfb vs screencast) on one page.
+Starts a BrowserManager per engine in a child process, shows an animated
+page and samples the whole process tree (Xvfb, Chromium, x11vnc, noVNC,
+gst-launch, the manager itself) for CPU, resident memory and the frame
+rate published into the frame ring. Run inside the apphost image.
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from framering import FrameRingReader
+
+# A page that repaints continuously, so both engines have frames to deliver
+ANIMATED_PAGE = (
+    "data:text/html,<body style='margin:0;background:%23123'>"
+    "<div id=box style='width:200px;height:200px;background:%23f80'></div>"
+    "<script>let t=0;(function step(){box.style.transform="
+    "`translate(${(t+=4)%1600}px,${200+200*Math.sin(t/90)}px)`;"
+    "requestAnimationFrame(step)})()</script></body>"
+)
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def process_tree(root_pid):
+    """PIDs of root_pid and all its descendants"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+
+    pids, pending = [], [root_pid]
+    while pending:
+        pid = pending.pop()
+        pids.append(pid)
+        pending.extend(children.get(pid, []))
+    return pids
+
+
+def tree_usage(root_pid):
+    """(CPU seconds, resident bytes) summed over the process tree"""
+    cpu, rss = 0.0, 0
+    for pid in process_tree(root_pid):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{pid}/statm") as f:
+                resident = int(f.read().split()[1])
+        except OSError:
+            continue
+        cpu += (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+        rss += resident * PAGE_SIZE
+    return cpu, rss
+
+
+async def run_child():
+    """Child process: start the engine from the environment and hold it"""
+    from server import BrowserManager
+
+    manager = BrowserManager(display=os.environ.get("DISPLAY", ":99"))
+    await manager.start()
+    await manager.navigate(ANIMATED_PAGE, wait_until_load=False)
+    print(f"READY {manager.frame_ring_path}", flush=True)
+    await asyncio.to_thread(sys.stdin.read)
+    await manager.cleanup()
+
+
+def bench_engine(engine, args, directory):
+    env = dict(
+        os.environ,
+        CAPTURE_ENGINE=engine,
+        FRAME_TRANSPORT="shm",
+        FRAME_RING_PATH=os.path.join(directory, engine, "frames.ring"),
+        RESOLUTION=f"{args.width}x{args.height}",
+    )
+    child = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--child"],
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    started = time.monotonic()
+    line = child.stdout.readline()
+    if not line.startswith("READY"):
+        child.kill()
+        print(f"{engine:10s} failed to start")
+        return
+    startup = time.monotonic() - started
+    reader = FrameRingReader(line.split(maxsplit=1)[1].strip())
+
+    time.sleep(args.warmup)
+    cpu_before, _ = tree_usage(child.pid)
+    seq_before = reader.latest_seq
+    sampled_at = time.monotonic()
+    peak_rss = 0
+    while time.monotonic() - sampled_at < args.duration:
+        peak_rss = max(peak_rss, tree_usage(child.pid)[1])
+        time.sleep(0.5)
+    elapsed = time.monotonic() - sampled_at
+    cpu_after, _ = tree_usage(child.pid)
+    frames = reader.latest_seq - seq_before
+    processes = len(process_tree(child.pid))
+
+    child.stdin.close()
+    child.wait(timeout=30)
+    print(
+        f"{engine:10s} fps {frames / elapsed:5.1f}  "
+        f"cpu {(cpu_after - cpu_before) / elapsed * 100:6.1f}% of a core  "
+        f"rss {peak_rss / 1e6:7.1f} MB  processes {processes:3d}  "
+        f"startup {startup:5.1f} s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--engines", default="xvfb,screencast")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(run_child())
+        return
+
+    with tempfile.TemporaryDirectory(dir="/dev/shm") as directory:
+        for engine in args.engines.split(","):
+            bench_engine(engine, args, directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+"""
+CPU and bandwidth cost of each transport pixel format (FRAME_FORMAT).
+Runs the capture-side conversion of the apphost pipeline on synthetic
+BGRx frames (what ximagesrc produces) with gst-launch and reports CPU time
+per frame, the share of one core at the capture frame rate, and the
+transport bandwidth per source.
+"""
+
+import argparse
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from framering import frame_size
+
+FORMATS = ("RGBA", "BGRx", "I420", "NV12")
+
+
+def child_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_pipeline(fmt, args):
+    """Push args.frames BGRx frames through the conversion to fmt"""
+    caps = (
+        f"video/x-raw,format=BGRx,width={args.width},height={args.height},"
+        f"framerate={args.fps}/1"
+    )
+    pipeline_cmd = [
+        "gst-launch-1.0",
+        "-q",
+        "videotestsrc",
+        f"num-buffers={args.frames}",
+        "pattern=smpte",
+        "!",
+        caps,
+        "!",
+    ]
+    if fmt != "BGRx":
+        pipeline_cmd += ["videoconvert", "!", f"video/x-raw,format={fmt}", "!"]
+    pipeline_cmd += ["fakesink", "sync=false"]
+
+    cpu_before = child_cpu_seconds()
+    started = time.perf_counter()
+    subprocess.run(pipeline_cmd, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - started, child_cpu_seconds() - cpu_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    if not shutil.which("gst-launch-1.0"):
+        print("gst-launch-1.0 not found; run inside the apphost image")
+        return 1
+
+    # BGRx passes straight through, so it is the cost of capture alone
+    _, baseline_cpu = run_pipeline("BGRx", args)
+    print(f"{args.width}x{args.height}@{args.fps}, {args.frames} frames")
+    for fmt in FORMATS:
+        elapsed, cpu = run_pipeline(fmt, args)
+        conversion_ms = max(cpu - baseline_cpu, 0) / args.frames * 1000
+        size = frame_size(args.width, args.height, fmt)
+        print(
+            f"{fmt:5s} convert {conversion_ms:6.2f} ms/frame "
+            f"({conversion_ms * args.fps / 10:5.1f}% of a core) "
+            f"frame {size / 1e6:5.2f} MB "
+            f"bandwidth {size * args.fps / 1e6:6.1f} MB/s "
+            f"(wall {elapsed:.2f} s)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
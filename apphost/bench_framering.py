@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+"""
+Throughput and latency benchmark for the shared-memory frame ring.
+Measures raw publish throughput for 1080p RGBA frames, then runs a paced
+producer process against a reader and reports publish-to-read latency,
+zero-copy read cost and the cost of copying a frame out.
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from framering import FrameRingReader, FrameRingWriter, frame_size
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def bench_publish(path, args):
+    size = frame_size(args.width, args.height)
+    writer = FrameRingWriter(path, size, args.slots)
+    frame = os.urandom(size)
+
+    started = time.perf_counter()
+    for _ in range(args.frames):
+        writer.write(frame, args.width, args.height)
+    elapsed = time.perf_counter() - started
+    writer.close()
+
+    print(
+        f"publish   {args.frames / elapsed:8.1f} frames/s "
+        f"{args.frames * size / elapsed / 1e9:6.2f} GB/s "
+        f"({elapsed / args.frames * 1e6:.0f} us/frame)"
+    )
+
+
+def paced_producer(path, args, ready):
+    size = frame_size(args.width, args.height)
+    writer = FrameRingWriter(path, size, args.slots)
+    frame = os.urandom(size)
+    ready.set()
+    interval = 1 / args.fps
+    next_at = time.monotonic()
+    for _ in range(args.frames):
+        writer.write(frame, args.width, args.height)
+        next_at += interval
+        time.sleep(max(0, next_at - time.monotonic()))
+
+
+def bench_latency(path, args):
+    ready = multiprocessing.Event()
+    producer = multiprocessing.Process(
+        target=paced_producer, args=(path, args, ready), daemon=True
+    )
+    producer.start()
+    ready.wait(10)
+    reader = FrameRingReader(path)
+
+    latencies, read_costs, copy_costs = [], [], []
+    seq = 0
+    missed = 0
+    while seq < args.frames:
+        frame = reader.wait_for_frame(after_seq=seq, timeout=2, interval=0.0002)
+        if frame is None:
+            break
+        latencies.append((time.monotonic_ns() - frame.timestamp_ns) / 1e3)
+        missed += frame.seq - seq - 1
+        seq = frame.seq
+
+        started = time.perf_counter_ns()
+        reader.latest()
+        read_costs.append((time.perf_counter_ns() - started) / 1e3)
+
+        started = time.perf_counter_ns()
+        frame.copy()
+        copy_costs.append((time.perf_counter_ns() - started) / 1e3)
+
+    producer.join()
+
+    for label, values in (
+        ("latency", latencies),
+        ("read", read_costs),
+        ("copy", copy_costs),
+    ):
+        print(
+            f"{label:<9} p50={statistics.median(values):9.1f}us "
+            f"p99={percentile(values, 99):9.1f}us max={max(values):9.1f}us"
+        )
+    print(f"missed    {missed} of {args.frames} frames at {args.fps} fps")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument(
+        "--dir", default="/dev/shm" if os.path.isdir("/dev/shm") else None
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        print(f"{args.width}x{args.height} RGBA, {args.slots} slots in {directory}")
+        bench_publish(os.path.join(directory, "publish.ring"), args)
+        bench_latency(os.path.join(directory, "latency.ring"), args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
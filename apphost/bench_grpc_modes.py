@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+"""
+Latency comparison between the threaded gRPC bridge and the grpc.aio server.
+A simulated browser manager stands in for Playwright, so this only measures
+the serving layer: a burst of slow Navigate calls is started and GetStatus
+latency is sampled while they are in flight. Each navigation goes to its
+own page slot, so none supersedes another and all of them run at once.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import threading
+import time
+from concurrent import futures
+
+import grpc
+
+# Add current directory to import path
+sys.path.insert(0, "/app")
+
+try:
+    import server
+    from server import browser_pb2, browser_pb2_grpc
+except ImportError as e:
+    print(f"Failed to import server.py: {e}")
+    sys.exit(1)
+
+
+class SimulatedBrowserManager:
+    """Browser manager stand-in with a fixed navigation delay"""
+
+    def __init__(self, navigate_delay, slot_count=1):
+        self.navigate_delay = navigate_delay
+        self.url = "about:blank"
+        self.slot_count = slot_count
+
+    async def navigate(
+        self,
+        url,
+        timeout_ms=30000,
+        wait_until_load=True,
+        slot=0,
+        filter_profile="",
+        wait_until="",
+        settle_ms=0,
+    ):
+        await asyncio.sleep(self.navigate_delay)
+        self.url = url
+        return True, None, url, 0, 0
+
+    async def supersede(self, operation, slot=0):
+        pass
+
+    def current_url(self, slot=0):
+        return self.url
+
+    def status(self, slot=0):
+        return {
+            "browser_ready": True,
+            "page_loaded": True,
+            "current_url": self.url,
+            "streaming": False,
+            "startup_timings_ms": {},
+            "frame_transport": "udp",
+            "frame_ring_path": "",
+            "capture_mode": "full",
+            "capture_engine": "xvfb",
+            "stream": {"encoder": "none"},
+            "frame_format": "RGBA",
+            "display": {"width": 1920, "height": 1080, "device_scale_factor": 1.0},
+            "frames_captured": 0,
+            "frames_suppressed": 0,
+            "bytes_saved": 0,
+            "slot": slot,
+            "slot_count": self.slot_count,
+            "preloaded_url": "",
+            "http_cache": {"enabled": False},
+            "filter_profile": "none",
+            "filter_stats": [],
+            "superseded": {"navigation": 0, "preload": 0},
+            "snapshots": {
+                "encoded": 0,
+                "cache_hits": 0,
+                "coalesced": 0,
+                "avg_encode_ms": 0.0,
+            },
+            "scripts": {"registered": 0, "batches": 0, "calls": 0, "errors": 0},
+        }
+
+
+def start_loop():
+    """Run an event loop in a daemon thread for the lifetime of the process"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    return loop
+
+
+def start_threaded(port, manager, loop):
+    servicer = server.BrowserServiceServicer(manager, loop)
+    server_ = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=servicer.servicer.scheduler.workers)
+    )
+    browser_pb2_grpc.add_BrowserServiceServicer_to_server(servicer, server_)
+    server_.add_insecure_port(f"127.0.0.1:{port}")
+    server_.start()
+    return lambda: server_.stop(0)
+
+
+def start_aio(port, manager, loop):
+    async def start():
+        server_ = grpc.aio.server()
+        browser_pb2_grpc.add_BrowserServiceServicer_to_server(
+            server.AsyncBrowserServiceServicer(manager), server_
+        )
+        server_.add_insecure_port(f"127.0.0.1:{port}")
+        await server_.start()
+        return server_
+
+    server_ = asyncio.run_coroutine_threadsafe(start(), loop).result()
+    return lambda: asyncio.run_coroutine_threadsafe(server_.stop(0), loop).result()
+
+
+def sample_status(stub, samples):
+    """Sequential GetStatus latencies in milliseconds"""
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        stub.GetStatus(browser_pb2.GetStatusRequest(), timeout=120)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_mode(name, start_server, port, args):
+    loop = start_loop()
+    manager = SimulatedBrowserManager(args.navigate_delay, args.navigations)
+    stop = start_server(port, manager, loop)
+
+    channel = grpc.insecure_channel(f"127.0.0.1:{port}")
+    stub = browser_pb2_grpc.BrowserServiceStub(channel)
+    stub.GetStatus(browser_pb2.GetStatusRequest(), timeout=10)
+
+    idle = sample_status(stub, args.samples)
+
+    # Saturate the server with slow navigations, then sample status
+    navigations = [
+        stub.Navigate.future(
+            browser_pb2.NavigateRequest(url="about:blank", timeout_ms=30000, slot=slot),
+            timeout=120,
+        )
+        for slot in range(args.navigations)
+    ]
+    time.sleep(0.2)
+    loaded = sample_status(stub, args.samples)
+    for navigation in navigations:
+        response = navigation.result()
+        if not response.success:
+            raise RuntimeError(f"Navigate failed: {response.error}")
+
+    channel.close()
+    stop()
+
+    for label, latencies in (("idle", idle), ("loaded", loaded)):
+        print(
+            f"{name:<9} {label:<7} "
+            f"p50={statistics.median(latencies):8.2f}ms "
+            f"p99={percentile(latencies, 99):8.2f}ms "
+            f"max={max(latencies):8.2f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--navigations", type=int, default=12)
+    parser.add_argument("--navigate-delay", type=float, default=2.0)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--port", type=int, default=3900)
+    args = parser.parse_args()
+
+    print(
+        f"{args.navigations} concurrent navigations of {args.navigate_delay}s, "
+        f"{args.samples} GetStatus samples per phase"
+    )
+    run_mode("threaded", start_threaded, args.port, args)
+    run_mode("aio", start_aio, args.port + 1, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""
+Frame pumps from the capture engines into the shared-memory frame ring.
+
+gst-launch writes raw frames to a pipe (fdsink); FramePump reads each one
+straight into the next ring slot, so a frame is copied once on its way
+from GStreamer to every consumer.
+
+With suppress_unchanged the pump also drops frames identical to the last
+published one (by CRC32 of the raw capture) before any conversion. A
+suppressed frame only advances the ring's capture heartbeat, which tells
+readers to keep showing the newest frame; a full frame is still published
+every keepalive seconds.
+
+ScreencastPump is the equivalent for CAPTURE_ENGINE=screencast: it decodes
+the compressed frames Chromium pushes over CDP into ring slots.
+"""
+
+import fcntl
+import io
+import logging
+import threading
+import time
+import zlib
+
+from framering import FrameRingWriter, frame_size, plane_layout
+
+logger = logging.getLogger(__name__)
+
+# Pipe capacity requested for the capture pipe (Linux caps it at
+# /proc/sys/fs/pipe-max-size, 1 MiB by default)
+PIPE_SIZE = 1 << 20
+
+
+def enlarge_pipe(fd, size=PIPE_SIZE):
+    """Grow a pipe buffer to cut wakeups per frame; best effort"""
+    try:
+        fcntl.fcntl(fd, fcntl.F_SETPIPE_SZ, size)
+    except (AttributeError, OSError):
+        pass
+
+
+def bgrx_to_rgba(frame):
+    """Convert a BGRx frame to RGBA in place"""
+    import numpy as np
+
+    pixels = np.frombuffer(frame, dtype=np.uint8).reshape(-1, 4)
+    pixels[:, [0, 2]] = pixels[:, [2, 0]]
+    pixels[:, 3] = 255
+
+
+# In-place conversions the pump can apply, keyed by (source, output) format
+CONVERSIONS = {("BGRx", "RGBA"): bgrx_to_rgba}
+
+
+class FramePump:
+    """Copies fixed-size raw frames from a pipe into a frame ring"""
+
+    def __init__(
+        self,
+        fd,
+        ring_path,
+        width,
+        height,
+        fmt="RGBA",
+        slot_count=4,
+        source_format=None,
+        suppress_unchanged=False,
+        keepalive=1.0,
+    ):
+        self.fd = fd
+        self.width = width
+        self.height = height
+        self.format = fmt
+        self.frame_size = frame_size(width, height, fmt)
+        self.stride = plane_layout(width, height, fmt)[0][1]
+        self.convert = None
+        if source_format and source_format != fmt:
+            self.convert = CONVERSIONS[(source_format, fmt)]
+        self.suppress_unchanged = suppress_unchanged
+        self.keepalive_ns = int(keepalive * 1e9)
+        self.writer = FrameRingWriter(ring_path, self.frame_size, slot_count)
+
+        self.frames = 0  # published
+        self.frames_captured = 0
+        self.frames_suppressed = 0
+        self.bytes_saved = 0
+        self.last_checksum = None
+        self.last_publish_ns = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _read_frame(self, stream, view):
+        """Fill view from the stream; False on EOF"""
+        filled = 0
+        while filled < len(view):
+            count = stream.readinto(view[filled:])
+            if not count:
+                return False
+            filled += count
+        return True
+
+    def _unchanged(self, frame, now):
+        """True if the frame repeats the last published one and may be dropped"""
+        checksum = zlib.crc32(frame)
+        if (
+            checksum == self.last_checksum
+            and now - self.last_publish_ns < self.keepalive_ns
+        ):
+            return True
+        self.last_checksum = checksum
+        return False
+
+    def _run(self):
+        with open(self.fd, "rb", buffering=0) as stream:
+            while True:
+                seq, view = self.writer.begin()
+                frame = view[: self.frame_size]
+                if not self._read_frame(stream, frame):
+                    self.writer.abort(seq)
+                    break
+                now = time.monotonic_ns()
+                self.frames_captured += 1
+
+                if self.suppress_unchanged and self._unchanged(frame, now):
+                    self.writer.abort(seq)
+                    self.frames_suppressed += 1
+                    self.bytes_saved += self.frame_size
+                else:
+                    if self.convert:
+                        self.convert(frame)
+                    self.writer.commit(
+                        seq,
+                        self.frame_size,
+                        self.width,
+                        self.height,
+                        self.format,
+                        self.stride,
+                        timestamp_ns=now,
+                    )
+                    self.frames += 1
+                    self.last_publish_ns = now
+
+                self.writer.update_stats(
+                    self.frames_captured,
+                    self.frames_suppressed,
+                    self.bytes_saved,
+                    now,
+                )
+        logger.info(
+            f"Frame pump stopped after {self.frames_captured} frames "
+            f"({self.frames_suppressed} suppressed as unchanged)"
+        )
+
+    def stats(self):
+        return {
+            "frames_captured": self.frames_captured,
+            "frames_suppressed": self.frames_suppressed,
+            "bytes_saved": self.bytes_saved,
+        }
+
+    def stop(self, timeout=5):
+        """Wait for the pipeline EOF to end the pump, then release the ring"""
+        self.thread.join(timeout)
+        if not self.thread.is_alive():
+            self.writer.close()
+
+
+# Pillow raw packers producing each ring format from a decoded RGB image
+SCREENCAST_PACKERS = {"RGBA": "RGBX", "BGRx": "BGRX"}
+
+
+class ScreencastPump:
+    """Decodes CDP screencast frames (JPEG or PNG) into a frame ring
+
+    Chromium only sends a screencast frame when the page repaints, so every
+    frame is a change; the pump's counters mirror FramePump's with nothing
+    suppressed. publish() is called from a worker thread per frame.
+    """
+
+    def __init__(self, ring_path, width, height, fmt="RGBA", slot_count=4):
+        if fmt not in SCREENCAST_PACKERS:
+            raise ValueError(
+                f"Screencast capture supports {', '.join(SCREENCAST_PACKERS)}, "
+                f"not {fmt}"
+            )
+        self.width = width
+        self.height = height
+        self.format = fmt
+        self.writer = FrameRingWriter(
+            ring_path, frame_size(width, height, fmt), slot_count
+        )
+        self.lock = threading.Lock()
+        self.closed = False
+
+        self.frames = 0  # published
+        self.frames_captured = 0
+        self.frames_dropped = 0  # larger than the ring slots
+
+    def publish(self, data):
+        """Decode one compressed frame and publish it; returns its seq or None"""
+        from PIL import Image
+
+        image = Image.open(io.BytesIO(data))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        pixels = image.tobytes("raw", SCREENCAST_PACKERS[self.format])
+        now = time.monotonic_ns()
+
+        with self.lock:
+            if self.closed:
+                return None
+            self.frames_captured += 1
+            if len(pixels) > self.writer.slot_size:
+                self.frames_dropped += 1
+                logger.warning(
+                    f"Dropping {image.width}x{image.height} screencast frame, "
+                    f"ring holds {self.width}x{self.height}"
+                )
+                return None
+            seq = self.writer.write(
+                pixels, image.width, image.height, self.format, timestamp_ns=now
+            )
+            self.frames += 1
+            self.writer.update_stats(self.frames_captured, 0, 0, now)
+        return seq
+
+    def keepalive(self):
+        """Advance the ring heartbeat while the page is not repainting"""
+        with self.lock:
+            if not self.closed:
+                self.writer.update_stats(self.frames_captured, 0, 0)
+
+    def stats(self):
+        return {
+            "frames_captured": self.frames_captured,
+            "frames_suppressed": 0,
+            "bytes_saved": 0,
+        }
+
+    def stop(self, timeout=5):
+        with self.lock:
+            self.closed = True
+            self.writer.close()
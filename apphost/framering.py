@@ -0,0 +1,334 @@
+"""
+Shared-memory frame ring buffer between an apphost and its consumers.
+
+One producer writes raw video frames into an mmap'd file (normally in the
+apphostN-shm tmpfs volume) holding a fixed number of slots. Any number of
+readers map the same file and pick up the newest complete frame as a
+zero-copy view. The producer never waits for readers: it always writes the
+next slot, and readers detect a slot being overwritten under them through
+a per-slot seqlock.
+
+File layout (little endian):
+
+    header, HEADER_SIZE bytes
+        magic "FRNG", version, slot_count, slot_size (data bytes per slot),
+        latest_seq (newest complete frame, 0 = none), producer_pid,
+        capture counters: frames captured, frames suppressed as unchanged,
+        bytes saved by suppression, last_capture_ns
+    slot_count x slot, each SLOT_HEADER_SIZE + slot_size bytes, page aligned
+        seqlock (odd while the slot is being written), frame seq,
+        timestamp_ns (CLOCK_MONOTONIC), width, height, format (fourcc),
+        stride, size
+"""
+
+import mmap
+import os
+import struct
+import time
+
+MAGIC = b"FRNG"
+VERSION = 1
+
+HEADER_SIZE = 4096
+HEADER = struct.Struct("<4sIIIQI")
+LATEST_SEQ_OFFSET = 16
+STATS = struct.Struct("<QQQQ")
+STATS_OFFSET = 32
+
+SLOT_HEADER_SIZE = 64
+SLOT_HEADER = struct.Struct("<QQQII4sII")
+SLOT_META = struct.Struct("<QQII4sII")  # SLOT_HEADER without the seqlock
+SEQLOCK = struct.Struct("<Q")
+U64 = struct.Struct("<Q")
+
+# Bytes per pixel of the packed formats
+BYTES_PER_PIXEL = {"RGBA": 4, "BGRA": 4, "BGRx": 4, "RGBx": 4}
+# 4:2:0 formats: I420 has Y, U and V planes, NV12 Y and interleaved UV
+PLANAR_FORMATS = ("I420", "NV12")
+
+
+def _round_up(value, multiple):
+    return -(-value // multiple) * multiple
+
+
+def plane_layout(width, height, fmt="RGBA"):
+    """(offset, stride, rows) of each plane, in GStreamer's default layout"""
+    if fmt in BYTES_PER_PIXEL:
+        return [(0, width * BYTES_PER_PIXEL[fmt], height)]
+    if fmt not in PLANAR_FORMATS:
+        raise ValueError(f"Unsupported frame format: {fmt}")
+
+    luma_stride = _round_up(width, 4)
+    chroma_offset = luma_stride * _round_up(height, 2)
+    chroma_rows = _round_up(height, 2) // 2
+    if fmt == "NV12":
+        return [(0, luma_stride, height), (chroma_offset, luma_stride, chroma_rows)]
+    chroma_stride = _round_up(_round_up(width, 2) // 2, 4)
+    return [
+        (0, luma_stride, height),
+        (chroma_offset, chroma_stride, chroma_rows),
+        (chroma_offset + chroma_stride * chroma_rows, chroma_stride, chroma_rows),
+    ]
+
+
+def frame_size(width, height, fmt="RGBA"):
+    """Bytes needed for one frame of the given geometry"""
+    offset, stride, rows = plane_layout(width, height, fmt)[-1]
+    return offset + stride * rows
+
+
+def _fourcc(fmt):
+    return fmt.encode("ascii").ljust(4, b"\0")[:4]
+
+
+def _slot_stride(slot_size):
+    return -(-(SLOT_HEADER_SIZE + slot_size) // mmap.PAGESIZE) * mmap.PAGESIZE
+
+
+class FrameRingWriter:
+    """Producer side of a frame ring; never blocks on readers"""
+
+    def __init__(self, path, slot_size, slot_count=4):
+        self.path = path
+        self.slot_size = slot_size
+        self.slot_count = slot_count
+        self.slot_stride = _slot_stride(slot_size)
+        self.seq = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        length = HEADER_SIZE + slot_count * self.slot_stride
+
+        # Build the ring under a temporary name and rename it into place, so
+        # readers never map a half-initialized file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, length)
+            self.mm = mmap.mmap(fd, length)
+        finally:
+            os.close(fd)
+        HEADER.pack_into(
+            self.mm, 0, MAGIC, VERSION, slot_count, slot_size, 0, os.getpid()
+        )
+        os.replace(tmp_path, path)
+
+    def _slot_offset(self, index):
+        return HEADER_SIZE + index * self.slot_stride
+
+    def begin(self):
+        """Open the next slot for writing; returns (seq, writable data view)"""
+        seq = self.seq + 1
+        offset = self._slot_offset((seq - 1) % self.slot_count)
+        (lock,) = SEQLOCK.unpack_from(self.mm, offset)
+        SEQLOCK.pack_into(self.mm, offset, lock | 1)
+        start = offset + SLOT_HEADER_SIZE
+        return seq, memoryview(self.mm)[start : start + self.slot_size]
+
+    def commit(self, seq, size, width, height, fmt, stride=0, timestamp_ns=None):
+        """Publish the slot opened by begin() as the newest frame
+
+        stride defaults to the (first plane) stride of the default layout.
+        """
+        if not stride:
+            stride = plane_layout(width, height, fmt)[0][1]
+        offset = self._slot_offset((seq - 1) % self.slot_count)
+        SLOT_META.pack_into(
+            self.mm,
+            offset + SEQLOCK.size,
+            seq,
+            timestamp_ns if timestamp_ns is not None else time.monotonic_ns(),
+            width,
+            height,
+            _fourcc(fmt),
+            stride,
+            size,
+        )
+        (lock,) = SEQLOCK.unpack_from(self.mm, offset)
+        SEQLOCK.pack_into(self.mm, offset, lock + 1)
+        U64.pack_into(self.mm, LATEST_SEQ_OFFSET, seq)
+        self.seq = seq
+        return seq
+
+    def abort(self, seq):
+        """Release the slot opened by begin() without publishing it"""
+        offset = self._slot_offset((seq - 1) % self.slot_count)
+        SLOT_META.pack_into(self.mm, offset + SEQLOCK.size, 0, 0, 0, 0, b"\0" * 4, 0, 0)
+        (lock,) = SEQLOCK.unpack_from(self.mm, offset)
+        SEQLOCK.pack_into(self.mm, offset, lock + 1)
+
+    def update_stats(self, captured, suppressed, bytes_saved, timestamp_ns=None):
+        """Publish capture counters; last_capture_ns doubles as a heartbeat
+
+        A reader seeing last_capture_ns advance while latest_seq stays put
+        knows the producer is alive and the newest frame is still current.
+        """
+        STATS.pack_into(
+            self.mm,
+            STATS_OFFSET,
+            captured,
+            suppressed,
+            bytes_saved,
+            timestamp_ns if timestamp_ns is not None else time.monotonic_ns(),
+        )
+
+    def write(self, data, width, height, fmt="RGBA", stride=0, timestamp_ns=None):
+        """Copy one frame into the next slot and publish it"""
+        size = len(data)
+        if size > self.slot_size:
+            raise ValueError(f"Frame of {size} bytes exceeds slot of {self.slot_size}")
+        seq, view = self.begin()
+        view[:size] = data
+        return self.commit(seq, size, width, height, fmt, stride, timestamp_ns)
+
+    def close(self):
+        self.mm.close()
+
+
+class Frame:
+    """Zero-copy view of one frame in a ring slot
+
+    The view stays readable after the producer moves on; it is only
+    overwritten once the producer wraps around to the same slot, which
+    is_valid() detects.
+    """
+
+    def __init__(self, reader, offset, lock, meta):
+        self.reader = reader
+        self._offset = offset
+        self._lock = lock
+        seq, timestamp_ns, width, height, fourcc, stride, size = meta
+        self.seq = seq
+        self.timestamp_ns = timestamp_ns
+        self.width = width
+        self.height = height
+        self.format = fourcc.rstrip(b"\0").decode("ascii")
+        self.stride = stride
+        start = offset + SLOT_HEADER_SIZE
+        self.data = memoryview(reader.mm)[start : start + size]
+
+    def is_valid(self):
+        """True while the producer has not started overwriting this slot"""
+        return SEQLOCK.unpack_from(self.reader.mm, self._offset)[0] == self._lock
+
+    def array(self):
+        """The frame as a read-only numpy view (height x width x channels)
+
+        Planar frames come back flat; use planes() for those.
+        """
+        import numpy as np
+
+        pixels = np.frombuffer(self.data, dtype=np.uint8)
+        if self.format in BYTES_PER_PIXEL:
+            rows = pixels.reshape(self.height, self.stride)
+            return rows[:, : self.width * BYTES_PER_PIXEL[self.format]].reshape(
+                self.height, self.width, BYTES_PER_PIXEL[self.format]
+            )
+        return pixels
+
+    def planes(self):
+        """Read-only numpy views of each plane, cropped to the picture
+
+        Packed formats give one (height, width, channels) plane. I420 gives
+        Y, U and V; NV12 gives Y and a (rows, width / 2, 2) UV plane.
+        """
+        import numpy as np
+
+        if self.format in BYTES_PER_PIXEL:
+            return [self.array()]
+        pixels = np.frombuffer(self.data, dtype=np.uint8)
+        layout = plane_layout(self.width, self.height, self.format)
+        chroma_width = (self.width + 1) // 2
+        planes = []
+        for index, (offset, stride, rows) in enumerate(layout):
+            plane = pixels[offset : offset + stride * rows].reshape(rows, stride)
+            if index == 0:
+                planes.append(plane[:, : self.width])
+            elif self.format == "NV12":
+                planes.append(
+                    plane[:, : chroma_width * 2].reshape(rows, chroma_width, 2)
+                )
+            else:
+                planes.append(plane[:, :chroma_width])
+        return planes
+
+    def copy(self):
+        """Copy the frame out of the ring; None if it was overwritten meanwhile"""
+        data = bytes(self.data)
+        return data if self.is_valid() else None
+
+
+class FrameRingReader:
+    """Consumer side of a frame ring"""
+
+    def __init__(self, path):
+        self.path = path
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            self.inode = os.fstat(fd).st_ino
+            self.mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+
+        magic, version, slot_count, slot_size, _, pid = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.mm.close()
+            raise ValueError(f"{path} is not a version {VERSION} frame ring")
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.slot_stride = _slot_stride(slot_size)
+        self.producer_pid = pid
+
+    @property
+    def latest_seq(self):
+        return U64.unpack_from(self.mm, LATEST_SEQ_OFFSET)[0]
+
+    def stats(self):
+        """Capture counters published by the producer"""
+        captured, suppressed, bytes_saved, last_capture_ns = STATS.unpack_from(
+            self.mm, STATS_OFFSET
+        )
+        return {
+            "frames_captured": captured,
+            "frames_suppressed": suppressed,
+            "bytes_saved": bytes_saved,
+            "last_capture_ns": last_capture_ns,
+        }
+
+    def replaced(self):
+        """True if the producer has since recreated the ring file"""
+        try:
+            return os.stat(self.path).st_ino != self.inode
+        except FileNotFoundError:
+            return True
+
+    def latest(self, retries=8):
+        """Newest complete frame, or None if nothing has been published"""
+        for _ in range(retries):
+            seq = self.latest_seq
+            if seq == 0:
+                return None
+            offset = HEADER_SIZE + ((seq - 1) % self.slot_count) * self.slot_stride
+            (lock,) = SEQLOCK.unpack_from(self.mm, offset)
+            if lock & 1:
+                continue
+            meta = SLOT_META.unpack_from(self.mm, offset + SEQLOCK.size)
+            if meta[0] != seq or SEQLOCK.unpack_from(self.mm, offset)[0] != lock:
+                # The producer lapped us between reading latest_seq and the slot
+                continue
+            return Frame(self, offset, lock, meta)
+        return None
+
+    def wait_for_frame(self, after_seq=0, timeout=1.0, interval=0.001):
+        """Newest frame with seq > after_seq, or None on timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.latest_seq > after_seq:
+                frame = self.latest()
+                if frame is not None and frame.seq > after_seq:
+                    return frame
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(interval)
+
+    def close(self):
+        self.mm.close()
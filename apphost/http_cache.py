@@ -0,0 +1,510 @@
+"""
+Shared on-disk HTTP cache for apphost page loads.
+
+With HTTP_CACHE_DIR set, every browser context routes its GET requests
+through CacheRouter. Responses are stored in that directory, normally a
+volume mounted by all apphosts; bodies are content-addressed by SHA-256, so
+a bundle served under several URLs is stored once:
+
+    objects/ab/<sha256 of body>          response bodies
+    entries/cd/<sha256 of url>.json      status, headers, body hash, expiry
+                                         and validators; mtime = last use
+    locks/<3 hex digits>.lock            fetch locks, striped by URL hash
+
+Freshness follows Cache-Control (max-age, s-maxage, no-cache, no-store,
+private), Expires and the Last-Modified heuristic; stale entries are
+revalidated with If-None-Match / If-Modified-Since. Concurrent misses for
+one URL cause a single fetch: requests in this process wait for the one in
+flight, and other apphosts wait on the URL's lock and then find the stored
+response. A fetch lets go of the lock as soon as its headers show the
+response will not be stored, and nobody waits on a lock for more than
+LOCK_WAIT_SECONDS, so a slow or hung response cannot hold up the other
+URLs sharing its lock stripe. Media, streams and fetch/XHR calls, which
+are rarely storable and often long-lived, are never routed through the
+cache. The store is kept under its size budget by evicting the least
+recently used entries.
+"""
+
+import asyncio
+import email.utils
+import errno
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Statuses a shared cache may store without explicit freshness (RFC 9111)
+CACHEABLE_STATUS = (200, 203, 204, 300, 301, 404, 410)
+
+# Playwright resource types passed straight to the network: media and
+# streams are long-lived, fetch/XHR calls are API traffic and long polls
+UNCACHED_RESOURCE_TYPES = {"media", "websocket", "eventsource", "fetch", "xhr"}
+
+# Longest wait for another fetch's lock before fetching without it
+LOCK_WAIT_SECONDS = 5
+LOCK_POLL_SECONDS = 0.02
+
+# Not replayed from the cache: hop-by-hop headers, the encoding of a body
+# Playwright has already decoded, and per-client state
+DROPPED_HEADERS = {
+    "age",
+    "connection",
+    "content-encoding",
+    "content-length",
+    "keep-alive",
+    "set-cookie",
+    "transfer-encoding",
+}
+
+# The browser's own validators; the cache sends its own instead
+CONDITIONAL_HEADERS = {"if-none-match", "if-modified-since"}
+
+# Without explicit freshness, a response stays fresh for this fraction of
+# the time since it was last modified, up to a day
+HEURISTIC_FRACTION = 0.1
+HEURISTIC_MAX_SECONDS = 24 * 3600
+
+# Evict once this fraction of the budget has been stored since the last pass
+EVICT_EVERY = 0.05
+# and evict down to this fraction of it
+EVICT_TO = 0.9
+
+# Unreferenced bodies younger than this may belong to an entry being written
+ORPHAN_GRACE_SECONDS = 60
+
+
+def parse_cache_control(value):
+    """Cache-Control directives as {name: argument or ""}"""
+    directives = {}
+    for part in value.split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip().strip('"')
+    return directives
+
+
+def _http_date(value):
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers, now):
+    """Seconds a response stays fresh, or None if it must not be stored"""
+    directives = parse_cache_control(headers.get("cache-control", ""))
+    if "no-store" in directives or "private" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0
+    for name in ("s-maxage", "max-age"):
+        if name in directives:
+            try:
+                return max(0, int(directives[name]))
+            except ValueError:
+                return 0
+
+    date = _http_date(headers.get("date")) or now
+    if "expires" in headers:
+        expires = _http_date(headers["expires"])
+        return max(0, expires - date) if expires else 0
+    last_modified = _http_date(headers.get("last-modified"))
+    if last_modified:
+        return min(
+            HEURISTIC_MAX_SECONDS, max(0, date - last_modified) * HEURISTIC_FRACTION
+        )
+    return 0
+
+
+def storable_lifetime(status, headers, now):
+    """Freshness lifetime of a response the cache may store, else None"""
+    lifetime = freshness_lifetime(headers, now)
+    vary = headers.get("vary", "").strip().lower()
+    if (
+        status not in CACHEABLE_STATUS
+        or lifetime is None
+        or (lifetime == 0 and "etag" not in headers and "last-modified" not in headers)
+        or "set-cookie" in headers
+        or vary not in ("", "accept-encoding")
+    ):
+        return None
+    return lifetime
+
+
+def cacheable_request(method, url, headers, resource_type=""):
+    """Whether a request may be answered from the shared cache"""
+    return (
+        method == "GET"
+        and resource_type not in UNCACHED_RESOURCE_TYPES
+        and url.startswith(("http://", "https://"))
+        and "authorization" not in headers
+        and "range" not in headers
+    )
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class HttpCache:
+    """Content-addressed response store shared by all apphosts"""
+
+    def __init__(self, directory, max_bytes, lock_wait=LOCK_WAIT_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock_wait = lock_wait
+        for name in ("objects", "entries", "locks"):
+            os.makedirs(os.path.join(directory, name), exist_ok=True)
+        # url -> future of the fetch in flight, resolving to the response
+        # or None when it cannot be shared
+        self.inflight = {}
+        self.stored_since_evict = max_bytes  # evict on the first store
+        self.evicting = False
+        self.counters = {
+            "hits": 0,
+            "revalidated": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "stored": 0,
+            "evicted": 0,
+            "bytes_saved": 0,
+        }
+
+    def _url_hash(self, url):
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def _entry_path(self, url_hash):
+        return os.path.join(self.directory, "entries", url_hash[:2], f"{url_hash}.json")
+
+    def _body_path(self, digest):
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    def load(self, url):
+        """Stored entry for url with its body under "data", or None
+
+        Loading counts as a use for LRU eviction.
+        """
+        path = self._entry_path(self._url_hash(url))
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            with open(self._body_path(entry["body"]), "rb") as f:
+                entry["data"] = f.read()
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    def store(self, url, status, headers, body, now=None):
+        """Store a response if HTTP allows it; returns whether it was stored"""
+        now = now or time.time()
+        lifetime = storable_lifetime(status, headers, now)
+        if lifetime is None:
+            return False
+        validators = {
+            name: headers[name] for name in ("etag", "last-modified") if name in headers
+        }
+
+        digest = hashlib.sha256(body).hexdigest()
+        body_path = self._body_path(digest)
+        if not os.path.exists(body_path):
+            _write_atomic(body_path, body)
+        entry = {
+            "url": url,
+            "status": status,
+            "headers": {
+                name: value
+                for name, value in headers.items()
+                if name not in DROPPED_HEADERS
+            },
+            "body": digest,
+            "size": len(body),
+            "expires": now + lifetime,
+            "validators": validators,
+        }
+        _write_atomic(self._entry_path(self._url_hash(url)), json.dumps(entry).encode())
+        self.stored_since_evict += len(body)
+        return True
+
+    def refresh(self, url, entry, headers, now=None):
+        """Apply a 304's headers to a stored entry and write it back"""
+        now = now or time.time()
+        merged = dict(entry["headers"])
+        merged.update(
+            (name, value)
+            for name, value in headers.items()
+            if name not in DROPPED_HEADERS
+        )
+        entry = dict(entry, headers=merged)
+        entry["expires"] = now + (freshness_lifetime(merged, now) or 0)
+        for name in ("etag", "last-modified"):
+            if name in headers:
+                entry["validators"][name] = headers[name]
+        data = entry.pop("data")
+        _write_atomic(self._entry_path(self._url_hash(url)), json.dumps(entry).encode())
+        entry["data"] = data
+        return entry
+
+    def evict(self):
+        """Drop least recently used entries until the store fits its budget
+
+        Only one apphost evicts at a time; returns the entries removed.
+        """
+        lock_fd = os.open(
+            os.path.join(self.directory, "locks", "evict.lock"), os.O_RDWR | os.O_CREAT
+        )
+        try:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EACCES):
+                    return 0  # another apphost is evicting
+                raise
+
+            entries = []
+            references = {}
+            sizes = {}
+            for dirpath, _, names in os.walk(os.path.join(self.directory, "entries")):
+                for name in names:
+                    if not name.endswith(".json"):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        mtime = os.stat(path).st_mtime
+                        with open(path) as f:
+                            entry = json.load(f)
+                    except (OSError, ValueError):
+                        continue
+                    entries.append((mtime, path, entry["body"]))
+                    references[entry["body"]] = references.get(entry["body"], 0) + 1
+                    sizes[entry["body"]] = entry["size"]
+
+            now = time.time()
+            for dirpath, _, names in os.walk(os.path.join(self.directory, "objects")):
+                for name in names:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        if (
+                            name not in references
+                            and now - os.stat(path).st_mtime > ORPHAN_GRACE_SECONDS
+                        ):
+                            os.remove(path)
+                    except OSError:
+                        pass
+
+            total = sum(sizes.values())
+            evicted = 0
+            if total > self.max_bytes:
+                for _, path, digest in sorted(entries):
+                    if total <= self.max_bytes * EVICT_TO:
+                        break
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    evicted += 1
+                    references[digest] -= 1
+                    if references[digest] == 0:
+                        total -= sizes[digest]
+                        try:
+                            os.remove(self._body_path(digest))
+                        except OSError:
+                            pass
+                logger.info(
+                    f"HTTP cache evicted {evicted} entries, {total / 1e6:.1f} MB left"
+                )
+            return evicted
+        finally:
+            os.close(lock_fd)
+
+    async def _evict(self):
+        try:
+            self.counters["evicted"] += await asyncio.to_thread(self.evict)
+        except Exception as e:
+            logger.warning(f"HTTP cache eviction failed: {e}")
+        finally:
+            self.evicting = False
+
+    async def _lock(self, url_hash):
+        """Take the cross-process fetch lock of a URL
+
+        Returns its fd, or None if another fetch has held it for lock_wait
+        seconds; the caller then fetches without it.
+        """
+        fd = os.open(
+            os.path.join(self.directory, "locks", f"{url_hash[:3]}.lock"),
+            os.O_RDWR | os.O_CREAT,
+        )
+        deadline = time.monotonic() + self.lock_wait
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fd
+                except OSError as e:
+                    if e.errno not in (errno.EAGAIN, errno.EACCES):
+                        raise
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    return None
+                await asyncio.sleep(LOCK_POLL_SECONDS)
+        except BaseException:
+            os.close(fd)
+            raise
+
+    def _fresh(self, entry, now=None):
+        return entry["expires"] > (now or time.time())
+
+    def _serve(self, entry, counter):
+        self.counters[counter] += 1
+        self.counters["bytes_saved"] += entry["size"]
+        return entry["status"], entry["headers"], entry["data"]
+
+    async def get(self, url, fetch):
+        """(status, headers, body) for url, from the cache when possible
+
+        fetch(conditional_headers) performs the request and returns
+        (status, headers, read_body) with lowercase header names, where
+        read_body() returns the body.
+        """
+        entry = await asyncio.to_thread(self.load, url)
+        if entry and self._fresh(entry):
+            return self._serve(entry, "hits")
+
+        inflight = self.inflight.get(url)
+        if inflight:
+            response = await asyncio.shield(inflight)
+            if response is not None:
+                self.counters["coalesced"] += 1
+                self.counters["bytes_saved"] += len(response[2])
+                return response
+            # The response in flight was not shareable; fetch our own
+            status, headers, read_body = await fetch({})
+            self.counters["misses"] += 1
+            return status, headers, await read_body()
+
+        inflight = self.inflight[url] = asyncio.get_running_loop().create_future()
+        shared = None
+        try:
+            response, shareable = await self._fetch(url, fetch)
+            if shareable:
+                shared = response
+            return response
+        finally:
+            del self.inflight[url]
+            inflight.set_result(shared)
+
+    async def _fetch(self, url, fetch):
+        """Fetch or revalidate url under its lock; returns (response, shareable)
+
+        The lock is released early when the response will not be stored.
+        """
+        fd = await self._lock(self._url_hash(url))
+        try:
+            # Another apphost may have stored it while we waited for the lock
+            entry = await asyncio.to_thread(self.load, url)
+            if entry and self._fresh(entry):
+                return self._serve(entry, "hits"), True
+
+            conditional = {}
+            if entry:
+                validators = entry["validators"]
+                if "etag" in validators:
+                    conditional["if-none-match"] = validators["etag"]
+                if "last-modified" in validators:
+                    conditional["if-modified-since"] = validators["last-modified"]
+
+            status, headers, read_body = await fetch(conditional)
+            if status == 304 and entry:
+                entry = await asyncio.to_thread(self.refresh, url, entry, headers)
+                return self._serve(entry, "revalidated"), True
+
+            self.counters["misses"] += 1
+            if storable_lifetime(status, headers, time.time()) is None:
+                # Nothing to share; let fetches waiting on the lock go
+                if fd is not None:
+                    os.close(fd)
+                    fd = None
+                return (status, headers, await read_body()), False
+
+            body = await read_body()
+            stored = await asyncio.to_thread(self.store, url, status, headers, body)
+            if stored:
+                self.counters["stored"] += 1
+                if (
+                    self.stored_since_evict > self.max_bytes * EVICT_EVERY
+                    and not self.evicting
+                ):
+                    self.stored_since_evict = 0
+                    self.evicting = True
+                    asyncio.ensure_future(self._evict())
+            return (status, headers, body), stored
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def stats(self):
+        """Counters for GetStatus"""
+        counters = self.counters
+        served = counters["hits"] + counters["revalidated"] + counters["coalesced"]
+        requests = served + counters["misses"]
+        return {
+            "enabled": True,
+            **counters,
+            "hit_rate": served / requests if requests else 0.0,
+        }
+
+
+class CacheRouter:
+    """Playwright route handler answering GET requests through an HttpCache
+
+    Routing disables Chromium's own HTTP cache for the context; this cache
+    takes its place.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    async def handle(self, route):
+        request = route.request
+        headers = request.headers
+        if not cacheable_request(
+            request.method, request.url, headers, request.resource_type
+        ):
+            await route.fallback()
+            return
+
+        forwarded = {
+            name: value
+            for name, value in headers.items()
+            if name not in CONDITIONAL_HEADERS
+        }
+
+        async def fetch(conditional):
+            response = await route.fetch(headers={**forwarded, **conditional})
+            return response.status, response.headers, response.body
+
+        try:
+            status, response_headers, body = await self.cache.get(request.url, fetch)
+        except Exception as e:
+            logger.warning(f"HTTP cache fetch of {request.url} failed: {e}")
+            await route.fallback()
+            return
+        await route.fulfill(
+            status=status,
+            headers={
+                name: value
+                for name, value in response_headers.items()
+                if name not in DROPPED_HEADERS
+            },
+            body=body,
+        )
@@ -0,0 +1,129 @@
+"""
+Registration with the controller's apphost registry.
+
+The controller no longer has a fixed list of apphosts: each apphost sends
+ApphostRegistry.Heartbeat to CONTROLLER_ADDRESS (host:port of the
+controller's gRPC server) with its name, the address the controller should
+dial (APPHOST_ADDRESS, default <SERVICE_NAME>:<PORT>), where its frames go,
+how many page slots it has and slot 0's resolution. The first heartbeat
+registers it; later ones keep it alive at the interval the controller
+answers with. On shutdown it deregisters.
+
+Registration is off when CONTROLLER_ADDRESS is unset. A controller that is
+down or restarting is retried with backoff; the next heartbeat that gets
+through registers the apphost again.
+"""
+
+import asyncio
+import logging
+import os
+
+import grpc
+
+logger = logging.getLogger(__name__)
+
+# Heartbeat interval until the controller answers with its own
+DEFAULT_INTERVAL = 5
+
+
+class Registration:
+    """Heartbeats one apphost to the controller from the browser loop"""
+
+    def __init__(self, manager, controller_address, name, address, browser_pb2, stub):
+        self.manager = manager
+        self.controller_address = controller_address
+        self.name = name
+        self.address = address
+        self.browser_pb2 = browser_pb2
+        self.stub_class = stub
+        self.channel = None
+        self.stub = None
+        self.task = None
+        self.registered = False
+
+    @classmethod
+    def from_env(cls, manager, port, service_name, browser_pb2, browser_pb2_grpc):
+        """Registration configured by the environment, or None if disabled"""
+        controller_address = os.environ.get("CONTROLLER_ADDRESS", "")
+        if not controller_address:
+            return None
+        address = os.environ.get("APPHOST_ADDRESS", f"{service_name}:{port}")
+        return cls(
+            manager,
+            controller_address,
+            service_name,
+            address,
+            browser_pb2,
+            browser_pb2_grpc.ApphostRegistryStub,
+        )
+
+    def stream_endpoint(self):
+        """Where slot 0's frames go: udp://host:port or shm://path"""
+        manager = self.manager
+        slot = manager.slot(0)
+        if manager.frame_transport == "shm":
+            return f"shm://{slot.frame_ring_path or manager.frame_ring_base}"
+        return f"udp://{manager.stream_host}:{slot.udp_port}"
+
+    def heartbeat_request(self):
+        manager = self.manager
+        slot = manager.slot(0)
+        return self.browser_pb2.HeartbeatRequest(
+            name=self.name,
+            address=self.address,
+            stream_endpoint=self.stream_endpoint(),
+            capacity=manager.slot_count,
+            width=slot.width,
+            height=slot.height,
+            ready=manager.ready and manager.streaming,
+        )
+
+    def start(self):
+        """Start heartbeating; call on the browser loop"""
+        self.channel = grpc.aio.insecure_channel(self.controller_address)
+        self.stub = self.stub_class(self.channel)
+        self.task = asyncio.ensure_future(self._run())
+        logger.info(f"Registering as {self.address} with {self.controller_address}")
+
+    async def _run(self):
+        interval = DEFAULT_INTERVAL
+        backoff = 1
+        while True:
+            try:
+                response = await self.stub.Heartbeat(
+                    self.heartbeat_request(), timeout=interval
+                )
+            except grpc.RpcError as e:
+                if self.registered:
+                    logger.warning(f"Heartbeat to controller failed: {e.details()}")
+                self.registered = False
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            backoff = 1
+            if response.accepted:
+                if not self.registered:
+                    logger.info(f"Registered with controller as {self.name}")
+                self.registered = True
+                interval = response.interval_s or DEFAULT_INTERVAL
+            else:
+                logger.error(f"Controller rejected registration: {response.error}")
+            await asyncio.sleep(interval)
+
+    async def stop(self):
+        """Stop heartbeating and deregister; call on the browser loop"""
+        if not self.task:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        try:
+            await self.stub.Deregister(
+                self.browser_pb2.DeregisterRequest(name=self.name), timeout=2
+            )
+        except grpc.RpcError as e:
+            logger.warning(f"Deregister failed: {e.details()}")
+        await self.channel.close()
+        self.task = None
@@ -0,0 +1,175 @@
+"""
+Request-blocking profiles for apphost pages.
+
+A profile is a named set of rules (blocked domains, resource types and URL
+patterns) compiled into a RequestFilter. Each page slot routes its
+requests through its current profile and aborts those that match, so
+trackers, beacons, video ads or web fonts never cost a tile any CPU.
+Domains match themselves and every subdomain, with one set lookup per
+label; URL patterns are shell-style globs compiled into one regex.
+
+Built-in profiles, extended or overridden by the JSON file named in
+REQUEST_FILTER_PROFILES ({"name": {"block_domains": [...], "block_types":
+[...], "block_patterns": [...]}}):
+
+    none        nothing blocked (no routing at all)
+    trackers    analytics, tag managers, ad networks and beacons
+    lite        trackers, plus media, web fonts and ad-serving URLs
+"""
+
+import fnmatch
+import json
+import re
+from urllib.parse import urlsplit
+
+TRACKER_DOMAINS = (
+    "adnxs.com",
+    "adservice.google.com",
+    "amazon-adsystem.com",
+    "amplitude.com",
+    "bat.bing.com",
+    "clarity.ms",
+    "connect.facebook.net",
+    "criteo.com",
+    "doubleclick.net",
+    "fullstory.com",
+    "google-analytics.com",
+    "googleadservices.com",
+    "googlesyndication.com",
+    "googletagmanager.com",
+    "hotjar.com",
+    "mixpanel.com",
+    "moatads.com",
+    "nr-data.net",
+    "outbrain.com",
+    "quantserve.com",
+    "scorecardresearch.com",
+    "segment.io",
+    "taboola.com",
+)
+
+AD_PATTERNS = (
+    "*/ads/*",
+    "*/adserver/*",
+    "*/pagead/*",
+    "*vast*.xml*",
+)
+
+BUILTIN_PROFILES = {
+    "none": {},
+    "trackers": {
+        "block_domains": TRACKER_DOMAINS,
+        "block_types": ("ping",),  # navigator.sendBeacon and <a ping>
+    },
+    "lite": {
+        "block_domains": TRACKER_DOMAINS,
+        "block_types": ("ping", "media", "font"),
+        "block_patterns": AD_PATTERNS,
+    },
+}
+
+
+class RequestFilter:
+    """One profile's blocking rules, with counters of what it blocked"""
+
+    def __init__(self, name, block_domains=(), block_types=(), block_patterns=()):
+        self.name = name
+        self.domains = frozenset(domain.lower().strip(".") for domain in block_domains)
+        self.types = frozenset(block_types)
+        self.pattern = (
+            re.compile("|".join(fnmatch.translate(p) for p in block_patterns))
+            if block_patterns
+            else None
+        )
+        self.requests = 0
+        self.blocked = {"domain": 0, "type": 0, "pattern": 0}
+        self.navigations = 0
+        self.load_ms_total = 0
+
+    @property
+    def blocks_anything(self):
+        return bool(self.domains or self.types or self.pattern)
+
+    def match(self, url, resource_type):
+        """Why the request is blocked ("type", "domain", "pattern"), or None"""
+        if resource_type in self.types:
+            return "type"
+        if self.domains:
+            host = (urlsplit(url).hostname or "").lower()
+            while host:
+                if host in self.domains:
+                    return "domain"
+                host = host.partition(".")[2]
+        if self.pattern and self.pattern.match(url):
+            return "pattern"
+        return None
+
+    def check(self, url, resource_type):
+        """match(), counting the request"""
+        self.requests += 1
+        reason = self.match(url, resource_type)
+        if reason:
+            self.blocked[reason] += 1
+        return reason
+
+    def record_load(self, load_ms):
+        """Count a page load made under this profile"""
+        self.navigations += 1
+        self.load_ms_total += load_ms
+
+    @property
+    def avg_load_ms(self):
+        return self.load_ms_total / self.navigations if self.navigations else 0.0
+
+
+def load_profiles(path=""):
+    """RequestFilters by name: the built-ins plus those in a JSON file"""
+    profiles = dict(BUILTIN_PROFILES)
+    if path:
+        with open(path) as f:
+            profiles.update(json.load(f))
+    return {name: RequestFilter(name, **rules) for name, rules in profiles.items()}
+
+
+def filter_stats(filters):
+    """Per-profile counters for GetStatus
+
+    load_ms_saved compares a profile's average page load against the
+    unfiltered profile's, once both have loaded pages.
+    """
+    baseline = filters.get("none")
+    stats = []
+    for request_filter in filters.values():
+        saved = 0.0
+        if baseline and baseline.navigations and request_filter.navigations:
+            saved = baseline.avg_load_ms - request_filter.avg_load_ms
+        stats.append(
+            {
+                "profile": request_filter.name,
+                "requests": request_filter.requests,
+                "blocked": sum(request_filter.blocked.values()),
+                "blocked_by_reason": dict(request_filter.blocked),
+                "navigations": request_filter.navigations,
+                "avg_load_ms": request_filter.avg_load_ms,
+                "load_ms_saved": saved,
+            }
+        )
+    return stats
+
+
+async def route_request(route, request_filter):
+    """Playwright route handler body: abort blocked requests, pass the rest on
+
+    The page's own top-level document is never blocked.
+    """
+    request = route.request
+    try:
+        main_document = (
+            request.is_navigation_request() and request.frame.parent_frame is None
+        )
+    except Exception:
+        main_document = False  # e.g. service worker requests have no frame
+    if not main_document and request_filter.check(request.url, request.resource_type):
+        await route.abort("blockedbyclient")
+    else:
+        await route.fallback()
@@ -0,0 +1,208 @@
+"""
+Priority lanes for apphost RPCs.
+
+Every RPC is assigned a lane by what it costs:
+
+    read    GetStatus, GetURL and capture screenshots: answered from state
+            the apphost already holds, without awaiting Playwright or
+            queueing behind anything
+    query   Screenshot, ExecuteScript, RegisterScript, BatchExecute: touch
+            the page without changing it
+    page    Navigate, Preload, Activate and the config setters: change
+            what a slot shows; one lane per slot
+    watch   WatchStatus streams in the thread-pool server, each of which
+            holds a worker thread for as long as it is open
+
+query and page run at most `concurrency` calls at a time and queue up to
+`max_queued` more; beyond that a call is rejected at once rather than
+holding a worker thread. So slow navigations or heavy scripts can only
+delay their own lane, and a busy slot never delays another. Navigate,
+Preload and Activate cancel the slot's in-flight call they replace before
+they wait for a turn, so a newer navigation never queues behind the one it
+supersedes. watch streams never queue. With the thread-pool server the
+pool is sized to fill every lane and still leave read threads free.
+
+Each lane counts queued, running and completed calls, rejections and the
+time spent waiting for a turn.
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+# Threads kept free for the read lane in the thread-pool server
+READ_WORKERS = 4
+
+# Open WatchStatus streams the thread-pool server makes room for
+STATUS_STREAMS = 8
+
+
+class LaneFullError(RuntimeError):
+    """A lane's queue is full; the call was not started"""
+
+
+class Lane:
+    """One class of RPCs with bounded (or unbounded) concurrency"""
+
+    def __init__(self, name, concurrency=0, max_queued=0):
+        self.name = name
+        self.concurrency = concurrency  # 0 = unbounded, never waits
+        self.max_queued = max_queued
+        self.semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+        # Read-lane calls run on gRPC worker threads, the others on the loop
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    def _admit(self):
+        with self.lock:
+            if (
+                self.concurrency
+                and self.running >= self.concurrency
+                and self.queued >= self.max_queued
+            ):
+                self.rejected += 1
+                raise LaneFullError(
+                    f"{self.name} lane full: {self.running} running, "
+                    f"{self.queued} queued"
+                )
+            self.queued += 1
+
+    def _started(self, waited_ms):
+        with self.lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_ms_total += waited_ms
+            self.wait_ms_max = max(self.wait_ms_max, waited_ms)
+
+    def _finished(self):
+        with self.lock:
+            self.running -= 1
+            self.completed += 1
+
+    def call(self, function):
+        """Run a synchronous call in this lane (read lane: never waits)"""
+        self._admit()
+        self._started(0.0)
+        try:
+            return function()
+        finally:
+            self._finished()
+
+    def stream(self, iterator):
+        """Yield from iterator while holding a turn; streams never queue"""
+        self._admit()
+        self._started(0.0)
+        try:
+            yield from iterator
+        finally:
+            self._finished()
+
+    async def run(self, start, supersede=None):
+        """Await start() once the lane has room; raises LaneFullError if full
+
+        supersede, if given, is awaited once the call is admitted and before
+        it waits for a turn, to cancel the call it replaces.
+        """
+        self._admit()
+        queued_at = time.monotonic()
+        try:
+            if supersede:
+                await supersede()
+            if self.semaphore:
+                await self.semaphore.acquire()
+        except BaseException:
+            with self.lock:
+                self.queued -= 1
+            raise
+        self._started((time.monotonic() - queued_at) * 1000)
+        try:
+            return await start()
+        finally:
+            self._finished()
+            if self.semaphore:
+                self.semaphore.release()
+
+    @property
+    def capacity(self):
+        """Calls this lane can hold at once, running and queued"""
+        return self.concurrency + self.max_queued
+
+    def stats(self):
+        with self.lock:
+            started = self.running + self.completed
+            return {
+                "lane": self.name,
+                "concurrency": self.concurrency,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": self.wait_ms_total / started if started else 0.0,
+                "max_wait_ms": self.wait_ms_max,
+            }
+
+
+class Scheduler:
+    """The read, query, per-slot page and watch lanes of one apphost"""
+
+    def __init__(
+        self,
+        page_concurrency=2,
+        page_queue=8,
+        query_concurrency=2,
+        query_queue=8,
+        slot_count=1,
+        status_streams=STATUS_STREAMS,
+    ):
+        self.read = Lane("read")
+        self.query = Lane("query", query_concurrency, query_queue)
+        self.pages = [
+            Lane(f"page:{index}", page_concurrency, page_queue)
+            for index in range(slot_count)
+        ]
+        self.watch = Lane("watch", status_streams)
+
+    @classmethod
+    def from_env(cls, slot_count=1):
+        """Lanes sized by LANE_* variables and STATUS_STREAMS
+
+        Each slot's page lane defaults to two calls, room for a navigation
+        and a preload.
+        """
+        return cls(
+            page_concurrency=int(os.environ.get("LANE_PAGE_CONCURRENCY", "2")),
+            page_queue=int(os.environ.get("LANE_PAGE_QUEUE", "8")),
+            query_concurrency=int(os.environ.get("LANE_QUERY_CONCURRENCY", "2")),
+            query_queue=int(os.environ.get("LANE_QUERY_QUEUE", "8")),
+            slot_count=slot_count,
+            status_streams=int(os.environ.get("STATUS_STREAMS", str(STATUS_STREAMS))),
+        )
+
+    def page(self, slot=0):
+        """The page lane of a slot"""
+        if not 0 <= slot < len(self.pages):
+            raise ValueError(f"No page slot {slot}; this apphost has {len(self.pages)}")
+        return self.pages[slot]
+
+    @property
+    def lanes(self):
+        return (self.read, self.query, *self.pages, self.watch)
+
+    @property
+    def workers(self):
+        """Thread-pool size that fills every lane with READ_WORKERS to spare"""
+        return (
+            self.query.capacity
+            + sum(lane.capacity for lane in self.pages)
+            + self.watch.capacity
+            + READ_WORKERS
+        )
+
+    def stats(self):
+        return [lane.stats() for lane in self.lanes]
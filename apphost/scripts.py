@@ -0,0 +1,125 @@
+"""
+Registered scripts and batched script calls.
+
+ExecuteScript ships the whole script on every call and evaluates one per
+round trip. Instead, RegisterScript installs a function once and returns a
+handle; BatchExecute then runs any number of (handle, JSON args) calls in
+one page.evaluate and returns each result as JSON.
+
+A registered script is a JavaScript function expression, e.g.
+
+    (selector, text) => { document.querySelector(selector).textContent = text }
+
+It is installed on every slot's pages, current and future, as
+window.__apphostScripts[handle], through an init script per browser context
+plus one evaluate for the document already loaded. Handles are derived from
+the source, so registering the same script again returns the same handle.
+"""
+
+import hashlib
+import json
+import threading
+
+# Registered scripts an apphost keeps, to bound what every new page runs
+MAX_SCRIPTS = 256
+
+# Evaluated with [[handle, args], ...] and stop_on_error; runs the calls in
+# order, awaiting any that return promises
+BATCH_RUNNER = """
+async ([calls, stopOnError]) => {
+    const registry = window.__apphostScripts || {};
+    const results = [];
+    for (const [handle, args] of calls) {
+        const script = registry[handle];
+        if (!script) {
+            results.push({error: `Script ${handle} is not installed`, missing: true});
+        } else {
+            try {
+                const value = await script(...args);
+                results.push({value: value === undefined ? null : value});
+                continue;
+            } catch (e) {
+                results.push({error: String(e)});
+            }
+        }
+        if (stopOnError) break;
+    }
+    return results;
+}
+"""
+
+
+def script_handle(source):
+    """The handle of a script source: stable across apphosts and restarts"""
+    return "s" + hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+def install_script(handle, source):
+    """JavaScript defining a registered script in a document"""
+    return (
+        f"(window.__apphostScripts = window.__apphostScripts || {{}})"
+        f"[{json.dumps(handle)}] = ({source});"
+    )
+
+
+def parse_args(args_json):
+    """Call arguments from JSON: an array, a single value, or empty for none"""
+    if not args_json:
+        return []
+    args = json.loads(args_json)
+    return args if isinstance(args, list) else [args]
+
+
+class ScriptRegistry:
+    """Scripts registered with an apphost, by handle"""
+
+    def __init__(self, max_scripts=MAX_SCRIPTS):
+        self.max_scripts = max_scripts
+        self.scripts = {}  # handle -> (name, source)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.batches = 0
+
+    def add(self, source, name=""):
+        """Register a script; returns (handle, new)"""
+        handle = script_handle(source)
+        with self.lock:
+            if handle in self.scripts:
+                return handle, False
+            if len(self.scripts) >= self.max_scripts:
+                raise ValueError(
+                    f"At most {self.max_scripts} scripts can be registered"
+                )
+            self.scripts[handle] = (name or handle, source)
+        return handle, True
+
+    def __contains__(self, handle):
+        return handle in self.scripts
+
+    def source(self, handle):
+        return self.scripts[handle][1]
+
+    def installs(self):
+        """install_script() of every registered script"""
+        with self.lock:
+            return [
+                install_script(handle, source)
+                for handle, (_, source) in self.scripts.items()
+            ]
+
+    def record(self, results):
+        """Count a batch's calls and failures"""
+        with self.lock:
+            self.batches += 1
+            self.calls += len(results)
+            self.errors += sum(1 for result in results if "error" in result)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "registered": len(self.scripts),
+                "batches": self.batches,
+                "calls": self.calls,
+                "errors": self.errors,
+            }
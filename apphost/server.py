@@ -1,15 +1,34 @@
 import asyncio
+import base64
+import json
 import logging
 import os
 import subprocess
 import threading
 import time
 from concurrent import futures
+from contextlib import asynccontextmanager
 
 import grpc
 from grpc_health.v1 import health, health_pb2, health_pb2_grpc
 from playwright.async_api import async_playwright
 
+from capture import FramePump, ScreencastPump, enlarge_pipe
+from framering import FrameRingReader
+from http_cache import CacheRouter, HttpCache
+from registration import Registration
+from request_filter import filter_stats, load_profiles, route_request
+from scheduler import LaneFullError, Scheduler
+from scripts import BATCH_RUNNER, ScriptRegistry, install_script, parse_args
+from snapshot import FrameOverwrittenError, SnapshotEncoder
+from settle import (
+    FIRST_PAINT,
+    SAMPLE_COLUMNS,
+    frame_sample,
+    image_sample,
+    wait_until_settled,
+)
+
 # Import generated proto files (will be generated at runtime)
 try:
     import browser_pb2
@@ -34,47 +53,1380 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Seconds between WatchStatus keep-alive updates when the page is idle
+STATUS_HEARTBEAT_INTERVAL = 15
+
+# Seconds to wait for each startup stage to report ready
+STARTUP_TIMEOUT = 15
+
+# Accept the controller's keepalive pings (controller/channels.py), idle
+# channels included, rather than answering them with GOAWAY
+KEEPALIVE_OPTIONS = [
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.min_ping_interval_without_data_ms", 10000),
+]
+
+# Transport pixel formats: RGBA (legacy), BGRx (native X, no conversion),
+# I420/NV12 (12 bpp, converted once here instead of in every consumer)
+FRAME_FORMATS = ("RGBA", "BGRx", "I420", "NV12")
+
+# Resolves once the page has painted twice, i.e. what loaded is on screen
+AFTER_NEXT_PAINT = """
+new Promise(resolve =>
+    requestAnimationFrame(() => requestAnimationFrame(() => resolve(true))))
+"""
+
+# Navigate wait modes: Playwright's load states, plus settled (painted and
+# visually stable for a settle window, see settle.py)
+WAIT_MODES = ("load", "domcontentloaded", "networkidle", "settled")
+
+# Kept back from a client's deadline to send the response before it expires
+DEADLINE_MARGIN_MS = 250
+
+# Encode stage for the UDP transport: none (raw video), h264 (x264,
+# zerolatency) or jpeg (intra-only), both sent as RTP
+FRAME_ENCODERS = ("none", "h264", "jpeg")
+
+
+class SupersededError(RuntimeError):
+    """A newer request for the same slot operation replaced this one"""
+
+
+def _remaining_ms(context):
+    """ms left before the client's deadline, less a margin to respond in"""
+    remaining = context.time_remaining()
+    if remaining is None:
+        return None
+    remaining_ms = int(remaining * 1000)
+    return remaining_ms - min(DEADLINE_MARGIN_MS, remaining_ms // 4)
+
+
+def deadline_timeout_ms(context, timeout_ms, default_ms=30000):
+    """Playwright timeout for an RPC: as requested, capped by its deadline"""
+    timeout_ms = timeout_ms if timeout_ms > 0 else default_ms
+    remaining_ms = _remaining_ms(context)
+    if remaining_ms is not None:
+        timeout_ms = min(timeout_ms, remaining_ms)
+    return max(1, timeout_ms)
+
+
+def rpc_timeout(context, default=60):
+    """Seconds an RPC handler may run: until the client's deadline, if any"""
+    remaining_ms = _remaining_ms(context)
+    return default if remaining_ms is None else max(0, remaining_ms) / 1000
+
+
+def parse_resolution(value):
+    """Parse a WIDTHxHEIGHT string into (width, height)"""
+    try:
+        width, height = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"Invalid resolution {value!r}, expected WIDTHxHEIGHT")
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Invalid resolution {value!r}")
+    return width, height
+
+
+async def wait_until_ready(probe, process, timeout=STARTUP_TIMEOUT, interval=0.05):
+    """Poll an async probe until it succeeds or the process exits
+
+    Returns True once probe() does, False on timeout. Raises RuntimeError
+    if the process (None for in-process stages) dies first.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Process exited with code {process.returncode}")
+        try:
+            if await probe():
+                return True
+        except OSError:
+            pass
+        await asyncio.sleep(interval)
+    return False
+
+
+def port_probe(port, host="127.0.0.1"):
+    """Probe that succeeds once a TCP port accepts connections"""
+
+    async def probe():
+        _, writer = await asyncio.open_connection(host, port)
+        writer.close()
+        return True
+
+    return probe
+
+
+def unix_socket_probe(path):
+    """Probe that succeeds once a unix socket accepts connections"""
+
+    async def probe():
+        _, writer = await asyncio.open_unix_connection(path)
+        writer.close()
+        return True
+
+    return probe
+
+
+def output_probe(process, marker):
+    """Probe that succeeds once marker appears on the process's stdout
+
+    The output is drained on a background thread for the lifetime of the
+    process, so a chatty pipeline can never block on a full pipe.
+    """
+    seen = threading.Event()
+
+    def drain():
+        for line in iter(process.stdout.readline, b""):
+            if marker in line:
+                seen.set()
+
+    threading.Thread(target=drain, daemon=True).start()
+
+    async def probe():
+        return seen.is_set()
+
+    return probe
+
+
+class PageSlot:
+    """One independently addressed page with its own capture and output
+
+    Slots share the apphost's Chromium process and, with the xvfb engine,
+    its Xvfb screen: slot n's window sits at x = n * MAX_RESOLUTION width
+    and ximagesrc captures only that region. Each slot has its own browser
+    context, display and stream config, frame ring or UDP port, and status
+    watchers.
+    """
+
+    def __init__(self, manager, index):
+        self.manager = manager
+        self.index = index
+        self.context = None
+        self.page = None
+        self.gst_pipeline = None
+        self.frame_pump = None
+        self.frame_ring_path = ""
+        self.capture_reader = None  # for capture screenshots
+        self.screencast_session = None
+        self.screencast_keepalive = None
+        # (requested url, context, page) loaded off screen by preload()
+        self.preloaded = None
+        # In-flight navigation and preload tasks; a newer one cancels these
+        self.operations = {}
+        self.superseded = {"navigation": 0, "preload": 0}
+        self.width, self.height = manager.width, manager.height
+        self.device_scale_factor = manager.device_scale_factor
+        self.stream_config = dict(manager.default_stream_config)
+        self.request_filter = manager.request_filter(manager.default_filter)
+        # Serializes capture restarts (display and stream config changes)
+        self.capture_lock = asyncio.Lock()
+        self.streaming = False
+        self.status_watchers = set()
+        self.status_sequence = 0
+
+    @property
+    def left(self):
+        """X offset of this slot's region on the shared Xvfb screen"""
+        return self.index * self.manager.max_width
+
+    @property
+    def udp_port(self):
+        """Where this slot streams with FRAME_TRANSPORT=udp"""
+        return self.manager.stream_port + self.index
+
+    def _ring_path(self):
+        """frames.ring for slot 0, frames.<n>.ring for the others"""
+        path = self.manager.frame_ring_base
+        if self.index == 0:
+            return path
+        root, ext = os.path.splitext(path)
+        return f"{root}.{self.index}{ext}"
+
+    async def open(self):
+        """Open this slot's context and blank page"""
+        await self._new_context()
+        if self.manager.capture_engine == "xvfb" and self.manager.slot_count > 1:
+            await self._place_window()
+        await self.page.goto("about:blank")
+
+    async def close(self):
+        """Stop capture and close the context"""
+        await self._discard_preload()
+        await self._stop_capture()
+        if self.capture_reader:
+            self.capture_reader.close()
+            self.capture_reader = None
+        if self.context:
+            await self.context.close()
+            self.context = None
+            self.page = None
+
+    def _css_size(self):
+        """Viewport in CSS pixels for the current resolution and scale"""
+        return {
+            "width": round(self.width / self.device_scale_factor),
+            "height": round(self.height / self.device_scale_factor),
+        }
+
+    async def _create_page(self):
+        """A new context and page at the current display config"""
+        context = await self.manager.browser.new_context(
+            viewport=self._css_size(),
+            screen=self._css_size(),
+            device_scale_factor=self.device_scale_factor,
+        )
+        try:
+            if self.manager.cache_router:
+                await context.route("**/*", self.manager.cache_router.handle)
+            if self.request_filter.blocks_anything:
+                # Routed after the cache, so it sees requests first
+                await context.route("**/*", self._filter_route)
+            for script in self.manager.scripts.installs():
+                await context.add_init_script(script)
+            return context, await context.new_page()
+        except BaseException:
+            await context.close()
+            raise
+
+    async def _filter_route(self, route):
+        await route_request(route, self.request_filter)
+
+    async def set_request_filter(self, profile):
+        """Switch the slot's pages to a request-blocking profile"""
+        request_filter = self.manager.request_filter(profile)
+        was_routed = self.request_filter.blocks_anything
+        self.request_filter = request_filter
+        if request_filter.blocks_anything != was_routed:
+            contexts = [self.context] if self.context else []
+            if self.preloaded:
+                contexts.append(self.preloaded[1])
+            for context in contexts:
+                if request_filter.blocks_anything:
+                    await context.route("**/*", self._filter_route)
+                else:
+                    await context.unroute("**/*", self._filter_route)
+        logger.info(f"Slot {self.index} request filter: {profile}")
+        return profile
+
+    async def _new_context(self):
+        """Open the browser context and page at the current display config"""
+        self.context, self.page = await self._create_page()
+        self._watch_page(self.page)
+
+    async def _place_window(self, page=None, top=0):
+        """Move a page's window (default the visible one) onto this slot's region
+
+        top=max_height puts it just below the screen: rendered, not captured.
+        """
+        page = page or self.page
+        session = await page.context.new_cdp_session(page)
+        try:
+            window = await session.send("Browser.getWindowForTarget")
+            # Bounds can only be set on a normal (not maximized) window
+            await session.send(
+                "Browser.setWindowBounds",
+                {"windowId": window["windowId"], "bounds": {"windowState": "normal"}},
+            )
+            await session.send(
+                "Browser.setWindowBounds",
+                {
+                    "windowId": window["windowId"],
+                    "bounds": {
+                        "left": self.left,
+                        "top": top,
+                        "width": self.width,
+                        "height": self.height,
+                    },
+                },
+            )
+        finally:
+            await session.detach()
+
+    async def _resize_browser(self, scale_changed):
+        """Fit the browser window and page to the current display config"""
+        await self._place_window()
+
+        if not scale_changed:
+            await self.page.set_viewport_size(self._css_size())
+            return
+
+        # A context's device scale factor is fixed, so reopen the current
+        # page in a new context
+        url = self.page.url
+        old_context = self.context
+        await self._new_context()
+        await old_context.close()
+        if url and url != "about:blank":
+            await self.page.goto(url, wait_until="domcontentloaded")
+
+    async def _start_gstreamer(self):
+        """Start GStreamer pipeline to capture X display and output to UDP or shm"""
+        manager = self.manager
+        logger.info(f"Starting GStreamer pipeline for slot {self.index}...")
+
+        suppress_unchanged = manager.capture_mode == "damage"
+        if suppress_unchanged and manager.frame_transport != "shm":
+            logger.warning(
+                "Unchanged-frame suppression needs FRAME_TRANSPORT=shm; "
+                "only XDamage capture is enabled"
+            )
+            suppress_unchanged = False
+
+        encoder = self.stream_config["encoder"]
+        if encoder != "none" and manager.frame_transport != "udp":
+            logger.warning(
+                f"FRAME_ENCODER={encoder} applies to FRAME_TRANSPORT=udp only; "
+                "the frame ring carries raw frames"
+            )
+            encoder = "none"
+
+        # ximagesrc produces BGRx; convert at most once, here, to the
+        # transport format. With suppression and RGBA output the pump
+        # converts only the frames that changed instead.
+        capture_format = manager.frame_format
+        if suppress_unchanged and manager.frame_format == "RGBA":
+            capture_format = "BGRx"
+        if encoder != "none":
+            capture_format = "I420"  # what x264enc and jpegenc consume
+
+        # GStreamer pipeline for X display capture:
+        # ximagesrc captures the X display, with damage tracking disabled
+        # unless CAPTURE_MODE=damage (then only damaged regions are re-read)
+        # videoconvert ensures proper format for streaming
+        pipeline_cmd = [
+            "gst-launch-1.0",
+            "-e",  # exit on error
+            "ximagesrc",
+            f"display-name={manager.display}",
+            f"use-damage={'true' if manager.capture_mode == 'damage' else 'false'}",
+            "show-pointer=false",  # don't show mouse cursor in stream
+        ]
+        if manager.slot_count > 1:
+            # Only this slot's region of the shared screen (end is inclusive)
+            pipeline_cmd += [
+                f"startx={self.left}",
+                "starty=0",
+                f"endx={self.left + self.width - 1}",
+                f"endy={self.height - 1}",
+            ]
+        pipeline_cmd.append("!")
+        if capture_format == "BGRx":
+            # Native X frames, no colorspace conversion
+            pipeline_cmd += [
+                f"video/x-raw,format=BGRx,framerate=30/1,width={self.width},height={self.height}",
+                "!",
+            ]
+        else:
+            pipeline_cmd += [
+                f"video/x-raw,framerate=30/1,width={self.width},height={self.height}",  # 30fps for stable streaming
+                "!",
+                "videoconvert",
+                "!",
+                f"video/x-raw,format={capture_format},width={self.width},height={self.height}",
+                "!",
+            ]
+        pass_fds = ()
+
+        if manager.frame_transport == "shm":
+            # Raw frames go through a pipe into the frame ring; the leaky
+            # queue drops frames rather than stall capture if the pump lags
+            read_fd, write_fd = os.pipe()
+            enlarge_pipe(write_fd)
+            pipeline_cmd += [
+                "queue",
+                "leaky=downstream",
+                "max-size-buffers=1",
+                "!",
+                "fdsink",
+                f"fd={write_fd}",
+                "sync=false",
+            ]
+            pass_fds = (write_fd,)
+            self.frame_ring_path = self._ring_path()
+            self.frame_pump = FramePump(
+                read_fd,
+                self.frame_ring_path,
+                self.width,
+                self.height,
+                manager.frame_format,
+                int(os.environ.get("FRAME_RING_SLOTS", "4")),
+                source_format=capture_format,
+                suppress_unchanged=suppress_unchanged,
+                keepalive=float(os.environ.get("CAPTURE_KEEPALIVE", "1.0")),
+            )
+            logger.info(f"Frame ring: {self.frame_ring_path}")
+        else:
+            # rtp provides low latency UDP streaming to the tiler
+            pipeline_cmd.insert(2, "-v")  # print caps, used to detect the first buffer
+            pipeline_cmd += self._encoder_stage(encoder)
+            pipeline_cmd += [
+                "udpsink",
+                f"host={manager.stream_host}",
+                f"port={self.udp_port}",
+                "sync=false",  # no sync for low latency
+                "buffer-size=0",  # minimal buffering
+            ]
+            logger.info(
+                f"UDP streaming ({encoder}) to: {manager.stream_host}:{self.udp_port}"
+            )
+
+        logger.info(f"GStreamer pipeline: {' '.join(pipeline_cmd)}")
+
+        # Start pipeline in background
+        self.gst_pipeline = subprocess.Popen(
+            pipeline_cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            pass_fds=pass_fds,
+        )
+
+        if self.frame_pump:
+            os.close(write_fd)
+            self.frame_pump.start()
+
+            async def first_buffer_probe():
+                return self.frame_pump.frames > 0
+
+        else:
+            # Caps reach the sink with the first buffer
+            first_buffer_probe = output_probe(
+                self.gst_pipeline, b"GstUDPSink:udpsink0.GstPad:sink: caps"
+            )
+
+        try:
+            first_buffer = await wait_until_ready(first_buffer_probe, self.gst_pipeline)
+        except RuntimeError:
+            logger.error(f"GStreamer pipeline failed to start")
+            raise RuntimeError(
+                f"Failed to start GStreamer pipeline for X display capture"
+            )
+
+        self.streaming = True
+        if first_buffer:
+            logger.info(
+                "GStreamer pipeline started successfully - X display capture active"
+            )
+        else:
+            logger.warning("GStreamer pipeline running but no buffer seen yet")
+
+    def _encoder_stage(self, encoder):
+        """Pipeline elements that encode and RTP-packetize, or [] for raw"""
+        config = self.stream_config
+        if encoder == "h264":
+            return [
+                "x264enc",
+                "tune=zerolatency",
+                f"speed-preset={config['preset']}",
+                f"bitrate={config['bitrate_kbps']}",
+                f"key-int-max={config['gop']}",
+                "!",
+                "rtph264pay",
+                "config-interval=1",  # SPS/PPS with every keyframe
+                "pt=96",
+                "!",
+            ]
+        if encoder == "jpeg":
+            return [
+                "jpegenc",
+                f"quality={config['quality']}",
+                "!",
+                "rtpjpegpay",
+                "!",
+            ]
+        return []
+
+    async def set_stream_config(
+        self, encoder="", bitrate_kbps=0, gop=0, preset="", quality=0
+    ):
+        """Change the encode stage; empty or zero arguments keep the current value
+
+        The capture pipeline is restarted to apply it.
+        """
+        config = dict(self.stream_config)
+        for key, value in (
+            ("encoder", encoder.lower()),
+            ("bitrate_kbps", bitrate_kbps),
+            ("gop", gop),
+            ("preset", preset),
+            ("quality", quality),
+        ):
+            if value:
+                config[key] = value
+        if config["encoder"] not in FRAME_ENCODERS:
+            raise ValueError(
+                f"Encoder must be one of {', '.join(FRAME_ENCODERS)}, "
+                f"not {config['encoder']!r}"
+            )
+        if config["bitrate_kbps"] < 0 or config["gop"] < 0:
+            raise ValueError("Bitrate and GOP must be positive")
+        if not 1 <= config["quality"] <= 100:
+            raise ValueError("JPEG quality must be between 1 and 100")
+
+        async with self.capture_lock:
+            if config == self.stream_config:
+                return dict(config)
+            logger.info(
+                f"Slot {self.index} stream config {self.stream_config} -> {config}"
+            )
+            self.stream_config = config
+            if self.streaming and self.manager.capture_engine == "xvfb":
+                await self._stop_capture()
+                await self._start_capture()
+            self._publish_status("stream")
+            return dict(config)
+
+    async def _start_screencast(self):
+        """Stream page repaints over CDP Page.startScreencast into the frame ring"""
+        self.frame_ring_path = self._ring_path()
+        pump = self.frame_pump = ScreencastPump(
+            self.frame_ring_path,
+            self.width,
+            self.height,
+            self.manager.frame_format,
+            int(os.environ.get("FRAME_RING_SLOTS", "4")),
+        )
+        await self._attach_screencast()
+        self.screencast_keepalive = asyncio.ensure_future(
+            self._screencast_keepalive(pump)
+        )
+        logger.info(f"Screencast capture to frame ring: {self.frame_ring_path}")
+
+        async def first_frame_probe():
+            return pump.frames > 0
+
+        self.streaming = True
+        if await wait_until_ready(first_frame_probe, None):
+            logger.info("Screencast capture active")
+        else:
+            logger.warning("Screencast running but no frame seen yet")
+
+    async def _attach_screencast(self):
+        """Start screencasting the visible page into the current pump"""
+        pump = self.frame_pump
+        session = self.screencast_session = await self.context.new_cdp_session(
+            self.page
+        )
+
+        async def on_frame(params):
+            try:
+                await asyncio.to_thread(pump.publish, base64.b64decode(params["data"]))
+            except Exception as e:
+                logger.error(f"Screencast frame dropped: {e}")
+            finally:
+                # Chromium sends the next frame only once this one is acked,
+                # so a slow decode paces capture instead of queueing frames
+                try:
+                    await session.send(
+                        "Page.screencastFrameAck", {"sessionId": params["sessionId"]}
+                    )
+                except Exception:
+                    pass  # screencast stopped meanwhile
+
+        session.on(
+            "Page.screencastFrame",
+            lambda params: asyncio.ensure_future(on_frame(params)),
+        )
+        await session.send(
+            "Page.startScreencast",
+            {
+                "format": os.environ.get("SCREENCAST_FORMAT", "jpeg"),
+                "quality": int(os.environ.get("SCREENCAST_QUALITY", "80")),
+                "maxWidth": self.width,
+                "maxHeight": self.height,
+                "everyNthFrame": 1,
+            },
+        )
+
+    async def _detach_screencast(self):
+        """Stop screencasting the visible page, keeping the pump"""
+        if self.screencast_session:
+            try:
+                await self.screencast_session.send("Page.stopScreencast")
+                await self.screencast_session.detach()
+            except Exception as e:
+                logger.warning(f"Stopping screencast: {e}")
+            self.screencast_session = None
+
+    async def _screencast_keepalive(self, pump):
+        """Screencast frames only follow repaints; keep the ring heartbeat going"""
+        interval = float(os.environ.get("CAPTURE_KEEPALIVE", "1.0"))
+        while True:
+            await asyncio.sleep(interval)
+            pump.keepalive()
+
+    async def _stop_screencast(self):
+        """Stop the CDP screencast and release the frame ring"""
+        self.streaming = False
+        if self.screencast_keepalive:
+            self.screencast_keepalive.cancel()
+            self.screencast_keepalive = None
+        await self._detach_screencast()
+        if self.frame_pump:
+            self.frame_pump.stop()
+            self.frame_pump = None
+
+    async def _start_capture(self):
+        if self.manager.capture_engine == "screencast":
+            await self._start_screencast()
+        else:
+            await self._start_gstreamer()
+
+    async def _stop_capture(self):
+        if self.manager.capture_engine == "screencast":
+            await self._stop_screencast()
+        else:
+            await self._stop_gstreamer()
+
+    async def _stop_gstreamer(self):
+        """Stop the capture pipeline and the frame pump"""
+        self.streaming = False
+        if self.gst_pipeline:
+            self.gst_pipeline.terminate()
+            await asyncio.to_thread(self.gst_pipeline.wait)
+            self.gst_pipeline = None
+            logger.info(f"GStreamer pipeline for slot {self.index} stopped")
+
+        if self.frame_pump:
+            await asyncio.to_thread(self.frame_pump.stop)
+            self.frame_pump = None
+
+    async def set_display_config(self, width, height, device_scale_factor=0):
+        """Render and capture at a new resolution, e.g. the wall tile size
+
+        With a single slot Xvfb (if any) is resized through RANDR; with
+        several only this slot's capture region changes. The browser window
+        and viewport are refitted, and capture is restarted at the new size
+        (with FRAME_TRANSPORT=shm a new ring is created, which readers pick
+        up through FrameRingReader.replaced()).
+        """
+        manager = self.manager
+        device_scale_factor = device_scale_factor or self.device_scale_factor
+        if width > manager.max_width or height > manager.max_height:
+            raise ValueError(
+                f"{width}x{height} exceeds MAX_RESOLUTION "
+                f"{manager.max_width}x{manager.max_height}"
+            )
+        if width <= 0 or height <= 0 or device_scale_factor <= 0:
+            raise ValueError(
+                f"Invalid display config {width}x{height}@{device_scale_factor}"
+            )
+
+        async with self.capture_lock:
+            # A staged page was laid out for the old size
+            await self._discard_preload()
+            if (width, height, device_scale_factor) == (
+                self.width,
+                self.height,
+                self.device_scale_factor,
+            ):
+                return self.display_config()
+
+            logger.info(
+                f"Slot {self.index} display config {self.width}x{self.height}@"
+                f"{self.device_scale_factor} -> {width}x{height}@{device_scale_factor}"
+            )
+            scale_changed = device_scale_factor != self.device_scale_factor
+            restart_capture = self.streaming
+            if restart_capture:
+                await self._stop_capture()
+
+            if manager.capture_engine == "xvfb" and manager.slot_count == 1:
+                await manager._resize_display(width, height)
+            self.width, self.height = width, height
+            self.device_scale_factor = device_scale_factor
+            if self.page:
+                await self._resize_browser(scale_changed)
+
+            if restart_capture:
+                await self._start_capture()
+            self._publish_status("display")
+            return self.display_config()
+
+    def display_config(self):
+        """Current resolution and device scale factor"""
+        return {
+            "width": self.width,
+            "height": self.height,
+            "device_scale_factor": self.device_scale_factor,
+        }
+
+    async def _latest(self, operation, start):
+        """Run start() as the slot's only operation of its kind; latest wins
+
+        A newer call for the same operation cancels this one, which raises
+        SupersededError, and starts once this one has unwound. Cancelling
+        the caller (a client that gave up) cancels the work with it.
+        """
+        previous = self.operations.get(operation)
+        if previous:
+            previous.cancel()
+
+        async def run():
+            if previous:
+                await asyncio.wait({previous})
+            return await start()
+
+        task = self.operations[operation] = asyncio.ensure_future(run())
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if self.operations.get(operation) is not task:
+                self.superseded[operation] += 1
+                raise SupersededError(f"Superseded by a newer {operation}") from None
+            raise
+        finally:
+            if self.operations.get(operation) is task:
+                del self.operations[operation]
+
+    async def _supersede(self, operation):
+        """Cancel the in-flight operation, if any, and wait for it to unwind"""
+        task = self.operations.pop(operation, None)
+        if task:
+            task.cancel()
+            await asyncio.wait({task})
+
+    async def navigate(
+        self,
+        url,
+        timeout_ms=30000,
+        wait_until_load=True,
+        filter_profile="",
+        wait_until="",
+        settle_ms=0,
+    ):
+        """Navigate to a URL; a newer navigation of the slot cancels this one
+
+        Returns (success, error, final_url, first_paint_ms, settled_ms),
+        see _navigate().
+        """
+        try:
+            return await self._latest(
+                "navigation",
+                lambda: self._navigate(
+                    url,
+                    timeout_ms,
+                    wait_until_load,
+                    filter_profile,
+                    wait_until,
+                    settle_ms,
+                ),
+            )
+        except SupersededError as e:
+            logger.info(f"Slot {self.index} navigation to {url} superseded")
+            return False, str(e), None, 0, 0
+
+    async def _navigate(
+        self,
+        url,
+        timeout_ms=30000,
+        wait_until_load=True,
+        filter_profile="",
+        wait_until="",
+        settle_ms=0,
+    ):
+        """Navigate to a URL, first switching request filter if one is given
+
+        wait_until is one of WAIT_MODES; empty picks networkidle or
+        domcontentloaded by wait_until_load. Returns (success, error,
+        final_url, first_paint_ms, settled_ms): first paint as the page
+        recorded it, and with wait_until=settled when the screen last
+        changed before staying unchanged for settle_ms (0 if it never
+        settled within the timeout). Both are ms since navigation start.
+        """
+        if not self.page:
+            raise RuntimeError("Browser not initialized")
+        wait_until = wait_until or (
+            "networkidle" if wait_until_load else "domcontentloaded"
+        )
+        if wait_until not in WAIT_MODES:
+            raise ValueError(
+                f"wait_until must be one of {', '.join(WAIT_MODES)}, "
+                f"not {wait_until!r}"
+            )
+        if filter_profile:
+            await self.set_request_filter(filter_profile)
+
+        logger.info(f"Slot {self.index} navigating to: {url}")
+
+        try:
+            request_filter = self.request_filter
+            started = time.monotonic()
+            deadline = started + timeout_ms / 1000
+            settling = wait_until == "settled"
+            await self.page.goto(
+                url,
+                timeout=timeout_ms,
+                wait_until="domcontentloaded" if settling else wait_until,
+            )
+            request_filter.record_load(round((time.monotonic() - started) * 1000))
+            first_paint_ms = await self._first_paint(wait=settling, deadline=deadline)
+
+            settled_ms = 0
+            if settling:
+                async with self._settle_sampler() as sample:
+                    settled_at = await wait_until_settled(
+                        sample,
+                        settle_ms or self.manager.settle_ms,
+                        deadline,
+                        self.manager.settle_threshold,
+                    )
+                if settled_at is None:
+                    logger.warning(f"{url} still changing after {timeout_ms} ms")
+                else:
+                    settled_ms = round((settled_at - started) * 1000)
+
+            final_url = self.page.url
+            logger.info(
+                f"Navigation complete: {final_url} (first paint {first_paint_ms} ms"
+                + (f", settled {settled_ms} ms)" if settling else ")")
+            )
+            return True, None, final_url, first_paint_ms, settled_ms
+        except Exception as e:
+            logger.error(f"Navigation failed: {e}")
+            return False, str(e), None, 0, 0
+
+    async def _first_paint(self, wait, deadline):
+        """The page's first paint in ms since navigation start, 0 if none
+
+        With wait, waits (until deadline) for the page to paint or to
+        finish loading without painting anything.
+        """
+        try:
+            first_paint = await asyncio.wait_for(
+                self.page.evaluate(FIRST_PAINT, wait),
+                timeout=max(0.0, deadline - time.monotonic()) if wait else None,
+            )
+        except Exception as e:
+            # Timed out, or the page navigated on by itself meanwhile
+            logger.debug(f"No first paint for slot {self.index}: {e}")
+            return 0
+        return round(first_paint or 0)
+
+    @asynccontextmanager
+    async def _settle_sampler(self):
+        """Async callable sampling what the slot shows, for settle waits
+
+        Reads the slot's frame ring when it publishes one, so settling is
+        judged on the frames consumers get; otherwise takes downscaled CDP
+        screenshots of the page.
+        """
+        if self.frame_pump and self.frame_ring_path:
+            reader = FrameRingReader(self.frame_ring_path)
+
+            async def sample():
+                frame = reader.latest()
+                return frame_sample(frame) if frame else None
+
+            try:
+                yield sample
+            finally:
+                reader.close()
+            return
+
+        session = await self.page.context.new_cdp_session(self.page)
+        css = self._css_size()
+        clip = {
+            "x": 0,
+            "y": 0,
+            "width": css["width"],
+            "height": css["height"],
+            "scale": min(1.0, SAMPLE_COLUMNS / css["width"]),
+        }
+
+        async def sample():
+            result = await session.send(
+                "Page.captureScreenshot", {"format": "png", "clip": clip}
+            )
+            return image_sample(base64.b64decode(result["data"]))
+
+        try:
+            yield sample
+        finally:
+            await session.detach()
+
+    async def preload(self, url, timeout_ms=30000, wait_until_load=True):
+        """Load a URL in a hidden page for activate() to swap in
+
+        The page gets its own context at the slot's display config and, with
+        the xvfb engine, a window below the captured screen. It is staged
+        once loaded and painted; a newer preload cancels this one.
+        Returns (success, error, final_url, load_ms).
+        """
+        if not self.page:
+            raise RuntimeError("Browser not initialized")
+        try:
+            return await self._latest(
+                "preload", lambda: self._preload(url, timeout_ms, wait_until_load)
+            )
+        except SupersededError as e:
+            logger.info(f"Slot {self.index} preload of {url} superseded")
+            return False, str(e), None, 0
+
+    async def _preload(self, url, timeout_ms, wait_until_load):
+        await self._discard_preload()
+        logger.info(f"Slot {self.index} preloading: {url}")
+
+        started = time.monotonic()
+        context, page = await self._create_page()
+        try:
+            if self.manager.capture_engine == "xvfb":
+                await self._place_window(page, top=self.manager.max_height)
+            wait_until = "networkidle" if wait_until_load else "domcontentloaded"
+            request_filter = self.request_filter
+            load_started = time.monotonic()
+            await page.goto(url, timeout=timeout_ms, wait_until=wait_until)
+            request_filter.record_load(round((time.monotonic() - load_started) * 1000))
+            await page.evaluate(AFTER_NEXT_PAINT)
+        except asyncio.CancelledError:
+            await context.close()
+            raise
+        except Exception as e:
+            await context.close()
+            logger.error(f"Preload failed: {e}")
+            return False, str(e), None, 0
+
+        self.preloaded = (url, context, page)
+        load_ms = round((time.monotonic() - started) * 1000)
+        logger.info(f"Preloaded {page.url} in {load_ms} ms")
+        return True, None, page.url, load_ms
+
+    async def activate(self, url=""):
+        """Swap the preloaded page in for the visible one; returns its URL
+
+        The staged window is moved over the visible one (or the screencast
+        moved to it) and the old context closed in one step, so capture
+        goes from the last frame of the old page to the first of the new.
+        url, if given, must match the preloaded URL. A navigation of the
+        visible page still in flight is cancelled. If the swap fails, the
+        old page stays visible and the preload stays staged.
+        """
+        await self._supersede("navigation")
+        async with self.capture_lock:
+            if not self.preloaded:
+                raise RuntimeError("No page preloaded")
+            requested_url, context, page = self.preloaded
+            if url and url not in (requested_url, page.url):
+                raise RuntimeError(f"Preloaded page is {requested_url}, not {url}")
+
+            old_context, old_page = self.context, self.page
+            screencasting = self.screencast_session is not None
+            try:
+                if screencasting:
+                    await self._detach_screencast()
+                elif self.manager.capture_engine == "xvfb":
+                    # Mapped last, so it is already stacked above the old window
+                    await self._place_window(page)
+                    await page.bring_to_front()
+                self.context, self.page = context, page
+                if screencasting:
+                    await self._attach_screencast()
+            except BaseException:
+                self.context, self.page = old_context, old_page
+                await self._restore_visible(page, screencasting)
+                raise
+            self.preloaded = None
+            self._watch_page(page)
+            await old_context.close()
+
+            logger.info(f"Slot {self.index} activated: {page.url}")
+            self._publish_status("activate")
+            return page.url
+
+    async def _restore_visible(self, staged_page, screencasting):
+        """Put the old page back on screen after a failed activate"""
+        try:
+            if screencasting:
+                await self._detach_screencast()
+                await self._attach_screencast()
+            elif self.manager.capture_engine == "xvfb":
+                await self._place_window(staged_page, top=self.manager.max_height)
+                await self.page.bring_to_front()
+        except Exception as e:
+            logger.error(f"Slot {self.index} could not restore its page: {e}")
+
+    async def _discard_preload(self):
+        """Close the staged page, if any"""
+        if self.preloaded:
+            _, context, _ = self.preloaded
+            self.preloaded = None
+            await context.close()
+
+    def current_url(self):
+        """The page's URL as Playwright last reported it; no round trip"""
+        if not self.page:
+            return "about:blank"
+        return self.page.url
+
+    async def get_url(self):
+        """Get current URL"""
+        return self.current_url()
+
+    async def screenshot(self, format="png", quality=None):
+        """Take screenshot"""
+        if not self.page:
+            raise RuntimeError("Browser not initialized")
+
+        options = {"type": format}
+        if format == "jpeg" and quality:
+            options["quality"] = quality
+
+        data = await self.page.screenshot(**options)
+        return data
+
+    def _capture_ring(self):
+        """Reader of the slot's frame ring, reopened if it was recreated"""
+        if not (self.frame_pump and self.frame_ring_path):
+            raise RuntimeError(
+                "Capture screenshots need a frame ring (FRAME_TRANSPORT=shm)"
+            )
+        reader = self.capture_reader
+        if reader and (reader.path != self.frame_ring_path or reader.replaced()):
+            reader.close()
+            reader = None
+        if reader is None:
+            reader = self.capture_reader = FrameRingReader(self.frame_ring_path)
+        return reader
+
+    async def capture_screenshot(self, format="png", quality=None, max_width=0):
+        """Encode the newest captured frame, without touching the page
+
+        Returns (data, width, height, frame_seq, cached); see snapshot.py.
+        """
+        reader = self._capture_ring()
+        for _ in range(3):
+            frame = reader.latest()
+            if frame is None:
+                raise RuntimeError("Nothing captured yet")
+
+            def copy_frame():
+                data = frame.copy()
+                if data is None:
+                    raise FrameOverwrittenError(f"Frame {frame.seq} overwritten")
+                return data, frame.width, frame.height, frame.format, frame.stride
+
+            try:
+                data, width, height, cached = await self.manager.snapshots.encode(
+                    (reader.path, reader.inode, frame.seq),
+                    copy_frame,
+                    format,
+                    quality,
+                    max_width,
+                )
+            except FrameOverwrittenError:
+                continue
+            return data, width, height, frame.seq, cached
+        raise RuntimeError("Capture overwrote the newest frame while copying it")
+
+    async def execute_script(self, script):
+        """Execute JavaScript"""
+        if not self.page:
+            raise RuntimeError("Browser not initialized")
+
+        try:
+            result = await self.page.evaluate(script)
+            return str(result), None
+        except Exception as e:
+            logger.error(f"Script execution failed: {e}")
+            return None, str(e)
+
+    async def install_script(self, handle, source):
+        """Define a registered script in the slot's pages, present and future"""
+        script = install_script(handle, source)
+        pages = [(self.context, self.page)] if self.context else []
+        if self.preloaded:
+            pages.append(self.preloaded[1:])
+        for context, page in pages:
+            await context.add_init_script(script)
+            await page.evaluate(script)
+
+    async def batch_execute(self, calls, stop_on_error=False):
+        """Run registered scripts in one evaluate
+
+        calls is a list of (handle, args). Returns a list of {"value": ...}
+        or {"error": ...}, one per call run; a call whose script the page
+        has not got yet (registered while it was loading) is installed and
+        the batch run once more.
+        """
+        if not self.page:
+            raise RuntimeError("Browser not initialized")
+        scripts = self.manager.scripts
+        for handle, _ in calls:
+            if handle not in scripts:
+                raise ValueError(f"Unknown script handle {handle!r}")
+        page = self.page
+        results = await page.evaluate(BATCH_RUNNER, [calls, stop_on_error])
+        missing = {calls[i][0] for i, r in enumerate(results) if r.get("missing")}
+        if missing:
+            for handle in missing:
+                await page.evaluate(install_script(handle, scripts.source(handle)))
+            results = await page.evaluate(BATCH_RUNNER, [calls, stop_on_error])
+        scripts.record(results)
+        return results
+
+    def _watch_page(self, page):
+        """Publish main-frame navigations and load events to status watchers"""
+        page.on(
+            "framenavigated",
+            lambda frame: (
+                self._publish_status("framenavigated")
+                if frame == page.main_frame
+                else None
+            ),
+        )
+        page.on("load", lambda _: self._publish_status("load"))
+
+    def _status_update(self, event):
+        """Snapshot of the page state for WatchStatus"""
+        return {
+            "event": event,
+            "url": self.page.url if self.page else "about:blank",
+            "browser_ready": self.manager.ready,
+            "streaming": self.streaming,
+            "sequence": self.status_sequence,
+            "timestamp_ms": int(time.time() * 1000),
+            "slot": self.index,
+        }
+
+    def _publish_status(self, event):
+        """Push a status update to every watcher, dropping the oldest if full"""
+        self.status_sequence += 1
+        update = self._status_update(event)
+        for watcher in self.status_watchers:
+            if watcher.full():
+                watcher.get_nowait()
+            watcher.put_nowait(update)
+
+    async def watch_status(self):
+        """Yield the current state, then every change as it happens"""
+        watcher = asyncio.Queue(maxsize=16)
+        self.status_watchers.add(watcher)
+        try:
+            yield self._status_update("initial")
+            while True:
+                try:
+                    yield await asyncio.wait_for(
+                        watcher.get(), timeout=STATUS_HEARTBEAT_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    yield self._status_update("heartbeat")
+        finally:
+            self.status_watchers.discard(watcher)
+
+    async def get_status(self):
+        """Get status"""
+        return self.status()
+
+    def status(self):
+        """Status from state the slot already holds, without touching the page"""
+        manager = self.manager
+        return {
+            "browser_ready": manager.ready,
+            "page_loaded": self.page is not None,
+            "current_url": self.current_url() if self.page else "",
+            "streaming": self.streaming,
+            "startup_timings_ms": manager.startup_timings,
+            "frame_transport": manager.frame_transport,
+            "frame_ring_path": self.frame_ring_path,
+            "capture_mode": manager.capture_mode,
+            "capture_engine": manager.capture_engine,
+            "stream": dict(self.stream_config),
+            "frame_format": manager.frame_format,
+            "display": self.display_config(),
+            "slot": self.index,
+            "slot_count": manager.slot_count,
+            "preloaded_url": self.preloaded[0] if self.preloaded else "",
+            "filter_profile": self.request_filter.name,
+            "filter_stats": filter_stats(manager.request_filters),
+            "superseded": dict(self.superseded),
+            "snapshots": manager.snapshots.stats(),
+            "scripts": manager.scripts.stats(),
+            "http_cache": (
+                manager.http_cache.stats() if manager.http_cache else {"enabled": False}
+            ),
+            **(
+                self.frame_pump.stats()
+                if self.frame_pump
+                else {"frames_captured": 0, "frames_suppressed": 0, "bytes_saved": 0}
+            ),
+        }
+
 
 class BrowserManager:
-    """Manages Playwright browser instance and GStreamer pipeline"""
+    """Manages the Playwright browser, its display and the page slots
+
+    PAGE_SLOTS independent pages (default 1) share one Chromium process,
+    Xvfb and Python runtime; requests address them by slot index.
+    """
 
     def __init__(self, display=":99"):
         self.display = display
         self.playwright = None
         self.browser = None
-        self.context = None
-        self.page = None
-        self.gst_pipeline = None
+        # udp: raw frames to localhost (legacy), shm: shared-memory frame ring
+        self.frame_transport = os.environ.get("FRAME_TRANSPORT", "udp").lower()
+        # xvfb: headed Chromium on Xvfb captured by ximagesrc; screencast:
+        # headless Chromium pushing repaints over CDP Page.startScreencast
+        # (no Xvfb, VNC or gst-launch; always publishes to the frame ring)
+        self.capture_engine = os.environ.get("CAPTURE_ENGINE", "xvfb").lower()
+        if self.capture_engine == "screencast" and self.frame_transport != "shm":
+            logger.warning("CAPTURE_ENGINE=screencast needs FRAME_TRANSPORT=shm")
+            self.frame_transport = "shm"
+        # full: every frame at 30 fps, damage: XDamage capture and
+        # suppression of unchanged frames (needs FRAME_TRANSPORT=shm)
+        self.capture_mode = os.environ.get("CAPTURE_MODE", "full").lower()
+        self.frame_format = os.environ.get("FRAME_FORMAT", "RGBA")
+        if self.frame_format not in FRAME_FORMATS:
+            raise ValueError(
+                f"FRAME_FORMAT must be one of {', '.join(FRAME_FORMATS)}, "
+                f"not {self.frame_format!r}"
+            )
+        # Physical pixels Xvfb holds, Chromium rasterizes and GStreamer
+        # captures; pages are laid out at width / device_scale_factor CSS
+        # pixels. Xvfb can shrink and regrow at runtime up to its initial
+        # framebuffer, MAX_RESOLUTION. These are the defaults of every slot.
+        self.width, self.height = parse_resolution(
+            os.environ.get("RESOLUTION", "1920x1080")
+        )
+        self.device_scale_factor = float(os.environ.get("DEVICE_SCALE_FACTOR", "1"))
+        self.max_width, self.max_height = parse_resolution(
+            os.environ.get("MAX_RESOLUTION", f"{self.width}x{self.height}")
+        )
+        self.default_stream_config = {
+            "encoder": os.environ.get("FRAME_ENCODER", "none").lower(),
+            "bitrate_kbps": int(os.environ.get("ENCODER_BITRATE_KBPS", "4000")),
+            "gop": int(os.environ.get("ENCODER_GOP", "30")),
+            "preset": os.environ.get("ENCODER_PRESET", "ultrafast"),
+            "quality": int(os.environ.get("JPEG_QUALITY", "85")),
+        }
+        if self.default_stream_config["encoder"] not in FRAME_ENCODERS:
+            raise ValueError(
+                f"FRAME_ENCODER must be one of {', '.join(FRAME_ENCODERS)}, "
+                f"not {self.default_stream_config['encoder']!r}"
+            )
+        # Where the UDP transport sends to (the tiler, when on another node);
+        # slot n uses STREAM_PORT + n
+        service_name = os.environ.get("SERVICE_NAME", "apphost")
+        # Calculate port based on service number (apphost1 -> 2001, apphost2 -> 2002, etc.)
+        apphost_num = int("".join(filter(str.isdigit, service_name)) or "1")
+        self.stream_host = os.environ.get("STREAM_HOST", "127.0.0.1")
+        self.stream_port = int(os.environ.get("STREAM_PORT", str(2000 + apphost_num)))
+        # Slot n > 0 publishes to frames.<n>.ring next to this one
+        self.frame_ring_base = os.environ.get(
+            "FRAME_RING_PATH", f"/dev/shm/{service_name}/frames.ring"
+        )
+        # Opt-in HTTP cache for page loads, on a volume all apphosts share
+        self.http_cache = None
+        self.cache_router = None
+        cache_dir = os.environ.get("HTTP_CACHE_DIR", "")
+        if cache_dir:
+            max_bytes = int(os.environ.get("HTTP_CACHE_MAX_MB", "1024")) << 20
+            self.http_cache = HttpCache(cache_dir, max_bytes)
+            self.cache_router = CacheRouter(self.http_cache)
+            logger.info(f"HTTP cache: {cache_dir} ({max_bytes >> 20} MB)")
+        # Request-blocking profiles: built-ins plus REQUEST_FILTER_PROFILES
+        self.request_filters = load_profiles(
+            os.environ.get("REQUEST_FILTER_PROFILES", "")
+        )
+        self.default_filter = os.environ.get("REQUEST_FILTER", "none")
+        self.request_filter(self.default_filter)
+        # Capture screenshots: encoder threads and encoded frames kept
+        self.snapshots = SnapshotEncoder(
+            workers=int(os.environ.get("SNAPSHOT_WORKERS", "2")),
+            cache_entries=int(os.environ.get("SNAPSHOT_CACHE_ENTRIES", "32")),
+        )
+        # Scripts installed in every page by RegisterScript
+        self.scripts = ScriptRegistry()
+        # Settled navigations: how long the screen must stay unchanged, and
+        # the fraction of it allowed to keep changing (clocks, tickers)
+        self.settle_ms = int(os.environ.get("SETTLE_MS", "500"))
+        self.settle_threshold = float(os.environ.get("SETTLE_THRESHOLD", "0.01"))
+        self.slot_count = int(os.environ.get("PAGE_SLOTS", "1"))
+        if self.slot_count < 1:
+            raise ValueError(f"PAGE_SLOTS must be at least 1, not {self.slot_count}")
+        self.slots = [PageSlot(self, index) for index in range(self.slot_count)]
         self.xvfb_process = None
         self.x11vnc_process = None
         self.novnc_process = None
         self.ready = False
-        self.streaming = False
-
-    async def start(self):
-        """Initialize Xvfb, browser, and GStreamer pipeline"""
-        logger.info("Starting browser manager...")
+        self.startup_timings = {}
 
-        # Force DISPLAY environment variable
-        os.environ["DISPLAY"] = self.display
+    def slot(self, index=0):
+        """The page slot a request addresses"""
+        if not 0 <= index < self.slot_count:
+            raise ValueError(
+                f"No page slot {index}; this apphost has {self.slot_count}"
+            )
+        return self.slots[index]
+
+    def request_filter(self, profile):
+        """The RequestFilter of a profile name"""
+        if profile not in self.request_filters:
+            raise ValueError(
+                f"Unknown request filter profile {profile!r}; "
+                f"have {', '.join(self.request_filters)}"
+            )
+        return self.request_filters[profile]
 
-        # Start Xvfb first (critical - this must be running before browser)
-        await self._start_xvfb()
+    @property
+    def streaming(self):
+        """True while every slot is capturing"""
+        return all(slot.streaming for slot in self.slots)
 
-        # Start x11vnc
-        await self._start_x11vnc()
+    @property
+    def frame_ring_path(self):
+        """Frame ring of slot 0"""
+        return self.slots[0].frame_ring_path
 
-        # Start noVNC
-        await self._start_novnc()
+    async def start(self):
+        """Initialize Xvfb, browser, and GStreamer pipeline"""
+        logger.info(f"Starting browser manager with {self.slot_count} page slot(s)...")
+        started = time.monotonic()
+
+        if self.capture_engine == "screencast":
+            # No display at all: the headless browser streams its own frames
+            await self._timed("browser", self._start_browser())
+            await self._timed(
+                "screencast",
+                asyncio.gather(*(slot._start_screencast() for slot in self.slots)),
+            )
+        else:
+            # Force DISPLAY environment variable
+            os.environ["DISPLAY"] = self.display
+
+            # Start Xvfb first (critical - this must be running before browser)
+            await self._timed("xvfb", self._start_xvfb())
+
+            # Everything else only needs the display, so start it side by side;
+            # noVNC proxies to x11vnc and has to wait for it
+            await asyncio.gather(
+                self._start_vnc(),
+                self._timed("browser", self._start_browser()),
+                self._timed(
+                    "gstreamer",
+                    asyncio.gather(*(slot._start_gstreamer() for slot in self.slots)),
+                ),
+            )
 
-        # Start Playwright
-        await self._start_browser()
+        self.startup_timings["total"] = round((time.monotonic() - started) * 1000)
+        self.ready = True
+        logger.info(
+            f"Browser manager ready in {self.startup_timings['total']} ms "
+            f"(stages: {self.startup_timings})"
+        )
 
-        # Start GStreamer pipeline
-        await self._start_gstreamer()
+    async def _timed(self, stage, coro):
+        """Await a startup stage and record how long it took to become ready"""
+        started = time.monotonic()
+        result = await coro
+        self.startup_timings[stage] = round((time.monotonic() - started) * 1000)
+        logger.info(f"Startup stage {stage} ready in {self.startup_timings[stage]} ms")
+        return result
 
-        self.ready = True
-        logger.info("Browser manager ready")
+    async def _start_vnc(self):
+        """Start x11vnc, then the noVNC proxy in front of it"""
+        await self._timed("x11vnc", self._start_x11vnc())
+        await self._timed("novnc", self._start_novnc())
 
     async def _start_xvfb(self):
         """Start Xvfb virtual display with proper initialization"""
@@ -83,14 +1435,14 @@ class BrowserManager:
         # Extract display number
         display_num = self.display.replace(":", "")
 
-        # Use xvfb-run wrapper for proper X server handling
+        # Slots sit side by side, each with room for MAX_RESOLUTION
         self.xvfb_process = subprocess.Popen(
             [
                 "Xvfb",
                 self.display,
                 "-screen",
                 "0",
-                "1920x1080x24",
+                f"{self.max_width * self.slot_count}x{self.max_height}x24",
                 "-ac",
                 "+extension",
                 "RANDR",
@@ -102,38 +1454,41 @@ class BrowserManager:
             stderr=subprocess.PIPE,
         )
 
-        # Wait longer for X server to be fully ready
-        await asyncio.sleep(3)
-
-        # Verify X server is actually listening
-        import socket
-
-        x_server_port = 6000 + int(display_num)
-
-        for attempt in range(10):
-            try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(0.5)
-                result = sock.connect_ex(("127.0.0.1", x_server_port))
-                sock.close()
-                if result == 0:
-                    logger.info("Xvfb X server connection verified")
-                    break
-                else:
-                    logger.info(
-                        f"Waiting for Xvfb to be ready... (attempt {attempt + 1})"
-                    )
-                    await asyncio.sleep(0.5)
-            except Exception as e:
-                logger.warning(f"Xvfb check failed: {e}")
-                await asyncio.sleep(0.5)
+        # Xvfb creates its socket once it accepts clients (TCP is disabled)
+        x_socket = f"/tmp/.X11-unix/X{display_num}"
+        if await wait_until_ready(unix_socket_probe(x_socket), self.xvfb_process):
+            logger.info("Xvfb X server connection verified")
         else:
             logger.warning(
                 "Could not verify Xvfb X server connection - proceeding anyway"
             )
 
+        if self.slot_count == 1 and (self.width, self.height) != (
+            self.max_width,
+            self.max_height,
+        ):
+            await self._resize_display(self.width, self.height)
+
         logger.info("Xvfb started successfully")
 
+    async def _resize_display(self, width, height):
+        """Resize the Xvfb screen through RANDR"""
+        process = await asyncio.create_subprocess_exec(
+            "xrandr",
+            "--display",
+            self.display,
+            "--fb",
+            f"{width}x{height}",
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(
+                f"xrandr --fb {width}x{height} failed: {stderr.decode().strip()}"
+            )
+        logger.info(f"Display resized to {width}x{height}")
+
     async def _start_x11vnc(self):
         """Start x11vnc VNC server"""
         service_name = os.environ.get("SERVICE_NAME", "apphost")
@@ -157,13 +1512,15 @@ class BrowserManager:
                 "-noxfixes",
                 "-noxrecord",
                 "-xkb",
+                "-xrandr",  # follow display resizes from SetDisplayConfig
             ],
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
         )
 
-        # Wait for VNC server to be ready
-        await asyncio.sleep(1)
+        # Wait for VNC server to accept connections
+        if not await wait_until_ready(port_probe(vnc_port), self.x11vnc_process):
+            logger.warning(f"x11vnc not accepting on port {vnc_port} yet")
         logger.info(f"x11vnc started on port {vnc_port}")
 
     async def _start_novnc(self):
@@ -188,8 +1545,9 @@ class BrowserManager:
             stderr=subprocess.PIPE,
         )
 
-        # Wait for noVNC to be ready
-        await asyncio.sleep(1)
+        # Wait for noVNC to listen
+        if not await wait_until_ready(port_probe(novnc_port), self.novnc_process):
+            logger.warning(f"noVNC not listening on port {novnc_port} yet")
         logger.info(f"noVNC started on port {novnc_port} (VNC backend: {vnc_port})")
 
     async def _start_browser(self):
@@ -201,16 +1559,18 @@ class BrowserManager:
 
         self.playwright = await async_playwright().start()
 
-        # Use HEADED browser (not headless) with X11 display
+        # Use HEADED browser (not headless) with X11 display, unless the
+        # screencast engine captures frames over CDP instead of from X
         self.browser = await self.playwright.chromium.launch(
-            headless=False,  # This is CRITICAL - never use headless for streaming
+            # This is CRITICAL - ximagesrc can only capture a headed browser
+            headless=self.capture_engine == "screencast",
             args=[
                 "--no-sandbox",
                 "--disable-setuid-sandbox",
                 "--disable-dev-shm-usage",
                 f"--display={self.display}",  # Explicitly set display
-                "--window-size=1920,1080",
-                "--start-maximized",
+                f"--window-size={self.width},{self.height}",
+                *(["--start-maximized"] if self.slot_count == 1 else []),
                 "--use-gl=swiftshader",
                 "--disable-gpu-sandbox",
                 "--disable-web-security",
@@ -218,144 +1578,132 @@ class BrowserManager:
             ],
         )
 
-        self.context = await self.browser.new_context(
-            viewport={"width": 1920, "height": 1080},
-            screen={"width": 1920, "height": 1080},
-        )
-
-        self.page = await self.context.new_page()
-
-        # Navigate to blank page
-        await self.page.goto("about:blank")
+        await asyncio.gather(*(slot.open() for slot in self.slots))
 
         logger.info("Browser started successfully with X11 support")
 
-    async def _start_gstreamer(self):
-        """Start GStreamer pipeline to capture X display and output to UDP"""
-        logger.info("Starting GStreamer pipeline for X display capture...")
-
-        service_name = os.environ.get("SERVICE_NAME", "apphost")
-        # Calculate port based on service number (apphost1 -> 2001, apphost2 -> 2002, etc.)
-        apphost_num = (
-            int(service_name.replace("apphost", ""))
-            if service_name.startswith("apphost")
-            else 1
+    async def set_display_config(self, width, height, device_scale_factor=0, slot=0):
+        """Render and capture a slot at a new resolution"""
+        return await self.slot(slot).set_display_config(
+            width, height, device_scale_factor
         )
-        udp_port = 2000 + apphost_num
 
-        # GStreamer pipeline for X display capture:
-        # ximagesrc captures the X display with damage tracking disabled
-        # videoconvert ensures proper format for streaming
-        # rtp provides low latency UDP streaming to localhost
-        pipeline_cmd = [
-            "gst-launch-1.0",
-            "-e",  # exit on error
-            "ximagesrc",
-            f"display-name={self.display}",
-            "use-damage=false",  # critical for reliable capture
-            "show-pointer=false",  # don't show mouse cursor in stream
-            "!",
-            "video/x-raw,framerate=30/1,width=1920,height=1080",  # 30fps for stable streaming
-            "!",
-            "videoconvert",
-            "!",
-            "video/x-raw,format=RGBA,width=1920,height=1080",  # RGBA format for compatibility
-            "!",
-            "udpsink",
-            "host=127.0.0.1",
-            f"port={udp_port}",
-            "sync=false",  # no sync for low latency
-            "buffer-size=0",  # minimal buffering
-        ]
+    def display_config(self, slot=0):
+        """Display config of a slot, or the defaults for an unknown slot"""
+        if 0 <= slot < self.slot_count:
+            return self.slots[slot].display_config()
+        return {
+            "width": self.width,
+            "height": self.height,
+            "device_scale_factor": self.device_scale_factor,
+        }
 
-        logger.info(f"GStreamer pipeline: {' '.join(pipeline_cmd)}")
-        logger.info(f"UDP streaming to: localhost:{udp_port}")
+    async def set_stream_config(
+        self, encoder="", bitrate_kbps=0, gop=0, preset="", quality=0, slot=0
+    ):
+        """Change the encode stage of a slot's stream"""
+        return await self.slot(slot).set_stream_config(
+            encoder, bitrate_kbps, gop, preset, quality
+        )
 
-        # Start pipeline in background
-        self.gst_pipeline = subprocess.Popen(
-            pipeline_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+    def stream_config(self, slot=0):
+        """Stream config of a slot, or the defaults for an unknown slot"""
+        if 0 <= slot < self.slot_count:
+            return dict(self.slots[slot].stream_config)
+        return dict(self.default_stream_config)
+
+    async def navigate(
+        self,
+        url,
+        timeout_ms=30000,
+        wait_until_load=True,
+        slot=0,
+        filter_profile="",
+        wait_until="",
+        settle_ms=0,
+    ):
+        """Navigate a slot to a URL"""
+        return await self.slot(slot).navigate(
+            url, timeout_ms, wait_until_load, filter_profile, wait_until, settle_ms
         )
 
-        # Give pipeline time to start
-        await asyncio.sleep(2)
+    async def supersede(self, operation, slot=0):
+        """Cancel a slot's in-flight navigation or preload"""
+        await self.slot(slot)._supersede(operation)
 
-        if self.gst_pipeline.poll() is None:
-            self.streaming = True
-            logger.info(
-                "GStreamer pipeline started successfully - X display capture active"
-            )
-        else:
-            logger.error(f"GStreamer pipeline failed to start")
-            raise RuntimeError(
-                f"Failed to start GStreamer pipeline for X display capture"
-            )
+    async def set_request_filter(self, profile, slot=0):
+        """Switch a slot to a request-blocking profile"""
+        return await self.slot(slot).set_request_filter(profile)
 
-    async def navigate(self, url, timeout_ms=30000, wait_until_load=True):
-        """Navigate to a URL"""
-        if not self.page:
-            raise RuntimeError("Browser not initialized")
+    async def preload(self, url, timeout_ms=30000, wait_until_load=True, slot=0):
+        """Load a URL in a slot's hidden page"""
+        return await self.slot(slot).preload(url, timeout_ms, wait_until_load)
 
-        logger.info(f"Navigating to: {url}")
+    async def activate(self, url="", slot=0):
+        """Swap a slot's preloaded page in"""
+        return await self.slot(slot).activate(url)
 
-        try:
-            wait_until = "networkidle" if wait_until_load else "domcontentloaded"
-            await self.page.goto(url, timeout=timeout_ms, wait_until=wait_until)
-            final_url = self.page.url
-            logger.info(f"Navigation complete: {final_url}")
-            return True, None, final_url
-        except Exception as e:
-            logger.error(f"Navigation failed: {e}")
-            return False, str(e), None
+    async def get_url(self, slot=0):
+        """Get a slot's current URL"""
+        return await self.slot(slot).get_url()
 
-    async def get_url(self):
-        """Get current URL"""
-        if not self.page:
-            return "about:blank"
-        return self.page.url
+    def current_url(self, slot=0):
+        """A slot's current URL, from any thread"""
+        return self.slot(slot).current_url()
 
-    async def screenshot(self, format="png", quality=None):
-        """Take screenshot"""
-        if not self.page:
-            raise RuntimeError("Browser not initialized")
+    async def screenshot(self, format="png", quality=None, slot=0):
+        """Take a screenshot of a slot"""
+        return await self.slot(slot).screenshot(format, quality)
 
-        options = {"type": format}
-        if format == "jpeg" and quality:
-            options["quality"] = quality
+    async def capture_screenshot(self, format="png", quality=None, max_width=0, slot=0):
+        """Encode a slot's newest captured frame"""
+        return await self.slot(slot).capture_screenshot(format, quality, max_width)
 
-        data = await self.page.screenshot(**options)
-        return data
+    async def execute_script(self, script, slot=0):
+        """Execute JavaScript in a slot"""
+        return await self.slot(slot).execute_script(script)
 
-    async def execute_script(self, script):
-        """Execute JavaScript"""
-        if not self.page:
-            raise RuntimeError("Browser not initialized")
+    async def register_script(self, source, name=""):
+        """Install a function in every slot's pages; returns its handle
 
-        try:
-            result = await self.page.evaluate(script)
-            return str(result), None
-        except Exception as e:
-            logger.error(f"Script execution failed: {e}")
-            return None, str(e)
-
-    async def get_status(self):
-        """Get status"""
-        return {
-            "browser_ready": self.ready,
-            "page_loaded": self.page is not None,
-            "current_url": await self.get_url() if self.page else "",
-            "streaming": self.streaming,
-        }
+        The source must evaluate to a function. Registering a script again
+        returns the same handle without reinstalling it.
+        """
+        page = self.slots[0].page
+        if not page:
+            raise RuntimeError("Browser not initialized")
+        kind = await page.evaluate(f"typeof ({source})")
+        if kind != "function":
+            raise ValueError(f"Script must evaluate to a function, not {kind}")
+        handle, new = self.scripts.add(source, name)
+        if new:
+            for slot in self.slots:
+                await slot.install_script(handle, source)
+            logger.info(f"Registered script {name or handle} as {handle}")
+        return handle
+
+    async def batch_execute(self, calls, stop_on_error=False, slot=0):
+        """Run registered scripts in a slot in one evaluate"""
+        return await self.slot(slot).batch_execute(calls, stop_on_error)
+
+    def watch_status(self, slot=0):
+        """Status stream of a slot"""
+        return self.slot(slot).watch_status()
+
+    async def get_status(self, slot=0):
+        """Get a slot's status"""
+        return await self.slot(slot).get_status()
+
+    def status(self, slot=0):
+        """A slot's status, from any thread"""
+        return self.slot(slot).status()
 
     async def cleanup(self):
         """Cleanup resources"""
         logger.info("Cleaning up browser manager...")
 
-        if self.gst_pipeline:
-            self.gst_pipeline.terminate()
-            self.gst_pipeline.wait()
-            logger.info("GStreamer pipeline stopped")
+        await asyncio.gather(*(slot.close() for slot in self.slots))
+        self.snapshots.close()
 
         if self.novnc_process:
             self.novnc_process.terminate()
@@ -365,9 +1713,6 @@ class BrowserManager:
             self.x11vnc_process.terminate()
             self.x11vnc_process.wait()
 
-        if self.context:
-            await self.context.close()
-
         if self.browser:
             await self.browser.close()
 
@@ -382,28 +1727,51 @@ class BrowserManager:
         logger.info("Cleanup complete")
 
 
-class BrowserServiceServicer(browser_pb2_grpc.BrowserServiceServicer):
-    """gRPC service for browser control"""
+class AsyncBrowserServiceServicer(browser_pb2_grpc.BrowserServiceServicer):
+    """gRPC service for browser control, running on the browser event loop
 
-    def __init__(self, browser_manager, loop):
+    RPCs run in the scheduler's lanes (see scheduler.py): GetStatus and
+    GetURL are answered from held state, Screenshot and the script RPCs
+    share the query lane, and page changes queue in their slot's page lane.
+    """
+
+    def __init__(self, browser_manager):
         self.browser_manager = browser_manager
-        self.loop = loop
+        self.scheduler = Scheduler.from_env(browser_manager.slot_count)
 
-    def Navigate(self, request, context):
+    async def Navigate(self, request, context):
         """Navigate to URL"""
         try:
-            future = asyncio.run_coroutine_threadsafe(
-                self.browser_manager.navigate(
-                    request.url,
-                    request.timeout_ms if request.timeout_ms > 0 else 30000,
-                    request.wait_until_load,
+            lane = self.scheduler.page(request.slot)
+            success, error, final_url, first_paint_ms, settled_ms = await lane.run(
+                lambda: asyncio.wait_for(
+                    self.browser_manager.navigate(
+                        request.url,
+                        deadline_timeout_ms(context, request.timeout_ms),
+                        request.wait_until_load,
+                        slot=request.slot,
+                        filter_profile=request.filter_profile,
+                        wait_until=request.wait_until,
+                        settle_ms=request.settle_ms,
+                    ),
+                    timeout=rpc_timeout(context),
+                ),
+                supersede=lambda: self.browser_manager.supersede(
+                    "navigation", request.slot
                 ),
-                self.loop,
             )
-            success, error, final_url = future.result(timeout=60)
 
             return browser_pb2.NavigateResponse(
-                success=success, error=error or "", final_url=final_url or ""
+                success=success,
+                error=error or "",
+                final_url=final_url or "",
+                first_paint_ms=first_paint_ms,
+                settled_ms=settled_ms,
+            )
+        except asyncio.TimeoutError:
+            logger.error("Navigate RPC ran out of time")
+            return browser_pb2.NavigateResponse(
+                success=False, error="Deadline exceeded"
             )
         except Exception as e:
             logger.error(f"Navigate RPC failed: {e}")
@@ -411,41 +1779,130 @@ class BrowserServiceServicer(browser_pb2_grpc.BrowserServiceServicer):
                 success=False, error=str(e), final_url=""
             )
 
-    def GetURL(self, request, context):
+    async def Preload(self, request, context):
+        """Load a URL in a hidden page"""
+        try:
+            lane = self.scheduler.page(request.slot)
+            success, error, final_url, load_ms = await lane.run(
+                lambda: asyncio.wait_for(
+                    self.browser_manager.preload(
+                        request.url,
+                        deadline_timeout_ms(context, request.timeout_ms),
+                        request.wait_until_load,
+                        slot=request.slot,
+                    ),
+                    timeout=rpc_timeout(context),
+                ),
+                supersede=lambda: self.browser_manager.supersede(
+                    "preload", request.slot
+                ),
+            )
+            return browser_pb2.PreloadResponse(
+                success=success,
+                error=error or "",
+                final_url=final_url or "",
+                load_ms=load_ms,
+            )
+        except asyncio.TimeoutError:
+            logger.error("Preload RPC ran out of time")
+            return browser_pb2.PreloadResponse(success=False, error="Deadline exceeded")
+        except Exception as e:
+            logger.error(f"Preload RPC failed: {e}")
+            return browser_pb2.PreloadResponse(success=False, error=str(e))
+
+    async def Activate(self, request, context):
+        """Swap the preloaded page in"""
+        started = time.monotonic()
+        try:
+            url = await self.scheduler.page(request.slot).run(
+                lambda: asyncio.wait_for(
+                    self.browser_manager.activate(request.url, slot=request.slot),
+                    timeout=10,
+                ),
+                supersede=lambda: self.browser_manager.supersede(
+                    "navigation", request.slot
+                ),
+            )
+            return browser_pb2.ActivateResponse(
+                success=True,
+                error="",
+                url=url,
+                swap_ms=round((time.monotonic() - started) * 1000),
+            )
+        except Exception as e:
+            logger.error(f"Activate RPC failed: {e}")
+            return browser_pb2.ActivateResponse(success=False, error=str(e))
+
+    async def GetURL(self, request, context):
         """Get current URL"""
+        return self.get_url_response(request)
+
+    def get_url_response(self, request):
+        """GetURL in the read lane; safe to call from any thread"""
         try:
-            future = asyncio.run_coroutine_threadsafe(
-                self.browser_manager.get_url(), self.loop
+            url = self.scheduler.read.call(
+                lambda: self.browser_manager.current_url(request.slot)
             )
-            url = future.result(timeout=5)
             return browser_pb2.GetURLResponse(url=url)
         except Exception as e:
             logger.error(f"GetURL RPC failed: {e}")
             return browser_pb2.GetURLResponse(url="")
 
-    def Screenshot(self, request, context):
-        """Take screenshot"""
+    async def Screenshot(self, request, context):
+        """Take screenshot, rendered by Chromium or from the capture"""
+        if request.source == "capture":
+            return await self._capture_screenshot(request)
         try:
-            future = asyncio.run_coroutine_threadsafe(
-                self.browser_manager.screenshot(
-                    request.format or "png",
-                    request.quality if request.quality > 0 else None,
-                ),
-                self.loop,
+            data = await self.scheduler.query.run(
+                lambda: asyncio.wait_for(
+                    self.browser_manager.screenshot(
+                        request.format or "png",
+                        request.quality if request.quality > 0 else None,
+                        slot=request.slot,
+                    ),
+                    timeout=10,
+                )
             )
-            data = future.result(timeout=10)
             return browser_pb2.ScreenshotResponse(data=data, error="")
         except Exception as e:
             logger.error(f"Screenshot RPC failed: {e}")
             return browser_pb2.ScreenshotResponse(data=b"", error=str(e))
 
-    def ExecuteScript(self, request, context):
+    async def _capture_screenshot(self, request):
+        """Screenshot from the frame ring, in the read lane: no browser time"""
+        try:
+            data, width, height, frame_seq, cached = await self.scheduler.read.run(
+                lambda: asyncio.wait_for(
+                    self.browser_manager.capture_screenshot(
+                        request.format or "png",
+                        request.quality if request.quality > 0 else None,
+                        request.max_width,
+                        slot=request.slot,
+                    ),
+                    timeout=10,
+                )
+            )
+            return browser_pb2.ScreenshotResponse(
+                data=data,
+                error="",
+                width=width,
+                height=height,
+                frame_seq=frame_seq,
+                cached=cached,
+            )
+        except Exception as e:
+            logger.error(f"Capture screenshot failed: {e}")
+            return browser_pb2.ScreenshotResponse(data=b"", error=str(e))
+
+    async def ExecuteScript(self, request, context):
         """Execute JavaScript"""
         try:
-            future = asyncio.run_coroutine_threadsafe(
-                self.browser_manager.execute_script(request.script), self.loop
+            result, error = await self.scheduler.query.run(
+                lambda: asyncio.wait_for(
+                    self.browser_manager.execute_script(request.script, request.slot),
+                    timeout=10,
+                )
             )
-            result, error = future.result(timeout=10)
             return browser_pb2.ExecuteScriptResponse(
                 result=result or "", error=error or ""
             )
@@ -453,18 +1910,99 @@ class BrowserServiceServicer(browser_pb2_grpc.BrowserServiceServicer):
             logger.error(f"ExecuteScript RPC failed: {e}")
             return browser_pb2.ExecuteScriptResponse(result="", error=str(e))
 
-    def GetStatus(self, request, context):
+    async def RegisterScript(self, request, context):
+        """Install a script in every page and return its handle"""
+        try:
+            handle = await self.scheduler.query.run(
+                lambda: asyncio.wait_for(
+                    self.browser_manager.register_script(request.source, request.name),
+                    timeout=10,
+                )
+            )
+            return browser_pb2.RegisterScriptResponse(
+                success=True, error="", handle=handle
+            )
+        except Exception as e:
+            logger.error(f"RegisterScript RPC failed: {e}")
+            return browser_pb2.RegisterScriptResponse(
+                success=False, error=str(e), handle=""
+            )
+
+    async def BatchExecute(self, request, context):
+        """Run registered scripts in one round trip; results as JSON"""
+        try:
+            calls = [
+                [call.handle, parse_args(call.args_json)] for call in request.calls
+            ]
+            timeout = rpc_timeout(context, default=10)
+            results = await self.scheduler.query.run(
+                lambda: asyncio.wait_for(
+                    self.browser_manager.batch_execute(
+                        calls, request.stop_on_error, slot=request.slot
+                    ),
+                    timeout=timeout,
+                )
+            )
+            return browser_pb2.BatchExecuteResponse(
+                results=[
+                    browser_pb2.ScriptResult(
+                        success="error" not in result,
+                        result_json=(
+                            json.dumps(result["value"]) if "error" not in result else ""
+                        ),
+                        error=result.get("error", ""),
+                    )
+                    for result in results
+                ],
+                error="",
+            )
+        except asyncio.TimeoutError:
+            return browser_pb2.BatchExecuteResponse(error="Deadline exceeded")
+        except Exception as e:
+            logger.error(f"BatchExecute RPC failed: {e}")
+            return browser_pb2.BatchExecuteResponse(error=str(e))
+
+    async def GetStatus(self, request, context):
         """Get browser status"""
+        return self.get_status_response(request)
+
+    def get_status_response(self, request):
+        """GetStatus in the read lane; safe to call from any thread"""
         try:
-            future = asyncio.run_coroutine_threadsafe(
-                self.browser_manager.get_status(), self.loop
+            status = self.scheduler.read.call(
+                lambda: self.browser_manager.status(request.slot)
             )
-            status = future.result(timeout=5)
             return browser_pb2.GetStatusResponse(
                 browser_ready=status["browser_ready"],
                 page_loaded=status["page_loaded"],
                 current_url=status["current_url"],
                 streaming=status["streaming"],
+                startup_timings_ms=status["startup_timings_ms"],
+                frame_transport=status["frame_transport"],
+                frame_ring_path=status["frame_ring_path"],
+                capture_mode=status["capture_mode"],
+                capture_engine=status["capture_engine"],
+                stream=browser_pb2.StreamConfig(**status["stream"]),
+                frame_format=status["frame_format"],
+                frames_captured=status["frames_captured"],
+                frames_suppressed=status["frames_suppressed"],
+                bytes_saved=status["bytes_saved"],
+                display=browser_pb2.DisplayConfig(**status["display"]),
+                slot=status["slot"],
+                slot_count=status["slot_count"],
+                preloaded_url=status["preloaded_url"],
+                http_cache=browser_pb2.HttpCacheStats(**status["http_cache"]),
+                filter_profile=status["filter_profile"],
+                filter_stats=[
+                    browser_pb2.RequestFilterStats(**stats)
+                    for stats in status["filter_stats"]
+                ],
+                superseded=status["superseded"],
+                snapshots=browser_pb2.SnapshotStats(**status["snapshots"]),
+                scripts=browser_pb2.ScriptStats(**status["scripts"]),
+                lanes=[
+                    browser_pb2.LaneStats(**lane) for lane in self.scheduler.stats()
+                ],
             )
         except Exception as e:
             logger.error(f"GetStatus RPC failed: {e}")
@@ -475,6 +2013,210 @@ class BrowserServiceServicer(browser_pb2_grpc.BrowserServiceServicer):
                 streaming=False,
             )
 
+    async def SetDisplayConfig(self, request, context):
+        """Change the rendered and captured resolution"""
+        try:
+            config = await self.scheduler.page(request.slot).run(
+                lambda: asyncio.wait_for(
+                    self.browser_manager.set_display_config(
+                        request.width,
+                        request.height,
+                        request.device_scale_factor,
+                        slot=request.slot,
+                    ),
+                    timeout=30,
+                )
+            )
+            return browser_pb2.DisplayConfigResponse(
+                success=True, error="", config=browser_pb2.DisplayConfig(**config)
+            )
+        except Exception as e:
+            logger.error(f"SetDisplayConfig RPC failed: {e}")
+            return browser_pb2.DisplayConfigResponse(
+                success=False,
+                error=str(e),
+                config=browser_pb2.DisplayConfig(
+                    **self.browser_manager.display_config(request.slot)
+                ),
+            )
+
+    async def SetRequestFilter(self, request, context):
+        """Switch a slot to a request-blocking profile"""
+        try:
+            profile = await self.scheduler.page(request.slot).run(
+                lambda: asyncio.wait_for(
+                    self.browser_manager.set_request_filter(
+                        request.profile, slot=request.slot
+                    ),
+                    timeout=10,
+                )
+            )
+            return browser_pb2.RequestFilterResponse(
+                success=True, error="", profile=profile
+            )
+        except Exception as e:
+            logger.error(f"SetRequestFilter RPC failed: {e}")
+            return browser_pb2.RequestFilterResponse(success=False, error=str(e))
+
+    async def SetStreamConfig(self, request, context):
+        """Change the encode stage of the video transport"""
+        try:
+            config = await self.scheduler.page(request.slot).run(
+                lambda: asyncio.wait_for(
+                    self.browser_manager.set_stream_config(
+                        request.encoder,
+                        request.bitrate_kbps,
+                        request.gop,
+                        request.preset,
+                        request.quality,
+                        slot=request.slot,
+                    ),
+                    timeout=30,
+                )
+            )
+            return browser_pb2.StreamConfigResponse(
+                success=True, error="", config=browser_pb2.StreamConfig(**config)
+            )
+        except Exception as e:
+            logger.error(f"SetStreamConfig RPC failed: {e}")
+            return browser_pb2.StreamConfigResponse(
+                success=False,
+                error=str(e),
+                config=browser_pb2.StreamConfig(
+                    **self.browser_manager.stream_config(request.slot)
+                ),
+            )
+
+    async def WatchStatus(self, request, context):
+        """Stream page state changes"""
+        async for update in self.browser_manager.watch_status(request.slot):
+            yield browser_pb2.StatusUpdate(**update)
+
+
+class BrowserServiceServicer(browser_pb2_grpc.BrowserServiceServicer):
+    """gRPC service for browser control, bridged from a thread pool
+
+    Every RPC holds an executor thread while its coroutine runs on the
+    browser event loop; the handlers themselves live in
+    AsyncBrowserServiceServicer.
+    """
+
+    def __init__(self, browser_manager, loop):
+        self.browser_manager = browser_manager
+        self.loop = loop
+        self.servicer = AsyncBrowserServiceServicer(browser_manager)
+
+    def _bridge(self, coro, context=None):
+        """Run a servicer coroutine on the browser loop and wait for it
+
+        With the RPC's context, a client that cancels or runs out of
+        deadline cancels the coroutine too instead of leaving it running.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        if context is None:
+            return future.result()
+        context.add_callback(future.cancel)
+        try:
+            return future.result()
+        except futures.CancelledError:
+            context.abort(grpc.StatusCode.CANCELLED, "RPC cancelled")
+
+    def _bridge_stream(self, agen, context):
+        """Iterate a servicer async generator from the calling thread
+
+        A client that cancels cancels the pending step, so the thread is
+        free at once rather than at the stream's next update.
+        """
+
+        async def next_item():
+            return await agen.__anext__()
+
+        async def close():
+            await agen.aclose()
+
+        cancelled = threading.Event()
+        pending = []
+
+        def cancel():
+            cancelled.set()
+            for step in pending:
+                step.cancel()
+
+        if not context.add_callback(cancel):
+            return
+        try:
+            while not cancelled.is_set():
+                step = asyncio.run_coroutine_threadsafe(next_item(), self.loop)
+                pending[:] = [step]
+                if cancelled.is_set():
+                    step.cancel()
+                try:
+                    yield step.result()
+                except (StopAsyncIteration, futures.CancelledError):
+                    return
+        finally:
+            self._bridge(close())
+
+    def Navigate(self, request, context):
+        """Navigate to URL"""
+        return self._bridge(self.servicer.Navigate(request, context), context)
+
+    def Preload(self, request, context):
+        """Load a URL in a hidden page"""
+        return self._bridge(self.servicer.Preload(request, context), context)
+
+    def Activate(self, request, context):
+        """Swap the preloaded page in"""
+        return self._bridge(self.servicer.Activate(request, context), context)
+
+    def GetURL(self, request, context):
+        """Get current URL, answered on this thread"""
+        return self.servicer.get_url_response(request)
+
+    def Screenshot(self, request, context):
+        """Take screenshot"""
+        return self._bridge(self.servicer.Screenshot(request, context), context)
+
+    def ExecuteScript(self, request, context):
+        """Execute JavaScript"""
+        return self._bridge(self.servicer.ExecuteScript(request, context), context)
+
+    def RegisterScript(self, request, context):
+        """Install a script in every page"""
+        return self._bridge(self.servicer.RegisterScript(request, context), context)
+
+    def BatchExecute(self, request, context):
+        """Run registered scripts in one round trip"""
+        return self._bridge(self.servicer.BatchExecute(request, context), context)
+
+    def GetStatus(self, request, context):
+        """Get browser status, answered on this thread"""
+        return self.servicer.get_status_response(request)
+
+    def SetDisplayConfig(self, request, context):
+        """Change the rendered and captured resolution"""
+        return self._bridge(self.servicer.SetDisplayConfig(request, context), context)
+
+    def SetRequestFilter(self, request, context):
+        """Switch a slot to a request-blocking profile"""
+        return self._bridge(self.servicer.SetRequestFilter(request, context), context)
+
+    def SetStreamConfig(self, request, context):
+        """Change the encode stage of the video transport"""
+        return self._bridge(self.servicer.SetStreamConfig(request, context), context)
+
+    def WatchStatus(self, request, context):
+        """Stream page state changes"""
+        # Holds a worker thread for the life of the stream, one of those the
+        # watch lane sets aside, so streams never take threads from reads
+        updates = self._bridge_stream(
+            self.servicer.WatchStatus(request, context), context
+        )
+        try:
+            yield from self.servicer.scheduler.watch.stream(updates)
+        except LaneFullError as e:
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(e))
+
 
 async def init_browser_manager():
     """Initialize browser manager"""
@@ -484,13 +2226,8 @@ async def init_browser_manager():
     return manager
 
 
-def serve():
-    """Start the gRPC apphost server"""
-    port = os.environ.get("PORT", "3000")
-    service_name = os.environ.get("SERVICE_NAME", "apphost")
-
-    logger.info(f"Starting apphost server: {service_name} on port {port}")
-
+def serve_threaded(port, service_name):
+    """Serve from a thread pool, bridging each RPC onto the browser loop"""
     # Initialize browser manager in event loop
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
@@ -504,8 +2241,15 @@ def serve():
     loop_thread = threading.Thread(target=run_event_loop, daemon=True)
     loop_thread.start()
 
-    # Create gRPC server
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    # Enough workers for the query, page and watch lanes to fill up with
+    # some left over for status reads
+    browser_servicer = BrowserServiceServicer(browser_manager, loop)
+    server = grpc.server(
+        futures.ThreadPoolExecutor(
+            max_workers=browser_servicer.servicer.scheduler.workers
+        ),
+        options=KEEPALIVE_OPTIONS,
+    )
 
     # Add health check service
     health_servicer = health.HealthServicer()
@@ -514,7 +2258,6 @@ def serve():
     health_servicer.set("apphost", health_pb2.HealthCheckResponse.SERVING)
 
     # Add browser service
-    browser_servicer = BrowserServiceServicer(browser_manager, loop)
     browser_pb2_grpc.add_BrowserServiceServicer_to_server(browser_servicer, server)
 
     server.add_insecure_port(f"[::]:{port}")
@@ -524,10 +2267,20 @@ def serve():
     logger.info(f"Browser ready, streaming to localhost:{int(port) + 1701}")
     print(f"AppHost {service_name} ready on port {port}")
 
+    registration = Registration.from_env(
+        browser_manager, port, service_name, browser_pb2, browser_pb2_grpc
+    )
+    if registration:
+        loop.call_soon_threadsafe(registration.start)
+
     try:
         server.wait_for_termination()
     except KeyboardInterrupt:
         logger.info("Shutting down apphost server...")
+        if registration:
+            asyncio.run_coroutine_threadsafe(registration.stop(), loop).result(
+                timeout=5
+            )
         cleanup_future = asyncio.run_coroutine_threadsafe(
             browser_manager.cleanup(), loop
         )
@@ -537,6 +2290,65 @@ def serve():
         loop_thread.join(timeout=5)
 
 
+async def serve_aio(port, service_name):
+    """Serve with grpc.aio on the same event loop as the browser manager"""
+    browser_manager = await init_browser_manager()
+
+    # RPC handlers are coroutines on this loop, so in-flight calls are not
+    # capped by a worker pool and never hop threads
+    server = grpc.aio.server(options=KEEPALIVE_OPTIONS)
+
+    # Add health check service
+    health_servicer = health.aio.HealthServicer()
+    health_pb2_grpc.add_HealthServicer_to_server(health_servicer, server)
+    await health_servicer.set("", health_pb2.HealthCheckResponse.SERVING)
+    await health_servicer.set("apphost", health_pb2.HealthCheckResponse.SERVING)
+
+    # Add browser service
+    browser_servicer = AsyncBrowserServiceServicer(browser_manager)
+    browser_pb2_grpc.add_BrowserServiceServicer_to_server(browser_servicer, server)
+
+    server.add_insecure_port(f"[::]:{port}")
+    await server.start()
+
+    logger.info(f"AppHost gRPC server (aio) started on port {port}")
+    logger.info(f"Browser ready, streaming to localhost:{int(port) + 1701}")
+    print(f"AppHost {service_name} ready on port {port}")
+
+    registration = Registration.from_env(
+        browser_manager, port, service_name, browser_pb2, browser_pb2_grpc
+    )
+    if registration:
+        registration.start()
+
+    try:
+        await server.wait_for_termination()
+    finally:
+        logger.info("Shutting down apphost server...")
+        if registration:
+            await registration.stop()
+        await browser_manager.cleanup()
+        await server.stop(0)
+
+
+def serve():
+    """Start the gRPC apphost server"""
+    port = os.environ.get("PORT", "3000")
+    service_name = os.environ.get("SERVICE_NAME", "apphost")
+    # threaded: grpc.server thread pool (default), aio: native asyncio server
+    mode = os.environ.get("GRPC_SERVER_MODE", "threaded").lower()
+
+    logger.info(f"Starting apphost server: {service_name} on port {port} ({mode} mode)")
+
+    if mode == "aio":
+        try:
+            asyncio.run(serve_aio(port, service_name))
+        except KeyboardInterrupt:
+            pass
+    else:
+        serve_threaded(port, service_name)
+
+
 if __name__ == "__main__":
     logging.basicConfig(
         level=logging.INFO,
@@ -0,0 +1,106 @@
+"""
+Visual-settle detection for navigations.
+
+networkidle never fires on dashboards that poll or stream, and
+domcontentloaded returns before anything is painted. A settle wait instead
+samples what the slot actually shows, a coarse grid of pixels from its
+frame ring or a downscaled screenshot without one, and returns once the
+samples have stayed the same for a settle window.
+
+Samples are compared against the one taken at the last change rather than
+the previous one, so slow fades still add up to a change, while
+differences confined to a small fraction of the screen (a clock, a ticker)
+stay under the threshold and do not hold the wait open.
+"""
+
+import asyncio
+import io
+import time
+
+# Samples across the width of the screen (about 160 x 90 at 16:9)
+SAMPLE_COLUMNS = 160
+
+# Per-sample difference below which a sample counts as unchanged (scaling
+# and dithering noise)
+PIXEL_TOLERANCE = 16
+
+# Resolves with the page's first (contentful) paint in ms since navigation
+# start, or null once the page has loaded and painted without one (a blank
+# page). With wait false it only reads what has been recorded so far.
+FIRST_PAINT = """
+wait => new Promise(resolve => {
+    const firstPaint = () => {
+        const entries = performance.getEntriesByType("paint");
+        const entry = entries.find(e => e.name === "first-contentful-paint")
+            || entries.find(e => e.name === "first-paint");
+        return entry ? entry.startTime : null;
+    };
+    if (!wait || firstPaint() !== null) {
+        resolve(firstPaint());
+        return;
+    }
+    new PerformanceObserver(() => resolve(firstPaint()))
+        .observe({type: "paint", buffered: true});
+    const painted = () => requestAnimationFrame(() =>
+        requestAnimationFrame(() => resolve(firstPaint())));
+    if (document.readyState === "complete") painted();
+    else addEventListener("load", painted, {once: true});
+})
+"""
+
+
+def frame_sample(frame, columns=SAMPLE_COLUMNS):
+    """Sample grid of a frame ring frame, or None if it was overwritten
+
+    Uses the luma plane of planar formats and the green channel of packed
+    ones.
+    """
+    plane = frame.planes()[0]
+    step = max(1, frame.width // columns)
+    sample = plane[::step, ::step]
+    if sample.ndim == 3:
+        sample = sample[..., 1]
+    sample = sample.copy()
+    return sample if frame.is_valid() else None
+
+
+def image_sample(data):
+    """Sample grid of an encoded (PNG or JPEG) screenshot"""
+    import numpy as np
+    from PIL import Image
+
+    return np.asarray(Image.open(io.BytesIO(data)).convert("L"))
+
+
+def changed_fraction(reference, sample, tolerance=PIXEL_TOLERANCE):
+    """Fraction of samples that differ by more than tolerance"""
+    import numpy as np
+
+    if reference is None or reference.shape != sample.shape:
+        return 1.0
+    difference = np.abs(reference.astype(np.int16) - sample)
+    return np.count_nonzero(difference > tolerance) / difference.size
+
+
+async def wait_until_settled(sample, settle_ms, deadline, threshold, interval=0.05):
+    """Poll sample() until the screen has not changed for settle_ms
+
+    sample is an async callable returning a sample grid, or None when none
+    is available yet. threshold is the fraction of the grid that must
+    differ to count as a change. Returns the monotonic time the screen last
+    changed, or None if it was still changing at deadline (monotonic).
+    """
+    reference = None
+    changed_at = time.monotonic()
+    while True:
+        current = await sample()
+        now = time.monotonic()
+        if current is not None:
+            if changed_fraction(reference, current) > threshold:
+                reference = current
+                changed_at = now
+            elif now - changed_at >= settle_ms / 1000:
+                return changed_at
+        if now >= deadline:
+            return None
+        await asyncio.sleep(min(interval, max(0.0, deadline - now)))
@@ -0,0 +1,161 @@
+"""
+Screenshots encoded from the frame ring instead of rendered by Chromium.
+
+page.screenshot() has Chromium re-render and encode on its own threads
+while the slot is also being captured. With Screenshot source "capture"
+the apphost instead copies the newest frame the capture engine already
+published to the slot's frame ring, and a SnapshotEncoder converts and
+encodes it (PNG, JPEG or WebP, optionally downscaled) on a thread pool off
+the event loop; Pillow releases the GIL while it encodes.
+
+Encoded images are kept in a small LRU cache keyed by ring and frame
+sequence (plus format options), and identical requests for a frame that is
+still being encoded share that encode. A static page whose capture
+suppresses unchanged frames keeps one sequence, so polling it for
+thumbnails costs one encode per change.
+"""
+
+import asyncio
+import io
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from framering import plane_layout
+
+SNAPSHOT_FORMATS = ("png", "jpeg", "webp")
+
+
+class FrameOverwrittenError(RuntimeError):
+    """The capture reused a ring slot while its frame was being copied"""
+
+
+def frame_image(data, width, height, fmt, stride):
+    """A Pillow RGB(A) image of a raw ring frame"""
+    import numpy as np
+    from PIL import Image
+
+    if fmt == "RGBA":
+        return Image.frombuffer("RGBA", (width, height), data, "raw", "RGBA", stride, 1)
+    if fmt in ("BGRx", "BGRA"):
+        return Image.frombuffer("RGB", (width, height), data, "raw", "BGRX", stride, 1)
+    if fmt == "RGBx":
+        return Image.frombuffer("RGB", (width, height), data, "raw", "RGBX", stride, 1)
+
+    pixels = np.frombuffer(data, dtype=np.uint8)
+    planes = [
+        pixels[offset : offset + plane_stride * rows].reshape(rows, plane_stride)
+        for offset, plane_stride, rows in plane_layout(width, height, fmt)
+    ]
+    luma = planes[0][:, :width]
+    chroma_width = (width + 1) // 2
+    if fmt == "I420":
+        cb, cr = planes[1][:, :chroma_width], planes[2][:, :chroma_width]
+    elif fmt == "NV12":
+        uv = planes[1][:, : chroma_width * 2]
+        cb, cr = uv[:, 0::2], uv[:, 1::2]
+    else:
+        raise ValueError(f"Unsupported frame format: {fmt}")
+    # 4:2:0 to 4:4:4 by repeating each chroma sample over its 2x2 block
+    cb = cb.repeat(2, axis=0).repeat(2, axis=1)[:height, :width]
+    cr = cr.repeat(2, axis=0).repeat(2, axis=1)[:height, :width]
+    return Image.fromarray(np.dstack((luma, cb, cr)), "YCbCr").convert("RGB")
+
+
+def encode_image(image, image_format="png", quality=None, max_width=0):
+    """Encode an image, first downscaling it to max_width if it is wider"""
+    from PIL import Image
+
+    if max_width and image.width > max_width:
+        height = max(1, round(image.height * max_width / image.width))
+        image = image.resize((max_width, height), Image.Resampling.BILINEAR)
+    options = {}
+    if image_format in ("jpeg", "webp"):
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        options["quality"] = quality or 80
+    output = io.BytesIO()
+    image.save(output, format=image_format.upper(), **options)
+    return output.getvalue(), image.width, image.height
+
+
+class SnapshotEncoder:
+    """Thread pool that encodes ring frames, with an LRU of the results"""
+
+    def __init__(self, workers=2, cache_entries=32):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="snapshot"
+        )
+        self.cache_entries = cache_entries
+        self.cache = OrderedDict()
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.encoded = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.encode_ms_total = 0.0
+
+    def _encode(self, frame, image_format, quality, max_width):
+        started = time.monotonic()
+        data, width, height, fmt, stride = frame
+        image = frame_image(data, width, height, fmt, stride)
+        result = encode_image(image, image_format, quality, max_width)
+        with self.lock:
+            self.encoded += 1
+            self.encode_ms_total += (time.monotonic() - started) * 1000
+        return result
+
+    async def encode(
+        self, key, copy_frame, image_format="png", quality=None, max_width=0
+    ):
+        """(data, width, height, cached) of a ring frame
+
+        key identifies the frame (ring path and sequence). copy_frame() is
+        only called on a cache miss and returns the frame copied out of the
+        ring as (data, width, height, format, stride).
+        """
+        if image_format not in SNAPSHOT_FORMATS:
+            raise ValueError(
+                f"Screenshot format must be one of {', '.join(SNAPSHOT_FORMATS)}, "
+                f"not {image_format!r}"
+            )
+        key = (*key, image_format, quality, max_width)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.cache_hits += 1
+                return (*self.cache[key], True)
+            pending = self.in_flight.get(key)
+            if pending:
+                self.coalesced += 1
+        if pending:
+            return (*await asyncio.shield(pending), True)
+
+        pending = asyncio.get_running_loop().run_in_executor(
+            self.executor, self._encode, copy_frame(), image_format, quality, max_width
+        )
+        self.in_flight[key] = pending
+        try:
+            result = await asyncio.shield(pending)
+        finally:
+            self.in_flight.pop(key, None)
+        with self.lock:
+            self.cache[key] = result
+            while len(self.cache) > self.cache_entries:
+                self.cache.popitem(last=False)
+        return (*result, False)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "encoded": self.encoded,
+                "cache_hits": self.cache_hits,
+                "coalesced": self.coalesced,
+                "avg_encode_ms": (
+                    self.encode_ms_total / self.encoded if self.encoded else 0.0
+                ),
+            }
+
+    def close(self):
+        self.executor.shutdown(wait=False)
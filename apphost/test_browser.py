@@ -38,7 +38,9 @@ async def test_browser_manager() -> Tuple[bool, str]:
         await manager.start()
 
         print("Testing basic page navigation...")
-        success, error, final_url = await manager.navigate("https://httpbin.org/html")
+        success, error, final_url, _, _ = await manager.navigate(
+            "https://httpbin.org/html"
+        )
 
         if not success:
             raise RuntimeError(f"Navigation failed: {error}")
@@ -73,6 +75,18 @@ async def test_browser_manager() -> Tuple[bool, str]:
         if not status["browser_ready"] or not status["page_loaded"]:
             raise RuntimeError("Unexpected browser status")
 
+        # Test rendering at a wall tile resolution
+        print("Testing display config...")
+        config = await manager.set_display_config(960, 540, 0.5)
+        if config != {"width": 960, "height": 540, "device_scale_factor": 0.5}:
+            raise RuntimeError(f"Unexpected display config: {config}")
+
+        inner_width, error = await manager.execute_script("window.innerWidth")
+        if error or inner_width != "1920":
+            raise RuntimeError(f"Unexpected CSS viewport width: {inner_width}")
+
+        print(f"Display config applied: {config}")
+
         print("All tests passed!")
 
         print("Cleaning up...")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the shared-memory frame ring: publish/read round trips, slot
+reuse detection, ring replacement and the capture pipe pump.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from capture import FramePump, ScreencastPump
+from framering import FrameRingReader, FrameRingWriter, frame_size, plane_layout
+
+
+def make_ring(directory, slot_count=3, width=4, height=2):
+    path = os.path.join(directory, "apphost1", "frames.ring")
+    writer = FrameRingWriter(path, frame_size(width, height), slot_count)
+    return path, writer
+
+
+def test_empty_ring_has_no_frame():
+    with tempfile.TemporaryDirectory() as directory:
+        path, writer = make_ring(directory)
+        reader = FrameRingReader(path)
+        assert reader.latest() is None
+        assert reader.wait_for_frame(timeout=0.01) is None
+
+
+def test_latest_frame_round_trip():
+    with tempfile.TemporaryDirectory() as directory:
+        path, writer = make_ring(directory)
+        reader = FrameRingReader(path)
+        for value in (1, 2):
+            writer.write(bytes([value]) * 32, 4, 2, "RGBA")
+
+        frame = reader.latest()
+        assert frame.seq == 2
+        assert (frame.width, frame.height, frame.format, frame.stride) == (
+            4,
+            2,
+            "RGBA",
+            16,
+        )
+        assert bytes(frame.data) == bytes([2]) * 32
+        assert frame.array().shape == (2, 4, 4)
+        assert frame.is_valid()
+
+
+def test_overwritten_slot_is_detected():
+    with tempfile.TemporaryDirectory() as directory:
+        path, writer = make_ring(directory, slot_count=2)
+        reader = FrameRingReader(path)
+        writer.write(b"\1" * 32, 4, 2)
+        frame = reader.latest()
+
+        writer.write(b"\2" * 32, 4, 2)
+        assert frame.is_valid()  # the other slot was used
+        writer.write(b"\3" * 32, 4, 2)
+        assert not frame.is_valid()
+        assert frame.copy() is None
+
+
+def test_slot_being_written_is_not_returned():
+    with tempfile.TemporaryDirectory() as directory:
+        path, writer = make_ring(directory, slot_count=2)
+        reader = FrameRingReader(path)
+        writer.write(b"\1" * 32, 4, 2)
+        seq, view = writer.begin()
+        view[:32] = b"\2" * 32
+
+        assert reader.latest().seq == 1
+        writer.commit(seq, 32, 4, 2, "RGBA")
+        assert reader.wait_for_frame(after_seq=1, timeout=0.1).seq == 2
+
+
+def test_planar_frames_use_gstreamer_layout():
+    # Odd widths pad every plane's stride to a multiple of 4
+    assert plane_layout(6, 3, "I420") == [(0, 8, 3), (32, 4, 2), (40, 4, 2)]
+    assert frame_size(6, 3, "NV12") == 8 * 4 + 8 * 2
+    assert frame_size(1920, 1080, "I420") == 1920 * 1080 * 3 // 2
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "frames.ring")
+        writer = FrameRingWriter(path, frame_size(6, 3, "NV12"))
+        writer.write(bytes(range(48)), 6, 3, "NV12")
+        frame = FrameRingReader(path).latest()
+        assert frame.stride == 8
+        luma, chroma = frame.planes()
+        assert luma.shape == (3, 6) and luma[1, 0] == 8
+        assert chroma.shape == (2, 3, 2) and chroma[1, 0].tolist() == [40, 41]
+
+
+def test_replaced_ring_is_detected():
+    with tempfile.TemporaryDirectory() as directory:
+        path, writer = make_ring(directory)
+        reader = FrameRingReader(path)
+        assert not reader.replaced()
+        make_ring(directory)
+        assert reader.replaced()
+
+
+def test_non_ring_file_is_rejected():
+    with tempfile.NamedTemporaryFile() as handle:
+        handle.write(b"\0" * 4096)
+        handle.flush()
+        try:
+            FrameRingReader(handle.name)
+        except ValueError:
+            return
+        raise AssertionError("expected ValueError")
+
+
+def test_pump_copies_frames_from_pipe():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "frames.ring")
+        read_fd, write_fd = os.pipe()
+        pump = FramePump(read_fd, path, 4, 2, "RGBA", slot_count=2)
+        pump.start()
+        reader = FrameRingReader(path)
+
+        # Frames arrive in arbitrary chunks, as they do from a pipe
+        os.write(write_fd, b"\1" * 20)
+        os.write(write_fd, b"\1" * 12 + b"\2" * 32)
+        os.close(write_fd)
+        pump.thread.join(5)
+
+        assert pump.frames == 2
+        assert bytes(reader.latest().data) == b"\2" * 32
+
+
+def test_pump_suppresses_unchanged_frames():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "frames.ring")
+        read_fd, write_fd = os.pipe()
+        pump = FramePump(
+            read_fd,
+            path,
+            4,
+            2,
+            "RGBA",
+            slot_count=2,
+            source_format="BGRx",
+            suppress_unchanged=True,
+            keepalive=60,
+        )
+        pump.start()
+        reader = FrameRingReader(path)
+
+        bgrx = bytes([1, 2, 3, 0]) * 8
+        for frame in (bgrx, bgrx, bgrx, bytes([9, 8, 7, 0]) * 8):
+            os.write(write_fd, frame)
+        os.close(write_fd)
+        pump.thread.join(5)
+
+        assert pump.frames == 2
+        assert reader.stats()["frames_captured"] == 4
+        assert reader.stats()["frames_suppressed"] == 2
+        assert reader.stats()["bytes_saved"] == 64
+        # Published frames were converted to RGBA
+        assert bytes(reader.latest().data) == bytes([7, 8, 9, 255]) * 8
+
+
+def test_screencast_pump_decodes_frames():
+    import io
+
+    from PIL import Image
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "frames.ring")
+        pump = ScreencastPump(path, 4, 2, "BGRx")
+        reader = FrameRingReader(path)
+
+        encoded = io.BytesIO()
+        Image.new("RGB", (4, 2), (10, 20, 30)).save(encoded, "PNG")
+        assert pump.publish(encoded.getvalue()) == 1
+        frame = reader.latest()
+        assert (frame.width, frame.height, frame.format) == (4, 2, "BGRx")
+        assert bytes(frame.data)[:3] == bytes([30, 20, 10])
+
+        # Frames larger than the ring slots are dropped, not truncated
+        encoded = io.BytesIO()
+        Image.new("RGB", (8, 2)).save(encoded, "PNG")
+        assert pump.publish(encoded.getvalue()) is None
+        assert reader.stats()["frames_captured"] == 1
+        assert pump.frames_captured == 2 and pump.frames == 1
+        pump.stop()
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        started = time.monotonic()
+        try:
+            test()
+            print(f"✅ {test.__name__} ({(time.monotonic() - started) * 1000:.1f} ms)")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -58,7 +58,9 @@ async def test_full_pipeline() -> Tuple[bool, str]:
 
         # Test navigation
         print("Testing browser navigation...")
-        success, error, final_url = await manager.navigate("https://httpbin.org/html")
+        success, error, final_url, _, _ = await manager.navigate(
+            "https://httpbin.org/html"
+        )
 
         if not success:
             raise RuntimeError(f"Navigation failed: {error}")
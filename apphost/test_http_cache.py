@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the shared HTTP cache: freshness rules, revalidation, fetch
+deduplication within and across apphosts, lock hand-off for responses
+that are not stored, and LRU eviction.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from http_cache import HttpCache, cacheable_request, freshness_lifetime
+
+URL = "https://dashboards.example/app.js"
+
+
+class Origin:
+    """Fetch stand-in that counts requests and answers with fixed headers"""
+
+    def __init__(
+        self, headers, body=b"console.log(1)", delay=0.0, etag=None, body_delay=0.0
+    ):
+        self.headers = headers
+        self.body = body
+        self.delay = delay
+        self.body_delay = body_delay
+        self.etag = etag
+        self.requests = []
+
+    async def read_body(self):
+        await asyncio.sleep(self.body_delay)
+        return self.body
+
+    async def fetch(self, conditional):
+        self.requests.append(conditional)
+        await asyncio.sleep(self.delay)
+        if self.etag and conditional.get("if-none-match") == self.etag:
+            return 304, {"cache-control": "max-age=60"}, self.read_body
+        headers = dict(self.headers)
+        if self.etag:
+            headers["etag"] = self.etag
+        return 200, headers, self.read_body
+
+
+def test_freshness_lifetime():
+    now = time.time()
+    assert freshness_lifetime({"cache-control": "public, max-age=300"}, now) == 300
+    assert freshness_lifetime({"cache-control": "max-age=300, s-maxage=60"}, now) == 60
+    assert freshness_lifetime({"cache-control": "no-cache"}, now) == 0
+    assert freshness_lifetime({"cache-control": "no-store"}, now) is None
+    assert freshness_lifetime({"cache-control": "private, max-age=60"}, now) is None
+    headers = {
+        "date": "Mon, 01 Jan 2024 00:00:00 GMT",
+        "expires": "Mon, 01 Jan 2024 00:10:00 GMT",
+    }
+    assert freshness_lifetime(headers, now) == 600
+    headers = {
+        "date": "Mon, 01 Jan 2024 00:00:00 GMT",
+        "last-modified": "Sun, 31 Dec 2023 00:00:00 GMT",
+    }
+    assert abs(freshness_lifetime(headers, now) - 8640) < 1
+    assert freshness_lifetime({}, now) == 0
+
+
+def test_fresh_response_is_served_from_disk():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = HttpCache(directory, 1 << 20)
+        origin = Origin({"cache-control": "max-age=60", "content-encoding": "gzip"})
+
+        async def run():
+            first = await cache.get(URL, origin.fetch)
+            second = await cache.get(URL, origin.fetch)
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert len(origin.requests) == 1
+        assert second[0] == 200 and second[2] == origin.body
+        # Playwright hands over decoded bodies; the encoding is not replayed
+        assert "content-encoding" not in second[1]
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["stored"]) == (1, 1, 1)
+        assert stats["bytes_saved"] == len(origin.body) and stats["hit_rate"] == 0.5
+
+
+def test_uncacheable_responses_are_not_stored():
+    for headers in (
+        {"cache-control": "no-store"},
+        {"cache-control": "private, max-age=60"},
+        {"cache-control": "max-age=60", "set-cookie": "session=1"},
+        {"cache-control": "max-age=60", "vary": "Cookie"},
+        {},  # neither freshness nor validators
+    ):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = HttpCache(directory, 1 << 20)
+            origin = Origin(headers)
+
+            async def run():
+                await cache.get(URL, origin.fetch)
+                await cache.get(URL, origin.fetch)
+
+            asyncio.run(run())
+            assert len(origin.requests) == 2, headers
+
+
+def test_stale_response_is_revalidated():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = HttpCache(directory, 1 << 20)
+        origin = Origin({"cache-control": "no-cache"}, etag='"v1"')
+
+        async def run():
+            await cache.get(URL, origin.fetch)
+            return await cache.get(URL, origin.fetch)
+
+        status, _, body = asyncio.run(run())
+        assert (status, body) == (200, origin.body)
+        assert origin.requests == [{}, {"if-none-match": '"v1"'}]
+        assert cache.stats()["revalidated"] == 1
+        # The 304 made it fresh for its max-age
+        assert cache.load(URL)["expires"] > time.time() + 50
+
+
+def test_concurrent_misses_fetch_once():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = HttpCache(directory, 1 << 20)
+        origin = Origin({"cache-control": "max-age=60"}, delay=0.05)
+
+        async def run():
+            return await asyncio.gather(
+                *(cache.get(URL, origin.fetch) for _ in range(16))
+            )
+
+        responses = asyncio.run(run())
+        assert len(origin.requests) == 1
+        assert all(body == origin.body for _, _, body in responses)
+        assert cache.stats()["coalesced"] == 15
+
+
+def test_apphosts_sharing_a_directory_fetch_once():
+    with tempfile.TemporaryDirectory() as directory:
+        # Two caches on one directory stand in for two apphost processes
+        caches = [HttpCache(directory, 1 << 20) for _ in range(2)]
+        origin = Origin({"cache-control": "max-age=60"}, delay=0.05)
+
+        async def run():
+            await asyncio.gather(*(cache.get(URL, origin.fetch) for cache in caches))
+
+        asyncio.run(run())
+        assert len(origin.requests) == 1
+        assert sum(cache.stats()["hits"] for cache in caches) == 1
+
+
+def test_unstored_response_releases_the_lock_before_its_body():
+    with tempfile.TemporaryDirectory() as directory:
+        caches = [HttpCache(directory, 1 << 20) for _ in range(2)]
+        # A long poll: headers at once, the body much later
+        poll = Origin({"cache-control": "no-store"}, body_delay=0.5)
+        origin = Origin({"cache-control": "max-age=60"})
+        other = "https://dashboards.example/other.js"
+        cache_hash = caches[0]._url_hash
+        # Find a URL sharing the long poll's lock stripe
+        while cache_hash(other)[:3] != cache_hash(URL)[:3]:
+            other += "x"
+
+        async def run():
+            polling = asyncio.ensure_future(caches[0].get(URL, poll.fetch))
+            await asyncio.sleep(0.05)
+            started = time.monotonic()
+            await caches[1].get(other, origin.fetch)
+            waited = time.monotonic() - started
+            await polling
+            return waited
+
+        assert asyncio.run(run()) < 0.2
+
+
+def test_lock_wait_is_bounded():
+    with tempfile.TemporaryDirectory() as directory:
+        caches = [HttpCache(directory, 1 << 20, lock_wait=0.1) for _ in range(2)]
+        # Storable, so the first fetch keeps the lock for its whole body
+        slow = Origin({"cache-control": "max-age=60"}, body_delay=1.0)
+        origin = Origin({"cache-control": "max-age=60"})
+
+        async def run():
+            hung = asyncio.ensure_future(caches[0].get(URL, slow.fetch))
+            await asyncio.sleep(0.05)
+            started = time.monotonic()
+            status, _, body = await caches[1].get(URL, origin.fetch)
+            waited = time.monotonic() - started
+            await hung
+            return status, body, waited
+
+        status, body, waited = asyncio.run(run())
+        assert (status, body) == (200, origin.body)
+        assert 0.05 < waited < 0.5
+
+
+def test_streams_and_api_calls_bypass_the_cache():
+    assert cacheable_request("GET", URL, {}, "script")
+    for resource_type in ("media", "websocket", "eventsource", "fetch", "xhr"):
+        assert not cacheable_request("GET", URL, {}, resource_type)
+    assert not cacheable_request("POST", URL, {}, "script")
+    assert not cacheable_request("GET", URL, {"range": "bytes=0-1"}, "script")
+
+
+def test_eviction_drops_least_recently_used():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = HttpCache(directory, 3000)
+        headers = {"cache-control": "max-age=60"}
+        for index in range(4):
+            cache.store(f"{URL}?{index}", 200, headers, bytes([index]) * 1000)
+            os.utime(
+                cache._entry_path(cache._url_hash(f"{URL}?{index}")),
+                (index, index),
+            )
+        # Using entry 0 makes entry 1 the least recently used
+        assert cache.load(f"{URL}?0") is not None
+
+        assert cache.evict() == 2
+        assert cache.load(f"{URL}?0") is not None
+        assert cache.load(f"{URL}?1") is None
+        assert cache.load(f"{URL}?2") is None
+        assert cache.load(f"{URL}?3") is not None
+
+
+def test_identical_bodies_are_stored_once():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = HttpCache(directory, 1 << 20)
+        headers = {"cache-control": "max-age=60"}
+        cache.store(f"{URL}?a", 200, headers, b"same bundle")
+        cache.store(f"{URL}?b", 200, headers, b"same bundle")
+        objects = [
+            name
+            for _, _, names in os.walk(os.path.join(directory, "objects"))
+            for name in names
+        ]
+        assert len(objects) == 1
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        started = time.monotonic()
+        try:
+            test()
+            print(f"✅ {test.__name__} ({(time.monotonic() - started) * 1000:.1f} ms)")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
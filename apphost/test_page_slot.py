@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+"""
+Tests for a page slot's operations without a browser: latest-wins
+navigation and preload, Playwright timeouts capped by the RPC deadline,
+and which slot an RPC reaches.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from server import (
+    DEADLINE_MARGIN_MS,
+    AsyncBrowserServiceServicer,
+    BrowserManager,
+    PageSlot,
+    browser_pb2,
+    deadline_timeout_ms,
+    rpc_timeout,
+)
+
+
+def fake_manager(slot_count=1):
+    return SimpleNamespace(
+        width=1280,
+        height=720,
+        device_scale_factor=1.0,
+        default_stream_config={},
+        default_filter="none",
+        request_filter=lambda profile: SimpleNamespace(name=profile),
+        slot_count=slot_count,
+    )
+
+
+def fake_slot(slot=None):
+    """A PageSlot whose navigations and preloads sleep for the URL's last part"""
+    slot = slot or PageSlot(fake_manager(), 0)
+    slot.page = object()
+
+    async def navigate(url, timeout_ms, *args):
+        await asyncio.sleep(float(url.rsplit("/", 1)[-1]))
+        return True, None, url, 1, 0
+
+    async def preload(url, timeout_ms, wait_until_load):
+        await asyncio.sleep(float(url.rsplit("/", 1)[-1]))
+        return True, None, url, 1
+
+    slot._navigate = navigate
+    slot._preload = preload
+    return slot
+
+
+class Context:
+    """gRPC servicer context stand-in with a fixed deadline"""
+
+    def __init__(self, remaining=None):
+        self.remaining = remaining
+
+    def time_remaining(self):
+        return self.remaining
+
+
+def test_newer_navigation_cancels_the_one_in_flight():
+    slot = fake_slot()
+
+    async def run():
+        older = asyncio.ensure_future(slot.navigate("https://a/10"))
+        await asyncio.sleep(0.01)
+        started = time.monotonic()
+        newer = await slot.navigate("https://b/0.01")
+        return await older, newer, time.monotonic() - started
+
+    older, newer, elapsed = asyncio.run(run())
+    assert older[:2] == (False, "Superseded by a newer navigation")
+    assert newer[:3] == (True, None, "https://b/0.01")
+    assert elapsed < 0.5, "waited for the superseded navigation"
+    assert slot.superseded == {"navigation": 1, "preload": 0}
+    assert slot.operations == {}
+
+
+def test_preload_does_not_cancel_a_navigation():
+    slot = fake_slot()
+
+    async def run():
+        navigation = asyncio.ensure_future(slot.navigate("https://a/0.05"))
+        await asyncio.sleep(0.01)
+        preload = await slot.preload("https://b/0.01")
+        return await navigation, preload
+
+    navigation, preload = asyncio.run(run())
+    assert navigation[0] and preload[0]
+    assert slot.superseded == {"navigation": 0, "preload": 0}
+
+    async def preloads():
+        older = asyncio.ensure_future(slot.preload("https://c/10"))
+        await asyncio.sleep(0.01)
+        newer = await slot.preload("https://d/0.01")
+        return await older, newer
+
+    older, newer = asyncio.run(preloads())
+    assert older[:2] == (False, "Superseded by a newer preload") and newer[0]
+    assert slot.superseded == {"navigation": 0, "preload": 1}
+
+
+def test_timeout_is_capped_by_the_deadline():
+    assert deadline_timeout_ms(Context(), 20000) == 20000
+    assert deadline_timeout_ms(Context(), 0) == 30000
+    # 10 s left: the margin comes off before the cap
+    assert deadline_timeout_ms(Context(10), 20000) == 10000 - DEADLINE_MARGIN_MS
+    assert deadline_timeout_ms(Context(60), 20000) == 20000
+    # A margin never takes more than a quarter of what is left
+    assert deadline_timeout_ms(Context(0.4), 20000) == 300
+    assert deadline_timeout_ms(Context(0), 20000) == 1
+    assert rpc_timeout(Context()) == 60
+    assert rpc_timeout(Context(10)) == (10000 - DEADLINE_MARGIN_MS) / 1000
+
+
+def test_navigate_rpc_passes_the_capped_timeout():
+    calls = []
+
+    class Manager:
+        slot_count = 1
+
+        async def navigate(self, url, timeout_ms, *args, **kwargs):
+            calls.append(timeout_ms)
+            return True, None, url, 1, 0
+
+        async def supersede(self, operation, slot=0):
+            pass
+
+    servicer = AsyncBrowserServiceServicer(Manager())
+    request = browser_pb2.NavigateRequest(url="https://a", timeout_ms=30000)
+
+    async def run():
+        return await servicer.Navigate(request, Context(5))
+
+    response = asyncio.run(run())
+    assert response.success
+    assert calls == [5000 - DEADLINE_MARGIN_MS]
+
+
+def test_rpcs_reach_their_slot_and_reject_unknown_ones():
+    os.environ["PAGE_SLOTS"] = "2"
+    try:
+        manager = BrowserManager()
+    finally:
+        del os.environ["PAGE_SLOTS"]
+    for slot in manager.slots:
+        fake_slot(slot)
+    servicer = AsyncBrowserServiceServicer(manager)
+    assert [lane.name for lane in servicer.scheduler.pages] == ["page:0", "page:1"]
+
+    async def navigate(slot, url):
+        request = browser_pb2.NavigateRequest(url=url, slot=slot)
+        return await servicer.Navigate(request, Context(5))
+
+    async def run():
+        # A slow navigation of slot 0 neither blocks nor supersedes slot 1
+        first = asyncio.ensure_future(navigate(0, "https://a/0.1"))
+        await asyncio.sleep(0.01)
+        second = await navigate(1, "https://b/0")
+        return (
+            await first,
+            second,
+            [await navigate(slot, "https://c/0") for slot in (2, -1)],
+        )
+
+    first, second, unknown = asyncio.run(run())
+    assert first.success and first.final_url == "https://a/0.1"
+    assert second.success and second.final_url == "https://b/0"
+    assert [slot.superseded["navigation"] for slot in manager.slots] == [0, 0]
+    for slot, response in zip((2, -1), unknown):
+        assert not response.success
+        assert response.error == f"No page slot {slot}; this apphost has 2"
+    try:
+        manager.slot(2)
+    except ValueError as e:
+        assert "No page slot 2" in str(e)
+    else:
+        raise AssertionError("slot 2 of 2 was accepted")
+    assert manager.slot(1) is manager.slots[1]
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        started = time.monotonic()
+        try:
+            test()
+            print(f"✅ {test.__name__} ({(time.monotonic() - started) * 1000:.1f} ms)")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+"""
+Tests for request-blocking profiles: rule matching, counters, load-time
+savings and profile files.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from request_filter import RequestFilter, filter_stats, load_profiles
+
+
+def test_domains_match_subdomains_only():
+    request_filter = RequestFilter("test", block_domains=["doubleclick.net"])
+    assert request_filter.match("https://doubleclick.net/x", "script") == "domain"
+    assert request_filter.match("https://ad.g.doubleclick.net/x", "image") == "domain"
+    assert request_filter.match("https://notdoubleclick.net/x", "script") is None
+    assert request_filter.match("https://doubleclick.net.example/x", "script") is None
+
+
+def test_types_and_patterns():
+    request_filter = RequestFilter(
+        "test", block_types=["font", "media"], block_patterns=["*/ads/*", "*vast*.xml*"]
+    )
+    assert request_filter.match("https://cdn.example/a.woff2", "font") == "type"
+    assert request_filter.match("https://news.example/ads/banner.js", "script") == (
+        "pattern"
+    )
+    assert request_filter.match("https://x.example/vast3.xml?id=1", "xhr") == "pattern"
+    assert request_filter.match("https://news.example/app.js", "script") is None
+
+
+def test_builtin_profiles():
+    profiles = load_profiles()
+    assert not profiles["none"].blocks_anything
+    tracker = "https://www.google-analytics.com/g/collect"
+    assert profiles["trackers"].match(tracker, "ping") == "type"
+    assert profiles["trackers"].match(tracker, "script") == "domain"
+    assert profiles["trackers"].match("https://cdn.example/a.woff2", "font") is None
+    assert profiles["lite"].match("https://cdn.example/a.woff2", "font") == "type"
+
+
+def test_counters_and_load_savings():
+    profiles = load_profiles()
+    lite = profiles["lite"]
+    for url, resource_type in (
+        ("https://cdn.example/app.js", "script"),
+        ("https://cdn.example/a.woff2", "font"),
+        ("https://www.googletagmanager.com/gtm.js", "script"),
+    ):
+        lite.check(url, resource_type)
+    profiles["none"].record_load(1200)
+    profiles["none"].record_load(1000)
+    lite.record_load(700)
+
+    stats = {entry["profile"]: entry for entry in filter_stats(profiles)}
+    assert stats["lite"]["requests"] == 3 and stats["lite"]["blocked"] == 2
+    assert stats["lite"]["blocked_by_reason"] == {"domain": 1, "type": 1, "pattern": 0}
+    assert stats["lite"]["avg_load_ms"] == 700
+    assert stats["lite"]["load_ms_saved"] == 400
+    # No loads under a profile, no claimed savings
+    assert stats["trackers"]["load_ms_saved"] == 0
+
+
+def test_profile_file_extends_builtins():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "profiles.json")
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "wall": {
+                        "block_domains": ["chat.example"],
+                        "block_types": ["media"],
+                    },
+                    "lite": {"block_types": ["image"]},
+                },
+                f,
+            )
+        profiles = load_profiles(path)
+        assert set(profiles) == {"none", "trackers", "lite", "wall"}
+        assert profiles["wall"].match("https://widget.chat.example/x", "script")
+        assert profiles["lite"].match("https://cdn.example/a.woff2", "font") is None
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        started = time.monotonic()
+        try:
+            test()
+            print(f"✅ {test.__name__} ({(time.monotonic() - started) * 1000:.1f} ms)")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the RPC scheduler: bounded lanes, queue limits, wait-time
+accounting, reads that never wait behind page work, per-slot page lanes
+and the watch lane's stream allowance.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scheduler import READ_WORKERS, LaneFullError, Scheduler
+
+
+def test_lane_bounds_concurrency_and_counts_waits():
+    scheduler = Scheduler(page_concurrency=2, page_queue=8)
+    running = []
+    peak = []
+
+    async def work():
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.05)
+        running.pop()
+
+    async def run():
+        await asyncio.gather(*(scheduler.page().run(work) for _ in range(6)))
+
+    started = time.monotonic()
+    asyncio.run(run())
+    assert max(peak) == 2
+    assert 0.14 < time.monotonic() - started < 0.3
+    stats = scheduler.page().stats()
+    assert (stats["completed"], stats["queued"], stats["running"]) == (6, 0, 0)
+    # Two ran at once, two waited one turn and two waited two
+    assert 90 < stats["max_wait_ms"] < 150, stats
+    assert 40 < stats["avg_wait_ms"] < 80, stats
+
+
+def test_full_lane_rejects_at_once():
+    scheduler = Scheduler(page_concurrency=1, page_queue=2)
+
+    async def run():
+        release = asyncio.Event()
+        calls = [
+            asyncio.ensure_future(scheduler.page().run(release.wait)) for _ in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        try:
+            await scheduler.page().run(release.wait)
+        except LaneFullError as e:
+            rejected = str(e)
+        else:
+            rejected = None
+        stats = scheduler.page().stats()
+        release.set()
+        await asyncio.gather(*calls)
+        return rejected, stats
+
+    rejected, stats = asyncio.run(run())
+    assert rejected == "page:0 lane full: 1 running, 2 queued"
+    assert (stats["running"], stats["queued"], stats["rejected"]) == (1, 2, 1)
+    assert scheduler.page().stats()["completed"] == 3
+
+
+def test_cancelled_while_queued_leaves_the_queue():
+    scheduler = Scheduler(page_concurrency=1, page_queue=4)
+
+    async def run():
+        release = asyncio.Event()
+        first = asyncio.ensure_future(scheduler.page().run(release.wait))
+        queued = asyncio.ensure_future(scheduler.page().run(release.wait))
+        await asyncio.sleep(0.01)
+        queued.cancel()
+        await asyncio.sleep(0.01)
+        stats = scheduler.page().stats()
+        release.set()
+        await first
+        return stats
+
+    stats = asyncio.run(run())
+    assert (stats["running"], stats["queued"]) == (1, 0)
+    assert scheduler.page().stats()["completed"] == 1
+
+
+def test_reads_do_not_wait_behind_page_work():
+    scheduler = Scheduler(page_concurrency=1, page_queue=8)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    calls = [
+        asyncio.run_coroutine_threadsafe(
+            scheduler.page().run(lambda: asyncio.sleep(0.2)), loop
+        )
+        for _ in range(4)
+    ]
+    time.sleep(0.05)
+    started = time.monotonic()
+    assert scheduler.read.call(lambda: "about:blank") == "about:blank"
+    assert time.monotonic() - started < 0.01
+    for call in calls:
+        call.result()
+    loop.call_soon_threadsafe(loop.stop)
+
+    lanes = {stats["lane"]: stats for stats in scheduler.stats()}
+    assert lanes["read"]["completed"] == 1 and lanes["read"]["max_wait_ms"] == 0
+    assert lanes["page:0"]["completed"] == 4
+
+
+def test_slots_do_not_wait_for_each_other():
+    scheduler = Scheduler(page_concurrency=1, page_queue=4, slot_count=2)
+
+    async def run():
+        release = asyncio.Event()
+        busy = asyncio.ensure_future(scheduler.page(0).run(release.wait))
+        await asyncio.sleep(0.01)
+        started = time.monotonic()
+        await scheduler.page(1).run(lambda: asyncio.sleep(0))
+        waited = time.monotonic() - started
+        release.set()
+        await busy
+        return waited
+
+    assert asyncio.run(run()) < 0.01
+    try:
+        scheduler.page(2)
+    except ValueError as e:
+        assert "this apphost has 2" in str(e)
+    else:
+        raise AssertionError("no error for a slot that does not exist")
+
+
+def test_supersede_runs_before_waiting_for_a_turn():
+    scheduler = Scheduler(page_concurrency=1, page_queue=4)
+
+    async def run():
+        older = asyncio.ensure_future(scheduler.page().run(lambda: asyncio.sleep(3600)))
+        await asyncio.sleep(0.01)
+
+        async def supersede():
+            older.cancel()
+            await asyncio.wait({older})
+
+        started = time.monotonic()
+        result = await scheduler.page().run(
+            lambda: asyncio.sleep(0, "newer"), supersede=supersede
+        )
+        return result, time.monotonic() - started, older.cancelled()
+
+    result, waited, cancelled = asyncio.run(run())
+    assert result == "newer" and cancelled
+    assert waited < 0.05
+    assert scheduler.page().stats()["completed"] == 2
+
+
+def test_full_watch_lane_rejects_streams():
+    scheduler = Scheduler(status_streams=1)
+    first = scheduler.watch.stream(iter(["initial", "heartbeat"]))
+    assert next(first) == "initial"
+    try:
+        next(scheduler.watch.stream(iter(["initial"])))
+    except LaneFullError as e:
+        assert str(e) == "watch lane full: 1 running, 0 queued"
+    else:
+        raise AssertionError("a second stream got in")
+    first.close()
+    assert next(scheduler.watch.stream(iter(["initial"]))) == "initial"
+    assert scheduler.watch.stats()["rejected"] == 1
+
+
+def test_workers_leave_room_for_reads_and_streams():
+    scheduler = Scheduler(
+        page_concurrency=4,
+        page_queue=8,
+        query_concurrency=2,
+        query_queue=8,
+        slot_count=2,
+        status_streams=3,
+    )
+    assert scheduler.workers == 2 * 12 + 10 + 3 + READ_WORKERS
+
+
+def test_page_lanes_default_to_two_calls_per_slot():
+    os.environ.pop("LANE_PAGE_CONCURRENCY", None)
+    scheduler = Scheduler.from_env(slot_count=3)
+    assert [lane.concurrency for lane in scheduler.pages] == [2, 2, 2]
+    assert [lane["lane"] for lane in scheduler.stats()] == [
+        "read",
+        "query",
+        "page:0",
+        "page:1",
+        "page:2",
+        "watch",
+    ]
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        started = time.monotonic()
+        try:
+            test()
+            print(f"✅ {test.__name__} ({(time.monotonic() - started) * 1000:.1f} ms)")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
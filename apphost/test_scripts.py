@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+"""
+Tests for registered scripts: content-derived handles, the registry bound,
+batch accounting and call argument parsing.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scripts import ScriptRegistry, install_script, parse_args, script_handle
+
+ADD = "(a, b) => a + b"
+
+
+def test_handles_follow_the_source():
+    assert script_handle(ADD) == script_handle(ADD)
+    assert script_handle(ADD) != script_handle("(a, b) => a - b")
+    assert script_handle(ADD).isidentifier()
+
+
+def test_registering_again_returns_the_same_handle():
+    registry = ScriptRegistry()
+    handle, new = registry.add(ADD, "add")
+    assert new and handle in registry
+    assert registry.add(ADD, "sum") == (handle, False)
+    assert registry.source(handle) == ADD
+    assert registry.stats()["registered"] == 1
+
+
+def test_registry_is_bounded():
+    registry = ScriptRegistry(max_scripts=2)
+    registry.add("() => 1")
+    registry.add("() => 2")
+    assert registry.add("() => 1")[1] is False
+    try:
+        registry.add("() => 3")
+    except ValueError as e:
+        assert "At most 2" in str(e)
+    else:
+        raise AssertionError("Third script registered")
+
+
+def test_installs_define_every_script():
+    registry = ScriptRegistry()
+    handle, _ = registry.add(ADD)
+    other, _ = registry.add("() => document.title")
+    installs = registry.installs()
+    assert installs == [
+        install_script(handle, ADD),
+        install_script(other, "() => document.title"),
+    ]
+    assert f'["{handle}"] = ({ADD});' in installs[0]
+
+
+def test_batches_count_calls_and_errors():
+    registry = ScriptRegistry()
+    registry.record([{"value": 3}, {"error": "Error: boom"}])
+    registry.record([{"value": None}])
+    assert registry.stats() == {
+        "registered": 0,
+        "batches": 2,
+        "calls": 3,
+        "errors": 1,
+    }
+
+
+def test_parse_args():
+    assert parse_args("") == []
+    assert parse_args('[1, "a", null]') == [1, "a", None]
+    assert parse_args('{"x": 1}') == [{"x": 1}]
+    assert parse_args("[[1, 2]]") == [[1, 2]]
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        started = time.monotonic()
+        try:
+            test()
+            print(f"✅ {test.__name__} ({(time.monotonic() - started) * 1000:.1f} ms)")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
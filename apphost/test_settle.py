@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+"""
+Tests for visual-settle detection: sampling ring frames, change tolerance,
+and when a settle wait returns.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from framering import FrameRingReader, FrameRingWriter, frame_size
+from settle import changed_fraction, frame_sample, wait_until_settled
+
+THRESHOLD = 0.01
+
+
+class Screen:
+    """Sampler stand-in whose content changes on a schedule
+
+    frames is a list of (seconds since start, sample) in order; sample()
+    returns the newest one due.
+    """
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.started = time.monotonic()
+
+    async def sample(self):
+        elapsed = time.monotonic() - self.started
+        due = [sample for at, sample in self.frames if at <= elapsed]
+        return due[-1] if due else None
+
+
+def grid(value, shape=(90, 160)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def settle(screen, settle_ms=100, timeout=1.0):
+    async def run():
+        return await wait_until_settled(
+            screen.sample,
+            settle_ms,
+            time.monotonic() + timeout,
+            THRESHOLD,
+            interval=0.01,
+        )
+
+    settled_at = asyncio.run(run())
+    return None if settled_at is None else settled_at - screen.started
+
+
+def test_changed_fraction():
+    base = grid(100)
+    assert changed_fraction(None, base) == 1.0
+    assert changed_fraction(base, grid(110)) == 0.0  # within tolerance
+    assert changed_fraction(base, grid(200)) == 1.0
+    clock = base.copy()
+    clock[:5, :10] = 255
+    assert 0 < changed_fraction(base, clock) < THRESHOLD
+    assert changed_fraction(base, grid(100, (45, 80))) == 1.0
+
+
+def test_settles_after_last_change():
+    screen = Screen([(0.0, grid(0)), (0.05, grid(80)), (0.15, grid(160))])
+    started = time.monotonic()
+    settled = settle(screen)
+    assert 0.14 < settled < 0.2, settled
+    assert 0.25 < time.monotonic() - started < 0.4
+
+
+def test_small_changes_do_not_hold_the_wait():
+    frames = [(0.0, grid(0))]
+    for tick in range(1, 50):
+        clock = grid(0)
+        clock[:5, :10] = tick * 5  # a ticking clock in one corner
+        frames.append((tick * 0.02, clock))
+    settled = settle(Screen(frames))
+    assert settled is not None and settled < 0.05, settled
+
+
+def test_slow_fade_counts_as_change():
+    # Each step is within the pixel tolerance, but they add up
+    frames = [(step * 0.02, grid(step * 5)) for step in range(16)]
+    settled = settle(Screen(frames))
+    assert settled is not None and settled > 0.2, settled
+
+
+def test_never_settling_times_out():
+    frames = [(step * 0.02, grid(step * 40 % 256)) for step in range(100)]
+    started = time.monotonic()
+    assert settle(Screen(frames), timeout=0.3) is None
+    assert time.monotonic() - started < 0.45
+
+
+def test_frame_sample_reads_the_ring():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "frames.ring")
+        width, height = 320, 180
+        for fmt in ("RGBA", "I420"):
+            writer = FrameRingWriter(path, frame_size(width, height, fmt))
+            data = bytearray(frame_size(width, height, fmt))
+            if fmt == "RGBA":
+                data[1::4] = bytes([200]) * (width * height)  # green
+            else:
+                data[: width * height] = bytes([200]) * (width * height)  # luma
+            writer.write(bytes(data), width, height, fmt)
+            reader = FrameRingReader(path)
+            sample = frame_sample(reader.latest(), columns=80)
+            assert sample.shape == (45, 80), (fmt, sample.shape)
+            assert (sample == 200).all(), fmt
+            reader.close()
+            writer.close()
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        started = time.monotonic()
+        try:
+            test()
+            print(f"✅ {test.__name__} ({(time.monotonic() - started) * 1000:.1f} ms)")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
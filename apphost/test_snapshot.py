@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+"""
+Tests for capture screenshots: frame conversion from every ring format,
+downscaling, and the snapshot cache.
+"""
+
+import asyncio
+import io
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from framering import frame_size, plane_layout
+from snapshot import SnapshotEncoder, encode_image, frame_image
+
+WIDTH, HEIGHT = 64, 36
+# Left half red, right half blue
+RED, BLUE = (220, 30, 30), (30, 30, 220)
+
+
+def sample_image():
+    pixels = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    pixels[:, : WIDTH // 2] = RED
+    pixels[:, WIDTH // 2 :] = BLUE
+    return Image.fromarray(pixels, "RGB")
+
+
+def raw_frame(fmt):
+    """sample_image() packed as a ring frame of fmt"""
+    image = sample_image()
+    if fmt == "RGBA":
+        return image.convert("RGBA").tobytes()
+    if fmt == "BGRx":
+        return image.tobytes("raw", "BGRX")
+    ycbcr = np.asarray(image.convert("YCbCr"))
+    data = bytearray(frame_size(WIDTH, HEIGHT, fmt))
+    (y_offset, y_stride, _), *chroma = plane_layout(WIDTH, HEIGHT, fmt)
+    for row in range(HEIGHT):
+        start = y_offset + row * y_stride
+        data[start : start + WIDTH] = ycbcr[row, :, 0].tobytes()
+    cb, cr = ycbcr[::2, ::2, 1], ycbcr[::2, ::2, 2]
+    if fmt == "I420":
+        for (offset, stride, rows), plane in zip(chroma, (cb, cr)):
+            for row in range(rows):
+                start = offset + row * stride
+                data[start : start + plane.shape[1]] = plane[row].tobytes()
+    else:
+        offset, stride, rows = chroma[0]
+        uv = np.dstack((cb, cr)).reshape(rows, -1)
+        for row in range(rows):
+            start = offset + row * stride
+            data[start : start + uv.shape[1]] = uv[row].tobytes()
+    return bytes(data)
+
+
+def test_every_ring_format_converts():
+    for fmt in ("RGBA", "BGRx", "I420", "NV12"):
+        stride = plane_layout(WIDTH, HEIGHT, fmt)[0][1]
+        image = frame_image(raw_frame(fmt), WIDTH, HEIGHT, fmt, stride).convert("RGB")
+        left, right = image.getpixel((4, 4)), image.getpixel((WIDTH - 4, 4))
+        for got, want in ((left, RED), (right, BLUE)):
+            assert all(abs(a - b) <= 6 for a, b in zip(got, want)), (fmt, got)
+
+
+def test_encode_downscales_and_formats():
+    for image_format in ("png", "jpeg", "webp"):
+        data, width, height = encode_image(sample_image(), image_format, 70, 32)
+        assert (width, height) == (32, 18)
+        decoded = Image.open(io.BytesIO(data))
+        assert decoded.format == image_format.upper() and decoded.size == (32, 18)
+    # Never upscaled
+    assert encode_image(sample_image(), "png", max_width=640)[1:] == (WIDTH, HEIGHT)
+
+
+def test_cache_hits_by_frame_sequence():
+    encoder = SnapshotEncoder(workers=2, cache_entries=2)
+    copies = []
+
+    def copy_frame():
+        copies.append(1)
+        return raw_frame("RGBA"), WIDTH, HEIGHT, "RGBA", WIDTH * 4
+
+    async def run():
+        first = await encoder.encode(("ring", 1, 7), copy_frame, "jpeg")
+        again = await encoder.encode(("ring", 1, 7), copy_frame, "jpeg")
+        other_format = await encoder.encode(("ring", 1, 7), copy_frame, "png")
+        return first, again, other_format
+
+    first, again, other_format = asyncio.run(run())
+    assert not first[3] and again[3] and not other_format[3]
+    assert first[0] == again[0] and first[0] != other_format[0]
+    # The frame is only copied out of the ring on a miss
+    assert len(copies) == 2
+    stats = encoder.stats()
+    assert (stats["encoded"], stats["cache_hits"]) == (2, 1)
+    assert stats["avg_encode_ms"] > 0
+    encoder.close()
+
+
+def test_cache_evicts_least_recently_used():
+    encoder = SnapshotEncoder(workers=1, cache_entries=2)
+
+    def copy_frame():
+        return raw_frame("RGBA"), WIDTH, HEIGHT, "RGBA", WIDTH * 4
+
+    async def run():
+        for seq in (1, 2, 1, 3):
+            await encoder.encode(("ring", 1, seq), copy_frame)
+        return [
+            (await encoder.encode(("ring", 1, seq), copy_frame))[3] for seq in (1, 2)
+        ]
+
+    assert asyncio.run(run()) == [True, False]
+    encoder.close()
+
+
+def test_concurrent_requests_share_one_encode():
+    encoder = SnapshotEncoder(workers=2)
+    gate = threading.Event()
+
+    def copy_frame():
+        return raw_frame("RGBA"), WIDTH, HEIGHT, "RGBA", WIDTH * 4
+
+    encode = encoder._encode
+
+    def slow_encode(*args):
+        gate.wait(1)
+        return encode(*args)
+
+    encoder._encode = slow_encode
+
+    async def run():
+        requests = [
+            asyncio.ensure_future(encoder.encode(("ring", 1, 9), copy_frame))
+            for _ in range(8)
+        ]
+        await asyncio.sleep(0.02)
+        gate.set()
+        return await asyncio.gather(*requests)
+
+    results = asyncio.run(run())
+    assert len({data for data, *_ in results}) == 1
+    stats = encoder.stats()
+    assert (stats["encoded"], stats["coalesced"]) == (1, 7)
+    encoder.close()
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        started = time.monotonic()
+        try:
+            test()
+            print(f"✅ {test.__name__} ({(time.monotonic() - started) * 1000:.1f} ms)")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
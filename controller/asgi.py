@@ -0,0 +1,589 @@
+"""
+ASGI front end for the controller's HTTP API.
+
+create_http_api() serves the API from Flask's development server: a thread
+per request, each blocked on a synchronous gRPC call, so dashboard polling
+and automation traffic queue behind one another. create_asgi_app() serves
+the same routes, with the same bodies and status codes, from Starlette
+under uvicorn. Handlers are coroutines on one event loop and call the
+apphosts through grpc.aio stubs, so one process holds thousands of
+concurrent requests without a thread each.
+
+The wrapped ControllerService still owns the URL table, the streamed
+apphost state and the playlists (whose threads keep using its synchronous
+stubs). AsyncController reuses its request building and result shaping;
+only the transport differs.
+
+serve() in server.py picks this front end with CONTROLLER_HTTP=asgi (the
+default) and Flask with CONTROLLER_HTTP=flask. bench_http.py compares them.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import grpc
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from channels import CHANNEL_OPTIONS
+from http_api import (
+    RPC_SLACK,
+    encode_event,
+    parse_assignments,
+    parse_display_config,
+    parse_layout,
+    parse_slot,
+    parse_stream_config,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncController:
+    """ControllerService's apphost calls over grpc.aio
+
+    Methods return what their ControllerService namesakes do.
+    """
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.browser_pb2 = controller.browser_pb2
+        # apphost name -> (address, channel, stub)
+        self.channels = {}
+        self.targets = None
+
+    @property
+    def stubs(self):
+        """Stubs of the registered apphosts; call on the serving loop"""
+        targets = self.controller.apphost_targets
+        if targets is not self.targets and self.controller.browser_pb2_grpc:
+            self._sync(targets)
+        return {name: entry[2] for name, entry in self.channels.items()}
+
+    def _sync(self, targets):
+        """Follow the registry: open channels to new or moved apphosts"""
+        self.targets = targets
+        for apphost_name, (address, channel, _) in list(self.channels.items()):
+            if targets.get(apphost_name) != address:
+                del self.channels[apphost_name]
+                asyncio.ensure_future(channel.close())
+        for apphost_name, address in targets.items():
+            if apphost_name not in self.channels:
+                channel = grpc.aio.insecure_channel(address, options=CHANNEL_OPTIONS)
+                stub = self.controller.browser_pb2_grpc.BrowserServiceStub(channel)
+                self.channels[apphost_name] = (address, channel, stub)
+
+    async def open(self):
+        """Open a channel to every apphost; call on the serving loop"""
+        if self.controller.browser_pb2_grpc:
+            self._sync(self.controller.apphost_targets)
+
+    async def close(self):
+        channels = [entry[1] for entry in self.channels.values()]
+        self.channels = {}
+        self.targets = None
+        await asyncio.gather(*(channel.close() for channel in channels))
+
+    async def _call(self, apphost_name, method, request, timeout):
+        """One RPC through the apphost's circuit breaker (see channels.py)"""
+        breaker = self.controller._breaker(apphost_name)
+        if breaker:
+            breaker.check()
+        try:
+            response = await getattr(self.stubs[apphost_name], method)(
+                request, timeout=timeout
+            )
+        except grpc.RpcError as e:
+            if breaker:
+                breaker.record(e.code())
+            raise
+        if breaker:
+            breaker.record(grpc.StatusCode.OK)
+        return response
+
+    async def navigate_apphost_timed(
+        self,
+        apphost_name,
+        url,
+        timeout_ms=30000,
+        wait_until_load=False,
+        slot=0,
+        filter_profile="",
+        wait_until="",
+        settle_ms=0,
+    ):
+        if apphost_name not in self.stubs:
+            return False, f"Apphost {apphost_name} not found", None
+
+        try:
+            request = self.browser_pb2.NavigateRequest(
+                url=url,
+                timeout_ms=timeout_ms,
+                wait_until_load=wait_until_load,
+                slot=slot,
+                filter_profile=filter_profile,
+                wait_until=wait_until,
+                settle_ms=settle_ms,
+            )
+            response = await self._call(
+                apphost_name, "Navigate", request, timeout_ms / 1000 + RPC_SLACK
+            )
+            return self.controller._navigated(apphost_name, request, response)
+        except Exception as e:
+            logger.error(f"Navigation failed for {apphost_name}: {e}")
+            return False, str(e), None
+
+    async def preload_apphost(
+        self, apphost_name, url, timeout_ms=30000, wait_until_load=False, slot=0
+    ):
+        if apphost_name not in self.stubs:
+            return False, f"Apphost {apphost_name} not found"
+
+        try:
+            request = self.browser_pb2.PreloadRequest(
+                url=url,
+                timeout_ms=timeout_ms,
+                wait_until_load=wait_until_load,
+                slot=slot,
+            )
+            response = await self._call(
+                apphost_name, "Preload", request, timeout_ms / 1000 + RPC_SLACK
+            )
+            return self.controller._preloaded(apphost_name, request, response)
+        except Exception as e:
+            logger.error(f"Preload failed for {apphost_name}: {e}")
+            return False, str(e)
+
+    async def activate_apphost(self, apphost_name, url="", slot=0):
+        if apphost_name not in self.stubs:
+            return False, f"Apphost {apphost_name} not found"
+
+        try:
+            request = self.browser_pb2.ActivateRequest(url=url, slot=slot)
+            response = await self._call(apphost_name, "Activate", request, 10)
+            return self.controller._activated(apphost_name, request, response)
+        except Exception as e:
+            logger.error(f"Activate failed for {apphost_name}: {e}")
+            return False, str(e)
+
+    async def get_apphost_url(self, apphost_name):
+        controller = self.controller
+        if apphost_name not in self.stubs:
+            return None, f"Apphost {apphost_name} not found"
+
+        state = controller._live_state(apphost_name)
+        if state:
+            return state["url"], None
+
+        try:
+            response = await self._call(
+                apphost_name, "GetURL", self.browser_pb2.GetURLRequest(), 5
+            )
+            controller.apphost_urls[apphost_name] = response.url
+            return response.url, None
+        except Exception as e:
+            logger.error(f"Get URL failed for {apphost_name}: {e}")
+            return controller.apphost_urls.get(apphost_name, "about:blank"), str(e)
+
+    async def _dispatch(self, method, requests, deadline):
+        """ControllerService._dispatch() on the event loop
+
+        Yields (key, response, error, elapsed_ms) in completion order.
+        """
+        started = time.monotonic()
+
+        async def call(key, request):
+            apphost_name = self.controller._apphost_of(key)
+            try:
+                if apphost_name not in self.stubs:
+                    # Deregistered since the requests were built
+                    return key, None, f"Apphost {apphost_name} not found", 0
+                response = await self._call(apphost_name, method, request, deadline)
+                error = None
+            except grpc.RpcError as e:
+                logger.error(f"{method} failed for {apphost_name}: {e.details()}")
+                response, error = None, e.details() or str(e.code())
+            elapsed_ms = round((time.monotonic() - started) * 1000)
+            return key, response, error, elapsed_ms
+
+        calls = [call(key, request) for key, request in requests.items()]
+        for completed in asyncio.as_completed(calls):
+            yield await completed
+
+    async def _dispatch_all(self, method, requests, deadline):
+        return [result async for result in self._dispatch(method, requests, deadline)]
+
+    async def get_all_urls(self, deadline=5):
+        result, requests = self.controller._url_requests()
+        return self.controller._url_results(
+            result, await self._dispatch_all("GetURL", requests, deadline)
+        )
+
+    async def navigate_all(
+        self, url, timeout_ms=30000, wait_until_load=False, deadline=60
+    ):
+        controller = self.controller
+        requests = controller._navigate_all_requests(url, timeout_ms, wait_until_load)
+        return controller._navigate_all_results(
+            requests, await self._dispatch_all("Navigate", requests, deadline)
+        )
+
+    def assign(self, assignments, deadline=None, **options):
+        """An async iterator of results; raises ValueError up front"""
+        unknown, requests, deadline = self.controller._assign_requests(
+            assignments, deadline, options
+        )
+        return self._assign_results(unknown, requests, deadline)
+
+    async def _assign_results(self, unknown, requests, deadline):
+        controller = self.controller
+        for result in unknown:
+            yield result
+        async for apphost_name, response, error, elapsed_ms in self._dispatch(
+            "Navigate", requests, deadline
+        ):
+            yield controller._assign_result(
+                apphost_name, requests[apphost_name], response, error, elapsed_ms
+            )
+
+    async def apply_layout(
+        self, cols, rows, width, height, device_scale_factor=0, deadline=30, slot=None
+    ):
+        return await self.set_display_config(
+            None, width // cols, height // rows, device_scale_factor, deadline, slot
+        )
+
+    async def set_display_config(
+        self,
+        apphost_names,
+        width,
+        height,
+        device_scale_factor=0,
+        deadline=30,
+        slot=None,
+    ):
+        controller = self.controller
+        results, requests = controller._display_requests(
+            apphost_names, width, height, device_scale_factor, slot
+        )
+        return controller._display_results(
+            results, await self._dispatch_all("SetDisplayConfig", requests, deadline)
+        )
+
+    async def set_stream_config(
+        self, apphost_names=None, deadline=30, slot=None, **config
+    ):
+        controller = self.controller
+        results, requests = controller._stream_config_requests(
+            apphost_names, slot, config
+        )
+        return controller._stream_config_results(
+            results, await self._dispatch_all("SetStreamConfig", requests, deadline)
+        )
+
+    async def set_request_filter(
+        self, profile, apphost_names=None, slot=0, deadline=10
+    ):
+        controller = self.controller
+        results, requests = controller._named_requests(
+            apphost_names,
+            self.browser_pb2.RequestFilterRequest(profile=profile, slot=slot),
+        )
+        return controller._filter_results(
+            results, await self._dispatch_all("SetRequestFilter", requests, deadline)
+        )
+
+
+async def _json_body(request):
+    """The request's JSON object, or {} if it has none"""
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def create_asgi_app(controller):
+    """The HTTP API of create_http_api() as a Starlette application"""
+    api = AsyncController(controller)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await api.open()
+        try:
+            yield
+        finally:
+            await api.close()
+
+    async def health(request):
+        return JSONResponse({"status": "healthy"})
+
+    async def get_registry(request):
+        """Registered apphosts, their last heartbeat and circuit state"""
+        return JSONResponse(controller.registry_status())
+
+    async def get_all_apphosts(request):
+        """Get all apphost URLs"""
+        return JSONResponse(await api.get_all_urls())
+
+    async def get_apphost(request):
+        """Get specific apphost URL"""
+        url, error = await api.get_apphost_url(request.path_params["apphost_name"])
+        if error:
+            return JSONResponse({"url": url, "error": error})
+        return JSONResponse({"url": url})
+
+    async def set_apphost(request):
+        """Navigate specific apphost to URL"""
+        data = await _json_body(request)
+        if "url" not in data:
+            return JSONResponse({"error": "Missing 'url' in request body"}, 400)
+
+        success, message, timings = await api.navigate_apphost_timed(
+            request.path_params["apphost_name"],
+            data["url"],
+            data.get("timeout_ms", 30000),
+            data.get("wait_until_load", False),
+            data.get("slot", 0),
+            data.get("filter_profile", ""),
+            data.get("wait_until", ""),
+            data.get("settle_ms", 0),
+        )
+        if success:
+            return JSONResponse({"success": True, "url": message, **timings})
+        return JSONResponse({"success": False, "error": message}, 500)
+
+    async def preload_apphost(request):
+        """Load a URL in a hidden page of an apphost slot"""
+        data = await _json_body(request)
+        if "url" not in data:
+            return JSONResponse({"error": "Missing 'url' in request body"}, 400)
+
+        success, message = await api.preload_apphost(
+            request.path_params["apphost_name"],
+            data["url"],
+            data.get("timeout_ms", 30000),
+            data.get("wait_until_load", False),
+            data.get("slot", 0),
+        )
+        if success:
+            return JSONResponse({"success": True, "url": message})
+        return JSONResponse({"success": False, "error": message}, 500)
+
+    async def activate_apphost(request):
+        """Swap the preloaded page of an apphost slot in"""
+        data = await _json_body(request)
+        success, message = await api.activate_apphost(
+            request.path_params["apphost_name"],
+            data.get("url", ""),
+            data.get("slot", 0),
+        )
+        if success:
+            return JSONResponse({"success": True, "url": message})
+        return JSONResponse({"success": False, "error": message}, 500)
+
+    async def start_playlist(request):
+        """Cycle an apphost slot through preloaded URLs"""
+        data = await _json_body(request)
+        try:
+            # Replacing a playlist waits for the old one's thread
+            status = await asyncio.to_thread(
+                controller.start_playlist,
+                request.path_params["apphost_name"],
+                data.get("entries", []),
+                int(data.get("slot", 0)),
+                float(data.get("preload_lead_s", 5.0)),
+                bool(data.get("loop", True)),
+            )
+        except KeyError as e:
+            return JSONResponse({"error": str(e.args[0])}, 404)
+        except (TypeError, ValueError) as e:
+            return JSONResponse({"error": f"Invalid playlist: {e}"}, 400)
+        return JSONResponse(status)
+
+    async def stop_playlist(request):
+        """Stop the playlist of an apphost slot"""
+        try:
+            slot = int(request.query_params.get("slot", 0))
+        except ValueError:
+            slot = 0
+        stopped = await asyncio.to_thread(
+            controller.stop_playlist, request.path_params["apphost_name"], slot
+        )
+        if not stopped:
+            return JSONResponse({"error": "No playlist running"}, 404)
+        return JSONResponse({"success": True})
+
+    async def get_playlists(request):
+        """Status of every playlist"""
+        return JSONResponse(controller.playlist_status())
+
+    async def navigate_all_apphosts(request):
+        """Navigate slot 0 of every apphost to the same URL"""
+        data = await _json_body(request)
+        if "url" not in data:
+            return JSONResponse({"error": "Missing 'url' in request body"}, 400)
+
+        results = await api.navigate_all(
+            data["url"],
+            data.get("timeout_ms", 30000),
+            data.get("wait_until_load", False),
+            data.get("deadline", 60),
+        )
+        return JSONResponse(results)
+
+    async def assign_apphosts(request):
+        """Navigate apphosts to their own URLs, streaming each result"""
+        data = await _json_body(request)
+        try:
+            assignments, options = parse_assignments(data)
+            deadline = float(data["deadline"]) if "deadline" in data else None
+            assigned = api.assign(assignments, deadline, **options)
+        except (TypeError, ValueError) as e:
+            return JSONResponse({"error": str(e)}, 400)
+        sse = (
+            "text/event-stream" in request.headers.get("accept", "")
+            or request.query_params.get("format") == "sse"
+        )
+
+        async def results():
+            started = time.monotonic()
+            succeeded = failed = 0
+            async for result in assigned:
+                if result["success"]:
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield encode_event("result", result, sse)
+            yield encode_event(
+                "done",
+                {
+                    "done": True,
+                    "succeeded": succeeded,
+                    "failed": failed,
+                    "elapsed_ms": round((time.monotonic() - started) * 1000),
+                },
+                sse,
+            )
+
+        return StreamingResponse(
+            results(),
+            media_type="text/event-stream" if sse else "application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    async def set_apphost_display(request):
+        """Resize every slot of a specific apphost, or the given slot"""
+        data = await _json_body(request)
+        try:
+            display = parse_display_config(data)
+            slot = parse_slot(data)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, 400)
+
+        apphost_name = request.path_params["apphost_name"]
+        results = await api.set_display_config([apphost_name], *display, slot=slot)
+        result = results[apphost_name]
+        return JSONResponse(result, 200 if result["success"] else 500)
+
+    async def set_apphost_stream(request):
+        """Set the encode stage of a specific apphost"""
+        try:
+            config = parse_stream_config(await _json_body(request))
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, 400)
+
+        apphost_name = request.path_params["apphost_name"]
+        result = (await api.set_stream_config([apphost_name], **config))[apphost_name]
+        return JSONResponse(result, 200 if result["success"] else 500)
+
+    async def set_all_streams(request):
+        """Set the encode stage of all apphosts"""
+        data = await _json_body(request)
+        try:
+            config = parse_stream_config(data)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, 400)
+
+        results = await api.set_stream_config(
+            deadline=data.get("deadline", 30), **config
+        )
+        return JSONResponse(results)
+
+    async def set_apphost_filter(request):
+        """Switch an apphost slot to a request-blocking profile"""
+        data = await _json_body(request)
+        if "profile" not in data:
+            return JSONResponse({"error": "Missing 'profile' in request body"}, 400)
+
+        apphost_name = request.path_params["apphost_name"]
+        result = (
+            await api.set_request_filter(
+                data["profile"], [apphost_name], data.get("slot", 0)
+            )
+        )[apphost_name]
+        return JSONResponse(result, 200 if result["success"] else 500)
+
+    async def set_all_filters(request):
+        """Switch a slot of every apphost to a request-blocking profile"""
+        data = await _json_body(request)
+        if "profile" not in data:
+            return JSONResponse({"error": "Missing 'profile' in request body"}, 400)
+
+        results = await api.set_request_filter(
+            data["profile"], slot=data.get("slot", 0), deadline=data.get("deadline", 10)
+        )
+        return JSONResponse(results)
+
+    async def set_layout(request):
+        """Render every apphost at the tile size of a wall layout"""
+        data = await _json_body(request)
+        try:
+            layout = parse_layout(data)
+            slot = parse_slot(data)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, 400)
+
+        results = await api.apply_layout(
+            *layout, deadline=data.get("deadline", 30), slot=slot
+        )
+        return JSONResponse(results)
+
+    routes = [
+        Route("/health", health, methods=["GET"]),
+        Route("/registry", get_registry, methods=["GET"]),
+        Route("/apphosts", get_all_apphosts, methods=["GET"]),
+        Route("/apphost/{apphost_name}", get_apphost, methods=["GET"]),
+        Route("/apphost/{apphost_name}", set_apphost, methods=["POST"]),
+        Route("/apphost/{apphost_name}/preload", preload_apphost, methods=["POST"]),
+        Route("/apphost/{apphost_name}/activate", activate_apphost, methods=["POST"]),
+        Route("/apphost/{apphost_name}/playlist", start_playlist, methods=["POST"]),
+        Route("/apphost/{apphost_name}/playlist", stop_playlist, methods=["DELETE"]),
+        Route("/playlists", get_playlists, methods=["GET"]),
+        Route("/apphosts/navigate", navigate_all_apphosts, methods=["POST"]),
+        Route("/apphosts/assign", assign_apphosts, methods=["POST"]),
+        Route("/apphost/{apphost_name}/display", set_apphost_display, methods=["POST"]),
+        Route("/apphost/{apphost_name}/stream", set_apphost_stream, methods=["POST"]),
+        Route("/apphosts/stream", set_all_streams, methods=["POST"]),
+        Route("/apphost/{apphost_name}/filter", set_apphost_filter, methods=["POST"]),
+        Route("/apphosts/filter", set_all_filters, methods=["POST"]),
+        Route("/layout", set_layout, methods=["POST"]),
+    ]
+    return Starlette(routes=routes, lifespan=lifespan)
+
+
+def serve_asgi(controller, port, host="0.0.0.0"):
+    """Serve create_asgi_app() with uvicorn until the process exits"""
+    import uvicorn
+
+    config = uvicorn.Config(
+        create_asgi_app(controller),
+        host=host,
+        port=port,
+        log_level="warning",
+        access_log=False,
+    )
+    uvicorn.Server(config).run()
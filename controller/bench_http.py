@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+
+"""
+Load test of the controller's HTTP front ends: Flask's development server
+(create_http_api) against the ASGI app (asgi.py) under uvicorn.
+
+Each front end runs in its own process with a ControllerService wired to
+simulated apphosts, served from a third process, that answer GetURL after a
+fixed delay. Status streams are off, so every status request costs apphost
+RPCs, as it does whenever a stream is down; with --streams the controller
+instead holds live state for every apphost and answers without RPCs, which
+measures the HTTP layer alone. A load generator in this process keeps N
+requests to GET /apphosts and GET /apphost/<name> in flight over keep-alive
+connections and reports requests/s and latency percentiles.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent import futures
+
+import grpc
+
+# Add current directory to import path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, "/app")
+
+try:
+    import browser_pb2
+    import browser_pb2_grpc
+    import server
+except ImportError as e:
+    print(f"Failed to import the controller: {e}")
+    sys.exit(1)
+
+
+class SimulatedApphost(browser_pb2_grpc.BrowserServiceServicer):
+    """Apphost stand-in that answers GetURL after a fixed delay"""
+
+    def __init__(self, name, delay):
+        self.url = f"https://{name}.example/"
+        self.delay = delay
+
+    def GetURL(self, request, context):
+        time.sleep(self.delay)
+        return browser_pb2.GetURLResponse(url=self.url)
+
+
+class BenchController(server.ControllerService):
+    """ControllerService connected to simulated apphosts on local ports"""
+
+    def __init__(self, base_port, apphosts, streams=False):
+        self.base_port = base_port
+        self.apphost_count = apphosts
+        self.streams = streams
+        super().__init__()
+
+    def _setup_apphost_connections(self):
+        self.browser_pb2 = browser_pb2
+        self.browser_pb2_grpc = browser_pb2_grpc
+        for index in range(self.apphost_count):
+            apphost_name = f"apphost{index + 1}"
+            target = f"127.0.0.1:{self.base_port + index}"
+            self.registry.heartbeat(apphost_name, target, static=True)
+
+    def _start_status_watchers(self):
+        """With streams, state that stays fresh; otherwise none"""
+        if not self.streams:
+            return
+        for apphost_name in self.apphost_clients:
+            self.apphost_state[apphost_name] = {
+                "url": f"https://{apphost_name}.example/",
+                "updated": float("inf"),
+            }
+
+
+def serve_apphosts(args):
+    """Run the simulated apphosts until killed"""
+    apphosts = []
+    for index in range(args.apphosts):
+        apphost = grpc.server(futures.ThreadPoolExecutor(max_workers=32))
+        browser_pb2_grpc.add_BrowserServiceServicer_to_server(
+            SimulatedApphost(f"apphost{index + 1}", args.rpc_delay / 1000), apphost
+        )
+        apphost.add_insecure_port(f"127.0.0.1:{args.grpc_port + index}")
+        apphost.start()
+        apphosts.append(apphost)
+    apphosts[0].wait_for_termination()
+
+
+def serve(args):
+    """Run one front end until killed"""
+    controller = BenchController(args.grpc_port, args.apphosts, args.streams)
+    if args.serve == "asgi":
+        from asgi import serve_asgi
+
+        serve_asgi(controller, args.port, host="127.0.0.1")
+    else:
+        app = server.create_http_api(controller)
+        logging.getLogger("werkzeug").disabled = True
+        app.run(host="127.0.0.1", port=args.port, debug=False, use_reloader=False)
+
+
+class Connection:
+    """A minimal HTTP/1.1 client connection, reopened when the server closes"""
+
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def get(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                "127.0.0.1", self.port
+            )
+        self.writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode("ascii")
+        )
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        headers = {}
+        for line in head.decode("latin-1").split("\r\n")[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip().lower()
+        if "content-length" in headers:
+            await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            await self.reader.read()
+            headers["connection"] = "close"
+        if head.startswith(b"HTTP/1.0") or headers.get("connection") == "close":
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def load(port, paths, concurrency, duration):
+    """(latencies in ms, errors, elapsed s) of `concurrency` request loops"""
+    latencies = []
+    errors = 0
+    stop_at = time.monotonic() + duration
+
+    async def client(offset):
+        nonlocal errors
+        connection = Connection(port)
+        turn = offset
+        while time.monotonic() < stop_at:
+            path = paths[turn % len(paths)]
+            turn += 1
+            started = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(connection.get(path), timeout=30)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                connection.close()
+                errors += 1
+                continue
+            if status != 200:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+        connection.close()
+
+    started = time.monotonic()
+    await asyncio.gather(*(client(offset) for offset in range(concurrency)))
+    return latencies, errors, time.monotonic() - started
+
+
+def wait_for_health(port, process, timeout=20):
+    async def probe():
+        return await Connection(port).get("/health")
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Front end exited during startup")
+        try:
+            if asyncio.run(probe()) == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("Front end did not come up")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def spawn(role, args, port=None):
+    """This script in another process, serving `role`"""
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--serve",
+        role,
+        "--grpc-port",
+        str(args.grpc_port),
+        "--apphosts",
+        str(args.apphosts),
+        "--rpc-delay",
+        str(args.rpc_delay),
+    ]
+    if port:
+        command += ["--port", str(port)]
+    if args.streams:
+        command.append("--streams")
+    return subprocess.Popen(command)
+
+
+def run_front_end(name, port, args):
+    process = spawn(name, args, port)
+    try:
+        wait_for_health(port, process)
+        paths = ["/apphosts"] + [
+            f"/apphost/apphost{index + 1}" for index in range(args.apphosts)
+        ]
+        for concurrency in args.concurrency:
+            latencies, errors, elapsed = asyncio.run(
+                load(port, paths, concurrency, args.duration)
+            )
+            if not latencies:
+                print(f"{name:<6} c={concurrency:<5} no successful requests")
+                continue
+            print(
+                f"{name:<6} c={concurrency:<5} "
+                f"{len(latencies) / elapsed:8.0f} req/s "
+                f"p50={statistics.median(latencies):8.2f}ms "
+                f"p99={percentile(latencies, 99):8.2f}ms "
+                f"errors={errors}"
+            )
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--serve", choices=("apphosts", "flask", "asgi"), help=argparse.SUPPRESS
+    )
+    parser.add_argument("--port", type=int, default=5900)
+    parser.add_argument("--grpc-port", type=int, default=3950)
+    parser.add_argument("--apphosts", type=int, default=4)
+    parser.add_argument(
+        "--rpc-delay", type=float, default=5.0, help="GetURL latency (ms)"
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument(
+        "--streams", action="store_true", help="answer status from live state"
+    )
+    args = parser.parse_args()
+
+    if args.serve == "apphosts":
+        serve_apphosts(args)
+        return 0
+    if args.serve:
+        serve(args)
+        return 0
+
+    if args.streams:
+        print(f"{args.apphosts} apphosts with live status streams", end="")
+    else:
+        print(
+            f"{args.apphosts} apphosts answering GetURL in {args.rpc_delay} ms", end=""
+        )
+    print(f", {args.duration}s per concurrency level")
+    apphosts = spawn("apphosts", args)
+    try:
+        run_front_end("flask", args.port, args)
+        run_front_end("asgi", args.port + 1, args)
+    finally:
+        apphosts.terminate()
+        apphosts.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Failure-aware channels from the controller to its apphosts.
+
+A bare insecure_channel makes a dead or hung apphost cost every request its
+full deadline. ManagedChannel wraps the channel to each apphost with:
+
+- keepalive pings, so a silently dropped connection is noticed in seconds
+  rather than at the next deadline, and tuned reconnect backoff
+- a service-config retry policy: calls that fail UNAVAILABLE before
+  reaching the apphost are retried twice with backoff, throttled so a dead
+  apphost does not multiply the traffic aimed at it
+- a circuit breaker: after CIRCUIT_FAILURES consecutive UNAVAILABLE or
+  DEADLINE_EXCEEDED results, or as soon as the channel reports
+  TRANSIENT_FAILURE, calls fail at once with CircuitOpenError (an
+  UNAVAILABLE RpcError) instead of waiting out their deadlines
+- a background prober that, while the circuit is open, asks the apphost's
+  grpc_health service for "apphost" (every CIRCUIT_PROBE_S seconds, backing
+  off to 30, and at once when the channel reconnects) and closes the
+  circuit when it answers SERVING
+
+Every call through the channel's stubs passes the breaker, so the
+controller's blocking calls, _dispatch futures and WatchStatus streams
+fail fast alike. The ASGI front end's grpc.aio channels use
+CHANNEL_OPTIONS and go through the same breaker.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+import grpc
+from grpc_health.v1 import health_pb2, health_pb2_grpc
+
+logger = logging.getLogger(__name__)
+
+# Results that say the apphost, not the request, is in trouble
+FAILURE_CODES = frozenset(
+    {grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED}
+)
+
+# Retry calls that never reached the apphost; the token bucket stops
+# retrying after a run of failures and refills with successes
+SERVICE_CONFIG = json.dumps(
+    {
+        "methodConfig": [
+            {
+                "name": [{"service": "browser.BrowserService"}],
+                "retryPolicy": {
+                    "maxAttempts": 3,
+                    "initialBackoff": "0.1s",
+                    "maxBackoff": "1s",
+                    "backoffMultiplier": 2,
+                    "retryableStatusCodes": ["UNAVAILABLE"],
+                },
+            }
+        ],
+        "retryThrottling": {"maxTokens": 10, "tokenRatio": 0.1},
+    }
+)
+
+# Apphosts accept pings this often (see KEEPALIVE_OPTIONS in apphost/server.py)
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 20000),
+    ("grpc.keepalive_timeout_ms", 5000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.initial_reconnect_backoff_ms", 500),
+    ("grpc.min_reconnect_backoff_ms", 500),
+    ("grpc.max_reconnect_backoff_ms", 5000),
+    ("grpc.enable_retries", 1),
+    ("grpc.service_config", SERVICE_CONFIG),
+]
+
+MAX_PROBE_INTERVAL = 30
+
+
+class CircuitOpenError(grpc.RpcError):
+    """Raised instead of calling an apphost whose circuit is open"""
+
+    def __init__(self, breaker):
+        super().__init__()
+        self.message = (
+            f"{breaker.name} unavailable: circuit open for "
+            f"{time.monotonic() - breaker.opened_at:.1f} s ({breaker.reason})"
+        )
+
+    def code(self):
+        return grpc.StatusCode.UNAVAILABLE
+
+    def details(self):
+        return self.message
+
+    def __str__(self):
+        return self.message
+
+
+class CircuitBreaker:
+    """Closed while an apphost answers; open (failing fast) while it does not
+
+    Only the health prober closes an open circuit.
+    """
+
+    def __init__(self, name, failure_threshold=3):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.reason = ""
+        self.opened_at = None
+        self.trips = 0
+        self.rejected = 0
+        # Set while closed
+        self.healthy = threading.Event()
+        self.healthy.set()
+        self.on_open = None
+
+    @property
+    def open(self):
+        return not self.healthy.is_set()
+
+    def check(self):
+        """Raise CircuitOpenError if calls should fail fast"""
+        if self.open:
+            self.rejected += 1
+            raise CircuitOpenError(self)
+
+    def record(self, code):
+        """Count the status code of a finished call"""
+        if code in FAILURE_CODES:
+            with self.lock:
+                self.failures += 1
+                failures = self.failures
+            if failures >= self.failure_threshold:
+                self.trip(f"{failures} consecutive {code.name}")
+        elif code is not None and code != grpc.StatusCode.CANCELLED:
+            self.failures = 0
+
+    def trip(self, reason):
+        with self.lock:
+            if self.open:
+                return
+            self.healthy.clear()
+            self.reason = reason
+            self.opened_at = time.monotonic()
+            self.trips += 1
+        logger.warning(f"Circuit for {self.name} open: {reason}")
+        if self.on_open:
+            self.on_open()
+
+    def reset(self):
+        with self.lock:
+            if not self.open:
+                return
+            self.failures = 0
+            self.healthy.set()
+        logger.info(
+            f"Circuit for {self.name} closed after "
+            f"{time.monotonic() - self.opened_at:.1f} s"
+        )
+
+    def status(self):
+        return {
+            "circuit": "open" if self.open else "closed",
+            "reason": self.reason if self.open else "",
+            "open_s": round(time.monotonic() - self.opened_at, 1) if self.open else 0,
+            "failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+class BreakerInterceptor(
+    grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor
+):
+    """Fail calls fast while the circuit is open; count their results"""
+
+    def __init__(self, breaker):
+        self.breaker = breaker
+
+    def _intercept(self, continuation, client_call_details, request):
+        self.breaker.check()
+        outcome = continuation(client_call_details, request)
+        outcome.add_done_callback(lambda call: self.breaker.record(call.code()))
+        return outcome
+
+    intercept_unary_unary = _intercept
+    intercept_unary_stream = _intercept
+
+
+class ManagedChannel:
+    """A keepalive, retrying channel to one apphost behind a circuit breaker
+
+    .channel is the guarded channel for stubs; close() stops everything.
+    """
+
+    def __init__(self, address, failure_threshold=None, probe_interval=None):
+        self.address = address
+        if failure_threshold is None:
+            failure_threshold = int(os.environ.get("CIRCUIT_FAILURES", "3"))
+        if probe_interval is None:
+            probe_interval = float(os.environ.get("CIRCUIT_PROBE_S", "1"))
+        self.probe_interval = probe_interval
+        self.raw = grpc.insecure_channel(address, options=CHANNEL_OPTIONS)
+        self.breaker = CircuitBreaker(address, failure_threshold)
+        self.channel = grpc.intercept_channel(
+            self.raw, BreakerInterceptor(self.breaker)
+        )
+        # Probes bypass the breaker
+        self.health = health_pb2_grpc.HealthStub(self.raw)
+        self.state = None
+        self.closed = threading.Event()
+        self.wake = threading.Event()
+        self.breaker.on_open = self.wake.set
+        self.raw.subscribe(self._on_state, try_to_connect=True)
+        self.prober = threading.Thread(target=self._probe_loop, daemon=True)
+        self.prober.start()
+
+    def _on_state(self, state):
+        """Channel connectivity callback, on gRPC's thread"""
+        previous, self.state = self.state, state
+        if state == grpc.ChannelConnectivity.TRANSIENT_FAILURE:
+            self.breaker.trip("connection failed")
+        elif state == grpc.ChannelConnectivity.READY and previous != state:
+            self.wake.set()
+
+    def probe(self):
+        """True if the apphost's health service reports SERVING"""
+        try:
+            response = self.health.Check(
+                health_pb2.HealthCheckRequest(service="apphost"), timeout=2
+            )
+        except grpc.RpcError:
+            return False
+        return response.status == health_pb2.HealthCheckResponse.SERVING
+
+    def _probe_loop(self):
+        while not self.closed.is_set():
+            self.wake.wait()
+            self.wake.clear()
+            interval = self.probe_interval
+            while self.breaker.open and not self.closed.is_set():
+                if self.probe():
+                    self.breaker.reset()
+                    break
+                self.wake.wait(interval)
+                self.wake.clear()
+                interval = min(interval * 2, MAX_PROBE_INTERVAL)
+
+    def status(self):
+        state = self.state.name if self.state else "IDLE"
+        return {"channel": state, **self.breaker.status()}
+
+    def close(self):
+        self.closed.set()
+        self.wake.set()
+        self.raw.unsubscribe(self._on_state)
+        self.raw.close()
@@ -0,0 +1,149 @@
+"""
+Request parsing and response encoding shared by the controller's HTTP
+front ends: the Flask app in server.py and the ASGI app in asgi.py.
+
+Kept apart from server.py, which runs as the entry-point script, so that
+asgi.py can use these without importing server.py a second time.
+"""
+
+import json
+
+# Seconds allowed on top of a page load's own timeout for the RPC around it
+RPC_SLACK = 5
+
+INT32_MAX = 2**31 - 1
+
+
+def int32(value):
+    """A non-negative int32 request field; raises ValueError
+
+    The generated messages reject larger values only when the request is
+    built, which for streamed routes is after the response has started.
+    """
+    value = int(value)
+    if not 0 <= value <= INT32_MAX:
+        raise ValueError(f"{value} is out of range")
+    return value
+
+
+def boolean(value):
+    """A bool request field: JSON true/false, 0/1 or their spellings"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in ("true", "1", "yes"):
+        return True
+    if isinstance(value, str) and value.strip().lower() in ("false", "0", "no"):
+        return False
+    raise ValueError(f"{value!r} is not a boolean")
+
+
+# NavigateRequest options an assignment can set, overall or per apphost
+ASSIGN_OPTIONS = {
+    "slot": int32,
+    "timeout_ms": int32,
+    "wait_until_load": boolean,
+    "wait_until": str,
+    "settle_ms": int32,
+    "filter_profile": str,
+}
+
+
+def parse_assignments(data):
+    """(assignments, options) from an /apphosts/assign body; raises ValueError"""
+    assignments = data.get("assignments")
+    if not isinstance(assignments, dict) or not assignments:
+        raise ValueError("'assignments' must map apphost names to URLs")
+
+    def convert(fields, where):
+        converted = {}
+        for key, value in fields.items():
+            if key not in ASSIGN_OPTIONS:
+                continue
+            try:
+                converted[key] = ASSIGN_OPTIONS[key](value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid '{key}'{where}: {value!r}")
+        return converted
+
+    for apphost_name, assignment in assignments.items():
+        if isinstance(assignment, dict):
+            if not isinstance(assignment.get("url"), str):
+                raise ValueError(f"Missing 'url' for {apphost_name}")
+            assignments[apphost_name] = {
+                "url": assignment["url"],
+                **convert(assignment, f" for {apphost_name}"),
+            }
+        elif not isinstance(assignment, str):
+            raise ValueError(f"Invalid assignment for {apphost_name}")
+    return assignments, convert(data, "")
+
+
+def parse_stream_config(data):
+    """StreamConfig fields, and any "slot", from a request body
+
+    Raises ValueError.
+    """
+    config = {}
+    for key, kind in (
+        ("encoder", str),
+        ("bitrate_kbps", int32),
+        ("gop", int32),
+        ("preset", str),
+        ("quality", int32),
+        ("slot", int32),
+    ):
+        if key in data:
+            try:
+                config[key] = kind(data[key])
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid '{key}': {data[key]!r}")
+    return config
+
+
+def parse_slot(data):
+    """The optional "slot" of a request body (None: every slot)"""
+    if data.get("slot") is None:
+        return None
+    try:
+        return int32(data["slot"])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid 'slot': {data['slot']!r}")
+
+
+def parse_display_config(data):
+    """(width, height, device_scale_factor) from a display body"""
+    try:
+        width = int32(data["width"])
+        height = int32(data["height"])
+        device_scale_factor = float(data.get("device_scale_factor", 0))
+    except KeyError as e:
+        raise ValueError(f"Missing {e.args[0]!r} in request body")
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid display config: {e}")
+    if not width or not height or device_scale_factor < 0:
+        raise ValueError("Invalid display dimensions")
+    return width, height, device_scale_factor
+
+
+def parse_layout(data):
+    """apply_layout() arguments from a /layout body; raises ValueError"""
+    try:
+        cols = int(data.get("cols", 4))
+        rows = int(data.get("rows", 4))
+        width = int(data.get("width", 3840))
+        height = int(data.get("height", 2160))
+        device_scale_factor = float(data.get("device_scale_factor", 0))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid layout: {e}")
+    if cols <= 0 or rows <= 0 or width < cols or height < rows:
+        raise ValueError("Invalid layout dimensions")
+    return cols, rows, width, height, device_scale_factor
+
+
+def encode_event(event, payload, sse=False):
+    """One streamed result: an NDJSON line or a Server-Sent Event"""
+    if sse:
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps(payload) + "\n"
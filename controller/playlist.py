@@ -0,0 +1,116 @@
+"""
+Timed URL playlists for apphost page slots.
+
+A playlist shows each entry for its duration and then the next, looping by
+default. Every entry is preloaded into the slot's hidden page preload_lead
+seconds before its turn and swapped in with Activate on time, so viewers
+never see a page load. When a preload fails the entry is navigated to
+directly instead, keeping the schedule.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Playlist:
+    """Runs one slot's playlist on a background thread
+
+    controller provides preload_apphost(), activate_apphost() and
+    navigate_apphost(), each returning (success, url or error).
+    """
+
+    def __init__(
+        self, controller, apphost_name, entries, slot=0, preload_lead=5.0, loop=True
+    ):
+        if not entries:
+            raise ValueError("A playlist needs at least one entry")
+        for entry in entries:
+            if not entry.get("url") or float(entry.get("duration", 0)) <= 0:
+                raise ValueError("Playlist entries need a url and a positive duration")
+        self.controller = controller
+        self.apphost_name = apphost_name
+        self.entries = [
+            {"url": entry["url"], "duration": float(entry["duration"])}
+            for entry in entries
+        ]
+        self.slot = slot
+        self.preload_lead = preload_lead
+        self.loop = loop
+        self.index = None  # entry currently shown
+        self.switches = 0
+        self.fallbacks = 0  # entries navigated to because preloading failed
+        self.last_error = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self, timeout=5):
+        self.stopped.set()
+        self.thread.join(timeout=timeout)
+
+    @property
+    def running(self):
+        return self.thread.is_alive()
+
+    def status(self):
+        """What the playlist is showing, for the HTTP API"""
+        return {
+            "apphost": self.apphost_name,
+            "slot": self.slot,
+            "running": self.running,
+            "index": self.index,
+            "url": self.entries[self.index]["url"] if self.index is not None else None,
+            "entries": self.entries,
+            "switches": self.switches,
+            "fallbacks": self.fallbacks,
+            "last_error": self.last_error,
+        }
+
+    def _wait_until(self, deadline):
+        """Sleep until a monotonic deadline; False if stopped meanwhile"""
+        return not self.stopped.wait(max(0.0, deadline - time.monotonic()))
+
+    def _run(self):
+        index = 0
+        switch_at = time.monotonic()
+        while True:
+            url = self.entries[index]["url"]
+            if not self._wait_until(switch_at - self.preload_lead):
+                return
+            preloaded, message = self.controller.preload_apphost(
+                self.apphost_name, url, slot=self.slot
+            )
+            if not preloaded:
+                logger.warning(f"Preloading {url} failed: {message}")
+            if not self._wait_until(switch_at):
+                return
+
+            if preloaded:
+                shown, message = self.controller.activate_apphost(
+                    self.apphost_name, url, slot=self.slot
+                )
+            if not preloaded or not shown:
+                self.fallbacks += 1
+                shown, message = self.controller.navigate_apphost(
+                    self.apphost_name, url, slot=self.slot
+                )
+            self.last_error = None if shown else message
+            self.index = index
+            self.switches += 1
+
+            # Schedule from the plan, not from when the switch finished,
+            # unless the switch ran late
+            switch_at = (
+                max(switch_at, time.monotonic()) + self.entries[index]["duration"]
+            )
+            index += 1
+            if index == len(self.entries):
+                if not self.loop:
+                    self._wait_until(switch_at)
+                    return
+                index = 0
@@ -0,0 +1,245 @@
+"""
+Registry of the apphosts the controller drives.
+
+Apphosts announce themselves with ApphostRegistry.Heartbeat (see
+apphost/registration.py), reporting their name, gRPC address, stream
+endpoint, page-slot capacity and resolution, and repeat it every
+interval_s (a third of the TTL). An entry not refreshed for REGISTRY_TTL
+seconds (default 15) expires; Deregister removes one at once. Apphosts
+listed in APPHOSTS ("apphost1=apphost1:3000,...") are registered at
+startup and never expire, for apphosts that do not heartbeat.
+
+The registry opens a channel when an apphost registers or moves to a new
+address and closes it when the entry goes, and tells listeners of every
+addition and removal so the controller can start and stop its status
+watchers. Lookups read copy-on-write snapshots, so request threads never
+wait on registrations.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 15
+
+
+def parse_apphosts(value):
+    """[(name, address)] from "name=host:port,..."; raises ValueError"""
+    apphosts = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, address = item.partition("=")
+        if not name or ":" not in address:
+            raise ValueError(f"APPHOSTS entries are name=host:port, not {item!r}")
+        apphosts.append((name.strip(), address.strip()))
+    return apphosts
+
+
+class Apphost:
+    """One registered apphost and its channel"""
+
+    def __init__(self, name, address, channel, stub, static=False):
+        self.name = name
+        self.address = address
+        self.channel = channel
+        self.stub = stub
+        self.static = static
+        self.stream_endpoint = ""
+        self.capacity = 1
+        self.width = 0
+        self.height = 0
+        self.ready = False
+        self.registered = self.last_seen = time.monotonic()
+        # Set once the entry is gone and its channel closed
+        self.closed = threading.Event()
+
+    def update(self, stream_endpoint, capacity, width, height, ready):
+        self.stream_endpoint = stream_endpoint
+        self.capacity = capacity or 1
+        self.width = width
+        self.height = height
+        self.ready = ready
+        self.last_seen = time.monotonic()
+
+    def info(self):
+        """The entry for the HTTP API"""
+        now = time.monotonic()
+        return {
+            "name": self.name,
+            "address": self.address,
+            "stream_endpoint": self.stream_endpoint,
+            "capacity": self.capacity,
+            "width": self.width,
+            "height": self.height,
+            "ready": self.ready,
+            "static": self.static,
+            "registered_s": round(now - self.registered, 1),
+            "last_seen_s": round(now - self.last_seen, 1),
+        }
+
+
+class ApphostRegistry:
+    """Registered apphosts by name, with their channels
+
+    connect(address) returns (channel, stub) for a new entry.
+    """
+
+    def __init__(self, connect, ttl=DEFAULT_TTL):
+        self.connect = connect
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.apphosts = {}
+        # Snapshots for readers, replaced on every change
+        self.stubs = {}
+        self.targets = {}
+        self.listeners = []
+        self.stopped = threading.Event()
+        self.reaper = None
+
+    @property
+    def interval(self):
+        """How often apphosts should heartbeat: three per TTL"""
+        return self.ttl / 3
+
+    def add_listener(self, on_added, on_removed):
+        """Call on_added(apphost) and on_removed(apphost) on changes"""
+        self.listeners.append((on_added, on_removed))
+
+    def get(self, name):
+        return self.apphosts.get(name)
+
+    def list(self):
+        return [apphost.info() for apphost in list(self.apphosts.values())]
+
+    def heartbeat(
+        self,
+        name,
+        address,
+        stream_endpoint="",
+        capacity=1,
+        width=0,
+        height=0,
+        ready=False,
+        static=False,
+    ):
+        """Register or refresh an apphost; True if its entry is new"""
+        with self.lock:
+            apphost = self.apphosts.get(name)
+            if apphost and apphost.address == address:
+                apphost.update(stream_endpoint, capacity, width, height, ready)
+                return False
+            replaced = apphost
+            channel, stub = self.connect(address)
+            apphost = Apphost(name, address, channel, stub, static)
+            apphost.update(stream_endpoint, capacity, width, height, ready)
+            self.apphosts[name] = apphost
+            self._publish()
+        if replaced:
+            logger.info(f"{name} moved from {replaced.address} to {address}")
+            self._close(replaced)
+        else:
+            logger.info(f"Registered {name} at {address}")
+        for on_added, _ in self.listeners:
+            on_added(apphost)
+        return True
+
+    def remove(self, name):
+        """Drop an apphost and close its channel; False if not registered"""
+        with self.lock:
+            apphost = self.apphosts.pop(name, None)
+            if apphost:
+                self._publish()
+        if not apphost:
+            return False
+        logger.info(f"Removed {name}")
+        self._close(apphost)
+        return True
+
+    def expire(self):
+        """Remove apphosts not heard from within the TTL; returns their names"""
+        cutoff = time.monotonic() - self.ttl
+        with self.lock:
+            expired = [
+                apphost
+                for apphost in self.apphosts.values()
+                if not apphost.static and apphost.last_seen < cutoff
+            ]
+            for apphost in expired:
+                del self.apphosts[apphost.name]
+            if expired:
+                self._publish()
+        for apphost in expired:
+            logger.warning(f"{apphost.name} expired: no heartbeat for {self.ttl:g} s")
+            self._close(apphost)
+        return [apphost.name for apphost in expired]
+
+    def _publish(self):
+        self.stubs = {name: apphost.stub for name, apphost in self.apphosts.items()}
+        self.targets = {
+            name: apphost.address for name, apphost in self.apphosts.items()
+        }
+
+    def _close(self, apphost):
+        apphost.closed.set()
+        for _, on_removed in self.listeners:
+            on_removed(apphost)
+        apphost.channel.close()
+
+    def start(self):
+        """Expire stale entries in the background"""
+        self.reaper = threading.Thread(target=self._reap, daemon=True)
+        self.reaper.start()
+
+    def _reap(self):
+        while not self.stopped.wait(self.interval):
+            self.expire()
+
+    def close(self):
+        self.stopped.set()
+        for name in list(self.apphosts):
+            self.remove(name)
+
+
+class RegistryServicer:
+    """ApphostRegistry service of the controller's gRPC server"""
+
+    def __init__(self, registry, browser_pb2):
+        self.registry = registry
+        self.browser_pb2 = browser_pb2
+
+    def Heartbeat(self, request, context):
+        if not request.name or not request.address:
+            return self.browser_pb2.HeartbeatResponse(
+                accepted=False, error="Heartbeat needs a name and an address"
+            )
+        apphost = self.registry.get(request.name)
+        if apphost and apphost.static:
+            # An APPHOSTS entry is pinned; the heartbeat only refreshes it
+            address = apphost.address
+        else:
+            address = request.address
+        self.registry.heartbeat(
+            request.name,
+            address,
+            request.stream_endpoint,
+            request.capacity,
+            request.width,
+            request.height,
+            request.ready,
+            static=bool(apphost and apphost.static),
+        )
+        return self.browser_pb2.HeartbeatResponse(
+            accepted=True, interval_s=self.registry.interval
+        )
+
+    def Deregister(self, request, context):
+        apphost = self.registry.get(request.name)
+        if apphost and apphost.static:
+            return self.browser_pb2.DeregisterResponse(success=False)
+        return self.browser_pb2.DeregisterResponse(
+            success=self.registry.remove(request.name)
+        )
@@ -1,31 +1,70 @@
 import logging
 import os
+import queue
 import threading
 import time
 from concurrent import futures
 
 import grpc
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from grpc_health.v1 import health, health_pb2, health_pb2_grpc
 
+from channels import CircuitOpenError, ManagedChannel
+from http_api import (
+    RPC_SLACK,
+    encode_event,
+    parse_assignments,
+    parse_display_config,
+    parse_layout,
+    parse_slot,
+    parse_stream_config,
+)
+from playlist import Playlist
+from registry import DEFAULT_TTL, ApphostRegistry, RegistryServicer, parse_apphosts
+
 logger = logging.getLogger(__name__)
 
+# Streamed apphost state older than this (three missed heartbeats) is stale
+STATUS_STALE_AFTER = 45
+
 
 class ControllerService:
-    """Controller service for managing apphost browsers"""
+    """Controller service for managing apphost browsers
+
+    The apphosts come from the registry (registry.py): they register
+    themselves with heartbeats, or are listed in APPHOSTS.
+    """
 
     def __init__(self):
-        self.apphost_urls = {
-            "apphost1": "about:blank",
-            "apphost2": "about:blank",
-            "apphost3": "about:blank",
-            "apphost4": "about:blank",
-        }
-        self.apphost_clients = {}
+        # Last known URL of each apphost's slot 0
+        self.apphost_urls = {}
+        self.registry = ApphostRegistry(
+            self._connect, ttl=float(os.environ.get("REGISTRY_TTL", DEFAULT_TTL))
+        )
+        self.registry.add_listener(self._apphost_added, self._apphost_removed)
+        self.watching = False
+        # Live apphost state fed by WatchStatus streams
+        self.apphost_state = {}
+        self.state_lock = threading.Lock()
+        # Running playlists by (apphost name, slot)
+        self.playlists = {}
+        self.playlist_lock = threading.Lock()
         self._setup_apphost_connections()
+        self._start_status_watchers()
+        self.registry.start()
+
+    @property
+    def apphost_clients(self):
+        """BrowserService stub of every registered apphost, by name"""
+        return self.registry.stubs
+
+    @property
+    def apphost_targets(self):
+        """gRPC address of every registered apphost, for other channels"""
+        return self.registry.targets
 
     def _setup_apphost_connections(self):
-        """Set up gRPC connections to all apphosts"""
+        """Load the apphost protos and register the APPHOSTS entries"""
         # Import browser proto files
         try:
             import sys
@@ -40,29 +79,207 @@ class ControllerService:
             logger.warning("Browser proto files not available, will generate on demand")
             self.browser_pb2 = None
             self.browser_pb2_grpc = None
+            return
 
-        # Connect to each apphost
-        apphost_ports = {
-            "apphost1": 3000,
-            "apphost2": 3001,
-            "apphost3": 3002,
-            "apphost4": 3003,
-        }
+        for apphost_name, address in parse_apphosts(os.environ.get("APPHOSTS", "")):
+            self.registry.heartbeat(apphost_name, address, static=True)
+
+    def _connect(self, address):
+        """(channel, stub) for a newly registered apphost (see channels.py)"""
+        channel = ManagedChannel(address)
+        return channel, self.browser_pb2_grpc.BrowserServiceStub(channel.channel)
+
+    def _breaker(self, apphost_name):
+        """The apphost's CircuitBreaker, or None if it is not registered"""
+        apphost = self.registry.get(apphost_name)
+        return apphost.channel.breaker if apphost else None
+
+    def registry_status(self):
+        """Registry entries with their channel and circuit state"""
+        entries = []
+        for info in self.registry.list():
+            apphost = self.registry.get(info["name"])
+            if apphost:
+                info.update(apphost.channel.status())
+            entries.append(info)
+        return entries
+
+    def _apphost_added(self, apphost):
+        self.apphost_urls.setdefault(apphost.name, "about:blank")
+        if self.watching:
+            self._start_watcher(apphost)
 
-        for apphost_name, port in apphost_ports.items():
+    def _apphost_removed(self, apphost):
+        if self.registry.get(apphost.name):
+            return  # Moved to a new address; its new entry takes over
+        self.apphost_urls.pop(apphost.name, None)
+        with self.state_lock:
+            self.apphost_state.pop(apphost.name, None)
+
+    def _start_status_watchers(self):
+        """Subscribe to the status stream of every apphost, now and later"""
+        if not self.browser_pb2:
+            return
+
+        self.watching = True
+        for name in list(self.apphost_clients):
+            apphost = self.registry.get(name)
+            if apphost:
+                self._start_watcher(apphost)
+
+    def _start_watcher(self, apphost):
+        threading.Thread(
+            target=self._watch_apphost, args=(apphost,), daemon=True
+        ).start()
+
+    def _watch_apphost(self, apphost):
+        """Mirror one apphost's WatchStatus stream into the state table
+
+        Only slot 0 is watched, like the URL table it feeds; the other
+        slots of a multi-slot apphost are not mirrored. Runs until the
+        registry entry goes, which closes its channel.
+        """
+        apphost_name = apphost.name
+        backoff = 1
+        while not apphost.closed.is_set():
             try:
-                channel = grpc.insecure_channel(f"{apphost_name}:{port}")
-                if self.browser_pb2_grpc:
-                    stub = self.browser_pb2_grpc.BrowserServiceStub(channel)
-                    self.apphost_clients[apphost_name] = stub
-                    logger.info(f"Connected to {apphost_name} on port {port}")
-            except Exception as e:
-                logger.error(f"Failed to connect to {apphost_name}: {e}")
+                if apphost.static:
+                    self._learn_slot_count(apphost)
+                stream = apphost.stub.WatchStatus(self.browser_pb2.WatchStatusRequest())
+                for update in stream:
+                    backoff = 1
+                    with self.state_lock:
+                        self.apphost_state[apphost_name] = {
+                            "url": update.url,
+                            "event": update.event,
+                            "browser_ready": update.browser_ready,
+                            "streaming": update.streaming,
+                            "sequence": update.sequence,
+                            "updated": time.monotonic(),
+                        }
+                    self.apphost_urls[apphost_name] = update.url
+            except CircuitOpenError:
+                # Resubscribe as soon as the health probe closes the circuit
+                with self.state_lock:
+                    self.apphost_state.pop(apphost_name, None)
+                breaker = apphost.channel.breaker
+                while not (apphost.closed.is_set() or breaker.healthy.wait(1)):
+                    pass
+                continue
+            except (grpc.RpcError, ValueError) as e:
+                # ValueError: the channel was closed under the stream
+                if apphost.closed.is_set():
+                    break
+                details = e.details() if isinstance(e, grpc.RpcError) else e
+                logger.warning(f"Status stream for {apphost_name} lost: {details}")
+
+            with self.state_lock:
+                if self.registry.get(apphost_name) in (apphost, None):
+                    self.apphost_state.pop(apphost_name, None)
+            apphost.closed.wait(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _learn_slot_count(self, apphost):
+        """Ask an APPHOSTS entry, which never heartbeats, for its slot count"""
+        response = apphost.stub.GetStatus(
+            self.browser_pb2.GetStatusRequest(), timeout=5
+        )
+        apphost.capacity = response.slot_count or 1
+
+    def _live_state(self, apphost_name):
+        """Streamed state for an apphost, or None if not subscribed or stale"""
+        with self.state_lock:
+            state = self.apphost_state.get(apphost_name)
+        if state and time.monotonic() - state["updated"] < STATUS_STALE_AFTER:
+            return state
+        return None
 
     def navigate_apphost(
-        self, apphost_name, url, timeout_ms=30000, wait_until_load=False
+        self,
+        apphost_name,
+        url,
+        timeout_ms=30000,
+        wait_until_load=False,
+        slot=0,
+        filter_profile="",
+        wait_until="",
+        settle_ms=0,
     ):
-        """Navigate a specific apphost to a URL"""
+        """Navigate a specific apphost (page slot) to a URL"""
+        success, message, _ = self.navigate_apphost_timed(
+            apphost_name,
+            url,
+            timeout_ms,
+            wait_until_load,
+            slot,
+            filter_profile,
+            wait_until,
+            settle_ms,
+        )
+        return success, message
+
+    def navigate_apphost_timed(
+        self,
+        apphost_name,
+        url,
+        timeout_ms=30000,
+        wait_until_load=False,
+        slot=0,
+        filter_profile="",
+        wait_until="",
+        settle_ms=0,
+    ):
+        """navigate_apphost(), also returning the page's paint timings
+
+        Timings are {"first_paint_ms", "settled_ms"} as the apphost
+        measured them, or None if the navigation failed.
+        """
+        if apphost_name not in self.apphost_clients:
+            return False, f"Apphost {apphost_name} not found", None
+
+        if not self.browser_pb2:
+            return False, "Browser proto not available", None
+
+        try:
+            stub = self.apphost_clients[apphost_name]
+            request = self.browser_pb2.NavigateRequest(
+                url=url,
+                timeout_ms=timeout_ms,
+                wait_until_load=wait_until_load,
+                slot=slot,
+                filter_profile=filter_profile,
+                wait_until=wait_until,
+                settle_ms=settle_ms,
+            )
+            # The apphost fits the page load into this deadline
+            response = stub.Navigate(request, timeout=timeout_ms / 1000 + RPC_SLACK)
+            return self._navigated(apphost_name, request, response)
+        except Exception as e:
+            logger.error(f"Navigation failed for {apphost_name}: {e}")
+            return False, str(e), None
+
+    def _navigated(self, apphost_name, request, response):
+        """(success, final URL or error, timings) of a Navigate response"""
+        if not response.success:
+            return False, response.error, None
+        # The URL table tracks slot 0, the page WatchStatus follows
+        if request.slot == 0:
+            self.apphost_urls[apphost_name] = response.final_url or request.url
+        logger.info(
+            f"{apphost_name} slot {request.slot} navigated to {request.url} "
+            f"(first paint {response.first_paint_ms} ms, "
+            f"settled {response.settled_ms} ms)"
+        )
+        timings = {
+            "first_paint_ms": response.first_paint_ms,
+            "settled_ms": response.settled_ms,
+        }
+        return True, response.final_url, timings
+
+    def preload_apphost(
+        self, apphost_name, url, timeout_ms=30000, wait_until_load=False, slot=0
+    ):
+        """Load a URL in an apphost slot's hidden page, ready to activate"""
         if apphost_name not in self.apphost_clients:
             return False, f"Apphost {apphost_name} not found"
 
@@ -71,26 +288,96 @@ class ControllerService:
 
         try:
             stub = self.apphost_clients[apphost_name]
-            request = self.browser_pb2.NavigateRequest(
-                url=url, timeout_ms=timeout_ms, wait_until_load=wait_until_load
+            request = self.browser_pb2.PreloadRequest(
+                url=url,
+                timeout_ms=timeout_ms,
+                wait_until_load=wait_until_load,
+                slot=slot,
             )
-            response = stub.Navigate(request, timeout=60)
+            response = stub.Preload(request, timeout=timeout_ms / 1000 + RPC_SLACK)
+            return self._preloaded(apphost_name, request, response)
+        except Exception as e:
+            logger.error(f"Preload failed for {apphost_name}: {e}")
+            return False, str(e)
 
-            if response.success:
-                self.apphost_urls[apphost_name] = response.final_url or url
-                logger.info(f"{apphost_name} navigated to {url}")
-                return True, response.final_url
-            else:
-                return False, response.error
+    def _preloaded(self, apphost_name, request, response):
+        """(success, final URL or error) of a Preload response"""
+        if not response.success:
+            return False, response.error
+        logger.info(
+            f"{apphost_name} slot {request.slot} preloaded {request.url} "
+            f"in {response.load_ms} ms"
+        )
+        return True, response.final_url
+
+    def activate_apphost(self, apphost_name, url="", slot=0):
+        """Swap an apphost slot's preloaded page in"""
+        if apphost_name not in self.apphost_clients:
+            return False, f"Apphost {apphost_name} not found"
+
+        if not self.browser_pb2:
+            return False, "Browser proto not available"
+
+        try:
+            stub = self.apphost_clients[apphost_name]
+            request = self.browser_pb2.ActivateRequest(url=url, slot=slot)
+            response = stub.Activate(request, timeout=10)
+            return self._activated(apphost_name, request, response)
         except Exception as e:
-            logger.error(f"Navigation failed for {apphost_name}: {e}")
+            logger.error(f"Activate failed for {apphost_name}: {e}")
             return False, str(e)
 
+    def _activated(self, apphost_name, request, response):
+        """(success, URL or error) of an Activate response"""
+        if not response.success:
+            return False, response.error
+        if request.slot == 0:
+            self.apphost_urls[apphost_name] = response.url
+        logger.info(
+            f"{apphost_name} slot {request.slot} activated {response.url} "
+            f"in {response.swap_ms} ms"
+        )
+        return True, response.url
+
+    def start_playlist(
+        self, apphost_name, entries, slot=0, preload_lead=5.0, loop=True
+    ):
+        """Start (or replace) the playlist of an apphost slot"""
+        if apphost_name not in self.apphost_clients:
+            raise KeyError(f"Apphost {apphost_name} not found")
+        playlist = Playlist(self, apphost_name, entries, slot, preload_lead, loop)
+        with self.playlist_lock:
+            previous = self.playlists.pop((apphost_name, slot), None)
+            self.playlists[(apphost_name, slot)] = playlist
+        if previous:
+            previous.stop()
+        playlist.start()
+        return playlist.status()
+
+    def stop_playlist(self, apphost_name, slot=0):
+        """Stop the playlist of an apphost slot; False if none was running"""
+        with self.playlist_lock:
+            playlist = self.playlists.pop((apphost_name, slot), None)
+        if not playlist:
+            return False
+        playlist.stop()
+        return True
+
+    def playlist_status(self):
+        """Status of every playlist"""
+        with self.playlist_lock:
+            playlists = list(self.playlists.values())
+        return [playlist.status() for playlist in playlists]
+
     def get_apphost_url(self, apphost_name):
         """Get the current URL of a specific apphost"""
         if apphost_name not in self.apphost_clients:
             return None, f"Apphost {apphost_name} not found"
 
+        state = self._live_state(apphost_name)
+        if state:
+            return state["url"], None
+
         if not self.browser_pb2:
             return self.apphost_urls.get(apphost_name, "about:blank"), None
 
@@ -107,22 +394,362 @@ class ControllerService:
             # Return cached URL on error
             return self.apphost_urls.get(apphost_name, "about:blank"), str(e)
 
-    def get_all_urls(self):
-        """Get URLs of all apphosts"""
+    def _dispatch(self, method, requests, deadline):
+        """Issue one RPC per apphost concurrently under a shared deadline
+
+        requests maps apphost name, or (apphost name, slot) for per-slot
+        calls (see _per_slot), to the request message for that host.
+        Yields (key, response, error, elapsed_ms) in completion order, so
+        the whole fan-out takes as long as the slowest host.
+        """
+        completed = queue.Queue()
+        started = time.monotonic()
+
+        clients = self.apphost_clients
+        for key, request in requests.items():
+            apphost_name = self._apphost_of(key)
+            if apphost_name not in clients:
+                # Deregistered since the requests were built
+                completed.put((key, None, started))
+                continue
+            call = getattr(clients[apphost_name], method)
+            future = call.future(request, timeout=deadline)
+            future.add_done_callback(
+                lambda f, key=key: completed.put((key, f, time.monotonic()))
+            )
+
+        for _ in range(len(requests)):
+            key, future, finished = completed.get()
+            apphost_name = self._apphost_of(key)
+            elapsed_ms = round((finished - started) * 1000)
+            if future is None:
+                yield key, None, f"Apphost {apphost_name} not found", 0
+                continue
+            try:
+                yield key, future.result(), None, elapsed_ms
+            except grpc.RpcError as e:
+                logger.error(f"{method} failed for {apphost_name}: {e.details()}")
+                yield key, None, e.details() or str(e.code()), elapsed_ms
+
+    @staticmethod
+    def _apphost_of(key):
+        """Apphost name of a _dispatch key"""
+        return key[0] if isinstance(key, tuple) else key
+
+    def slot_count(self, apphost_name):
+        """Page slots of an apphost, as it last reported them"""
+        apphost = self.registry.get(apphost_name)
+        return apphost.capacity if apphost else 1
+
+    def _per_slot(self, requests, slot=None):
+        """Per-apphost requests copied out to (apphost name, slot) keys
+
+        slot None addresses every slot each apphost reports; each copy has
+        its slot field set to match.
+        """
+        per_slot = {}
+        for apphost_name, request in requests.items():
+            if slot is None:
+                slots = range(self.slot_count(apphost_name))
+            else:
+                slots = [slot]
+            for index in slots:
+                copy = type(request)()
+                copy.CopyFrom(request)
+                copy.slot = index
+                per_slot[(apphost_name, index)] = copy
+        return per_slot
+
+    def _merge_slots(self, results, dispatched, result_of):
+        """Per-apphost results of per-slot calls
+
+        result_of(response, error, elapsed_ms) shapes one slot's result.
+        Each apphost gets its lowest slot's result, failed if any slot
+        failed (with the first such error), the slowest slot's elapsed_ms,
+        and every slot's own result under "slots".
+        """
+        by_apphost = {}
+        for (apphost_name, slot), response, error, elapsed_ms in dispatched:
+            result = result_of(response, error, elapsed_ms)
+            by_apphost.setdefault(apphost_name, []).append({"slot": slot, **result})
+        for apphost_name, slots in by_apphost.items():
+            slots.sort(key=lambda result: result["slot"])
+            failed = [result for result in slots if not result["success"]]
+            merged = {key: value for key, value in slots[0].items() if key != "slot"}
+            merged["success"] = not failed
+            if failed and len(slots) > 1:
+                merged["error"] = f"slot {failed[0]['slot']}: {failed[0]['error']}"
+            elif failed:
+                merged["error"] = failed[0]["error"]
+            merged["elapsed_ms"] = max(result["elapsed_ms"] for result in slots)
+            merged["slots"] = slots
+            results[apphost_name] = merged
+        return results
+
+    def get_all_urls(self, deadline=5):
+        """Get the slot 0 URL of every apphost"""
+        result, requests = self._url_requests()
+        return self._url_results(result, self._dispatch("GetURL", requests, deadline))
+
+    def _url_requests(self):
+        """URLs known from status streams, and GetURL requests for the rest"""
         result = {}
-        for apphost_name in self.apphost_clients.keys():
-            url, error = self.get_apphost_url(apphost_name)
+        requests = {}
+        for apphost_name in self.apphost_clients:
+            state = self._live_state(apphost_name)
+            if state:
+                result[apphost_name] = {"url": state["url"], "error": None}
+            else:
+                # Only hosts without a live status stream cost an RPC
+                requests[apphost_name] = self.browser_pb2.GetURLRequest()
+        return result, requests
+
+    def _url_results(self, result, dispatched):
+        for apphost_name, response, error, _ in dispatched:
+            if error:
+                # Return cached URL on error
+                url = self.apphost_urls.get(apphost_name, "about:blank")
+            else:
+                url = self.apphost_urls[apphost_name] = response.url
             result[apphost_name] = {"url": url, "error": error}
         return result
 
-    def navigate_all(self, url, timeout_ms=30000, wait_until_load=False):
-        """Navigate all apphosts to the same URL"""
+    def navigate_all(self, url, timeout_ms=30000, wait_until_load=False, deadline=60):
+        """Navigate slot 0 of every apphost to the same URL concurrently"""
+        requests = self._navigate_all_requests(url, timeout_ms, wait_until_load)
+        return self._navigate_all_results(
+            requests, self._dispatch("Navigate", requests, deadline)
+        )
+
+    def _navigate_all_requests(self, url, timeout_ms, wait_until_load):
+        request = self.browser_pb2.NavigateRequest(
+            url=url, timeout_ms=timeout_ms, wait_until_load=wait_until_load
+        )
+        return {apphost_name: request for apphost_name in self.apphost_clients}
+
+    def _navigate_all_results(self, requests, dispatched):
         results = {}
-        for apphost_name in self.apphost_clients.keys():
-            success, message = self.navigate_apphost(
-                apphost_name, url, timeout_ms, wait_until_load
+        for apphost_name, response, error, elapsed_ms in dispatched:
+            if error:
+                success, message = False, error
+            else:
+                success, message, _ = self._navigated(
+                    apphost_name, requests[apphost_name], response
+                )
+            results[apphost_name] = {
+                "success": success,
+                "message": message,
+                "elapsed_ms": elapsed_ms,
+            }
+        return results
+
+    def assign(self, assignments, deadline=None, **options):
+        """Navigate each apphost to its own URL concurrently
+
+        assignments maps apphost name to a URL or to a dict of "url" and any
+        ASSIGN_OPTIONS, which override the options given here for that host.
+        Returns an iterator of one result per apphost in completion order,
+        so a caller can report tiles as they come up; unknown apphosts come
+        first. The deadline defaults to the longest page-load timeout plus
+        RPC_SLACK. Raises ValueError, before anything is sent, if a request
+        cannot be built.
+        """
+        unknown, requests, deadline = self._assign_requests(
+            assignments, deadline, options
+        )
+        return self._assign_results(unknown, requests, deadline)
+
+    def _assign_results(self, unknown, requests, deadline):
+        yield from unknown
+        for apphost_name, response, error, elapsed_ms in self._dispatch(
+            "Navigate", requests, deadline
+        ):
+            yield self._assign_result(
+                apphost_name, requests[apphost_name], response, error, elapsed_ms
             )
-            results[apphost_name] = {"success": success, "message": message}
+
+    def _assign_requests(self, assignments, deadline, options):
+        """(results for unknown apphosts, NavigateRequests, deadline)"""
+        unknown = []
+        requests = {}
+        for apphost_name, assignment in assignments.items():
+            if apphost_name not in self.apphost_clients:
+                unknown.append(
+                    {
+                        "apphost": apphost_name,
+                        "success": False,
+                        "error": f"Apphost {apphost_name} not found",
+                        "elapsed_ms": 0,
+                    }
+                )
+                continue
+            if isinstance(assignment, str):
+                assignment = {"url": assignment}
+            fields = {**options, **assignment}
+            fields.setdefault("timeout_ms", 30000)
+            try:
+                requests[apphost_name] = self.browser_pb2.NavigateRequest(**fields)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Invalid assignment for {apphost_name}: {e}")
+
+        if deadline is None and requests:
+            deadline = (
+                max(request.timeout_ms for request in requests.values()) / 1000
+                + RPC_SLACK
+            )
+        return unknown, requests, deadline
+
+    def _assign_result(self, apphost_name, request, response, error, elapsed_ms):
+        if error:
+            success, message, timings = False, error, None
+        else:
+            success, message, timings = self._navigated(apphost_name, request, response)
+        result = {
+            "apphost": apphost_name,
+            "slot": request.slot,
+            "success": success,
+        }
+        if success:
+            result.update(url=message, **timings)
+        else:
+            result["error"] = message
+        result["elapsed_ms"] = elapsed_ms
+        return result
+
+    def apply_layout(
+        self, cols, rows, width, height, device_scale_factor=0, deadline=30, slot=None
+    ):
+        """Size every apphost to one cell of a cols x rows wall
+
+        Apphosts then render and capture only the pixels their tile shows.
+        device_scale_factor keeps pages laid out at a larger CSS viewport
+        (e.g. 0.5 renders a 1920x1080 layout into a 960x540 tile); 0 keeps
+        each apphost's current factor. Every slot is resized unless slot
+        picks one.
+        """
+        return self.set_display_config(
+            None, width // cols, height // rows, device_scale_factor, deadline, slot
+        )
+
+    def set_display_config(
+        self,
+        apphost_names,
+        width,
+        height,
+        device_scale_factor=0,
+        deadline=30,
+        slot=None,
+    ):
+        """Resize some (None: all) apphosts, every slot unless slot picks one"""
+        results, requests = self._display_requests(
+            apphost_names, width, height, device_scale_factor, slot
+        )
+        return self._display_results(
+            results, self._dispatch("SetDisplayConfig", requests, deadline)
+        )
+
+    def _display_requests(
+        self, apphost_names, width, height, device_scale_factor, slot
+    ):
+        results, requests = self._named_requests(
+            apphost_names,
+            self.browser_pb2.DisplayConfig(
+                width=width, height=height, device_scale_factor=device_scale_factor
+            ),
+        )
+        return results, self._per_slot(requests, slot)
+
+    def _display_results(self, results, dispatched):
+        return self._merge_slots(results, dispatched, self._display_result)
+
+    def _display_result(self, response, error, elapsed_ms):
+        if error is None and not response.success:
+            error = response.error
+        config = response.config if response else None
+        return {
+            "success": error is None,
+            "error": error,
+            "width": config.width if config else None,
+            "height": config.height if config else None,
+            "device_scale_factor": config.device_scale_factor if config else None,
+            "elapsed_ms": elapsed_ms,
+        }
+
+    def set_stream_config(self, apphost_names=None, deadline=30, slot=None, **config):
+        """Set the encode stage of some (default all) apphosts concurrently
+
+        config takes StreamConfig fields: encoder (none, h264, jpeg),
+        bitrate_kbps, gop, preset and quality; omitted fields keep each
+        apphost's current value. Every slot is set unless slot picks one.
+        """
+        results, requests = self._stream_config_requests(apphost_names, slot, config)
+        return self._stream_config_results(
+            results, self._dispatch("SetStreamConfig", requests, deadline)
+        )
+
+    def _stream_config_requests(self, apphost_names, slot, config):
+        results, requests = self._named_requests(
+            apphost_names, self.browser_pb2.StreamConfig(**config)
+        )
+        return results, self._per_slot(requests, slot)
+
+    def _named_requests(self, apphost_names, request):
+        """Errors for unknown apphosts, and the request for the others
+
+        apphost_names of None means every apphost.
+        """
+        names = apphost_names or list(self.apphost_clients)
+        results = {
+            name: {"success": False, "error": f"Apphost {name} not found"}
+            for name in names
+            if name not in self.apphost_clients
+        }
+        requests = {name: request for name in names if name in self.apphost_clients}
+        return results, requests
+
+    def _stream_config_results(self, results, dispatched):
+        return self._merge_slots(results, dispatched, self._stream_config_result)
+
+    def _stream_config_result(self, response, error, elapsed_ms):
+        if error is None and not response.success:
+            error = response.error
+        return {
+            "success": error is None,
+            "error": error,
+            "config": (
+                {
+                    "encoder": response.config.encoder,
+                    "bitrate_kbps": response.config.bitrate_kbps,
+                    "gop": response.config.gop,
+                    "preset": response.config.preset,
+                    "quality": response.config.quality,
+                }
+                if response
+                else None
+            ),
+            "elapsed_ms": elapsed_ms,
+        }
+
+    def set_request_filter(self, profile, apphost_names=None, slot=0, deadline=10):
+        """Switch a slot of some (default all) apphosts to a blocking profile"""
+        results, requests = self._named_requests(
+            apphost_names,
+            self.browser_pb2.RequestFilterRequest(profile=profile, slot=slot),
+        )
+        return self._filter_results(
+            results, self._dispatch("SetRequestFilter", requests, deadline)
+        )
+
+    def _filter_results(self, results, dispatched):
+        for apphost_name, response, error, elapsed_ms in dispatched:
+            if error is None and not response.success:
+                error = response.error
+            results[apphost_name] = {
+                "success": error is None,
+                "error": error,
+                "profile": response.profile if response else None,
+                "elapsed_ms": elapsed_ms,
+            }
         return results
 
 
@@ -134,6 +761,11 @@ def create_http_api(controller):
     def health():
         return jsonify({"status": "healthy"}), 200
 
+    @app.route("/registry", methods=["GET"])
+    def get_registry():
+        """Registered apphosts, their last heartbeat and circuit state"""
+        return jsonify(controller.registry_status()), 200
+
     @app.route("/apphosts", methods=["GET"])
     def get_all_apphosts():
         """Get all apphost URLs"""
@@ -158,19 +790,90 @@ def create_http_api(controller):
         url = data["url"]
         timeout_ms = data.get("timeout_ms", 30000)
         wait_until_load = data.get("wait_until_load", False)
+        slot = data.get("slot", 0)
+        filter_profile = data.get("filter_profile", "")
+        wait_until = data.get("wait_until", "")
+        settle_ms = data.get("settle_ms", 0)
 
-        success, message = controller.navigate_apphost(
-            apphost_name, url, timeout_ms, wait_until_load
+        success, message, timings = controller.navigate_apphost_timed(
+            apphost_name,
+            url,
+            timeout_ms,
+            wait_until_load,
+            slot,
+            filter_profile,
+            wait_until,
+            settle_ms,
         )
 
         if success:
-            return jsonify({"success": True, "url": message}), 200
+            return jsonify({"success": True, "url": message, **timings}), 200
         else:
             return jsonify({"success": False, "error": message}), 500
 
+    @app.route("/apphost/<apphost_name>/preload", methods=["POST"])
+    def preload_apphost(apphost_name):
+        """Load a URL in a hidden page of an apphost slot"""
+        data = request.get_json()
+        if not data or "url" not in data:
+            return jsonify({"error": "Missing 'url' in request body"}), 400
+
+        success, message = controller.preload_apphost(
+            apphost_name,
+            data["url"],
+            data.get("timeout_ms", 30000),
+            data.get("wait_until_load", False),
+            data.get("slot", 0),
+        )
+        if success:
+            return jsonify({"success": True, "url": message}), 200
+        return jsonify({"success": False, "error": message}), 500
+
+    @app.route("/apphost/<apphost_name>/activate", methods=["POST"])
+    def activate_apphost(apphost_name):
+        """Swap the preloaded page of an apphost slot in"""
+        data = request.get_json(silent=True) or {}
+        success, message = controller.activate_apphost(
+            apphost_name, data.get("url", ""), data.get("slot", 0)
+        )
+        if success:
+            return jsonify({"success": True, "url": message}), 200
+        return jsonify({"success": False, "error": message}), 500
+
+    @app.route("/apphost/<apphost_name>/playlist", methods=["POST"])
+    def start_playlist(apphost_name):
+        """Cycle an apphost slot through preloaded URLs"""
+        data = request.get_json() or {}
+        try:
+            status = controller.start_playlist(
+                apphost_name,
+                data.get("entries", []),
+                int(data.get("slot", 0)),
+                float(data.get("preload_lead_s", 5.0)),
+                bool(data.get("loop", True)),
+            )
+        except KeyError as e:
+            return jsonify({"error": str(e.args[0])}), 404
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid playlist: {e}"}), 400
+        return jsonify(status), 200
+
+    @app.route("/apphost/<apphost_name>/playlist", methods=["DELETE"])
+    def stop_playlist(apphost_name):
+        """Stop the playlist of an apphost slot"""
+        slot = request.args.get("slot", 0, type=int)
+        if not controller.stop_playlist(apphost_name, slot):
+            return jsonify({"error": "No playlist running"}), 404
+        return jsonify({"success": True}), 200
+
+    @app.route("/playlists", methods=["GET"])
+    def get_playlists():
+        """Status of every playlist"""
+        return jsonify(controller.playlist_status()), 200
+
     @app.route("/apphosts/navigate", methods=["POST"])
     def navigate_all_apphosts():
-        """Navigate all apphosts to the same URL"""
+        """Navigate slot 0 of every apphost to the same URL"""
         data = request.get_json()
         if not data or "url" not in data:
             return jsonify({"error": "Missing 'url' in request body"}), 400
@@ -178,8 +881,139 @@ def create_http_api(controller):
         url = data["url"]
         timeout_ms = data.get("timeout_ms", 30000)
         wait_until_load = data.get("wait_until_load", False)
+        deadline = data.get("deadline", 60)
+
+        results = controller.navigate_all(url, timeout_ms, wait_until_load, deadline)
+        return jsonify(results), 200
+
+    @app.route("/apphosts/assign", methods=["POST"])
+    def assign_apphosts():
+        """Navigate apphosts to their own URLs, streaming each result
+
+        Results are NDJSON lines, or Server-Sent Events if the client
+        accepts text/event-stream, followed by a summary.
+        """
+        data = request.get_json(silent=True) or {}
+        try:
+            assignments, options = parse_assignments(data)
+            deadline = float(data["deadline"]) if "deadline" in data else None
+            # Build every request now: errors past this point would come
+            # after the 200 has been sent
+            assigned = controller.assign(assignments, deadline, **options)
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        sse = (
+            request.accept_mimetypes.best_match(
+                ["application/x-ndjson", "text/event-stream"]
+            )
+            == "text/event-stream"
+            or request.args.get("format") == "sse"
+        )
+
+        def results():
+            started = time.monotonic()
+            succeeded = failed = 0
+            for result in assigned:
+                if result["success"]:
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield encode_event("result", result, sse)
+            yield encode_event(
+                "done",
+                {
+                    "done": True,
+                    "succeeded": succeeded,
+                    "failed": failed,
+                    "elapsed_ms": round((time.monotonic() - started) * 1000),
+                },
+                sse,
+            )
+
+        return Response(
+            results(),
+            mimetype="text/event-stream" if sse else "application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.route("/apphost/<apphost_name>/display", methods=["POST"])
+    def set_apphost_display(apphost_name):
+        """Resize every slot of a specific apphost, or the given slot"""
+        data = request.get_json() or {}
+        try:
+            display = parse_display_config(data)
+            slot = parse_slot(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        result = controller.set_display_config([apphost_name], *display, slot=slot)[
+            apphost_name
+        ]
+        return jsonify(result), 200 if result["success"] else 500
+
+    @app.route("/apphost/<apphost_name>/stream", methods=["POST"])
+    def set_apphost_stream(apphost_name):
+        """Set the encode stage of a specific apphost"""
+        data = request.get_json() or {}
+        try:
+            config = parse_stream_config(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        result = controller.set_stream_config([apphost_name], **config)[apphost_name]
+        return jsonify(result), 200 if result["success"] else 500
+
+    @app.route("/apphosts/stream", methods=["POST"])
+    def set_all_streams():
+        """Set the encode stage of all apphosts"""
+        data = request.get_json() or {}
+        try:
+            config = parse_stream_config(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        results = controller.navigate_all(url, timeout_ms, wait_until_load)
+        results = controller.set_stream_config(
+            deadline=data.get("deadline", 30), **config
+        )
+        return jsonify(results), 200
+
+    @app.route("/apphost/<apphost_name>/filter", methods=["POST"])
+    def set_apphost_filter(apphost_name):
+        """Switch an apphost slot to a request-blocking profile"""
+        data = request.get_json() or {}
+        if "profile" not in data:
+            return jsonify({"error": "Missing 'profile' in request body"}), 400
+
+        result = controller.set_request_filter(
+            data["profile"], [apphost_name], data.get("slot", 0)
+        )[apphost_name]
+        return jsonify(result), 200 if result["success"] else 500
+
+    @app.route("/apphosts/filter", methods=["POST"])
+    def set_all_filters():
+        """Switch a slot of every apphost to a request-blocking profile"""
+        data = request.get_json() or {}
+        if "profile" not in data:
+            return jsonify({"error": "Missing 'profile' in request body"}), 400
+
+        results = controller.set_request_filter(
+            data["profile"], slot=data.get("slot", 0), deadline=data.get("deadline", 10)
+        )
+        return jsonify(results), 200
+
+    @app.route("/layout", methods=["POST"])
+    def set_layout():
+        """Render every apphost at the tile size of a wall layout"""
+        data = request.get_json() or {}
+        try:
+            layout = parse_layout(data)
+            slot = parse_slot(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        results = controller.apply_layout(
+            *layout, deadline=data.get("deadline", 30), slot=slot
+        )
         return jsonify(results), 200
 
     return app
@@ -204,20 +1038,32 @@ def serve():
     health_servicer.set("", health_pb2.HealthCheckResponse.SERVING)
     health_servicer.set("controller", health_pb2.HealthCheckResponse.SERVING)
 
+    # Apphosts register here with heartbeats
+    if controller.browser_pb2:
+        controller.browser_pb2_grpc.add_ApphostRegistryServicer_to_server(
+            RegistryServicer(controller.registry, controller.browser_pb2), server
+        )
+
     server.add_insecure_port(f"[::]:{port}")
     server.start()
 
     logger.info(f"Controller gRPC server started on port {port}")
     print(f"Controller gRPC health check server started on port {port}")
-    print(f"Connected to apphosts: {list(controller.apphost_clients.keys())}")
+    print(f"Registered apphosts: {list(controller.apphost_clients.keys())}")
 
-    # Start HTTP API in separate thread
-    app = create_http_api(controller)
+    # Start HTTP API in separate thread: ASGI (asgi.py) or Flask's own server
+    http_server = os.environ.get("CONTROLLER_HTTP", "asgi")
 
     def run_http_server():
-        logger.info(f"Starting HTTP API on port {http_port}")
-        print(f"Controller HTTP API started on port {http_port}")
-        app.run(host="0.0.0.0", port=http_port, debug=False, use_reloader=False)
+        logger.info(f"Starting {http_server} HTTP API on port {http_port}")
+        print(f"Controller HTTP API ({http_server}) started on port {http_port}")
+        if http_server == "asgi":
+            from asgi import serve_asgi
+
+            serve_asgi(controller, http_port)
+        else:
+            app = create_http_api(controller)
+            app.run(host="0.0.0.0", port=http_port, debug=False, use_reloader=False)
 
     http_thread = threading.Thread(target=run_http_server, daemon=True)
     http_thread.start()
@@ -4,6 +4,18 @@ set -e
 echo "Starting controller container..."
 echo "Port: ${PORT:-5000}"
 
+# Generate apphost proto files (browser.proto is mounted from ./apphost)
+if [ -f "/app/browser.proto" ] && [ ! -f "/app/browser_pb2_grpc.py" ]; then
+    echo "Generating proto files..."
+    cd /app
+    python3 -m grpc_tools.protoc \
+        -I. \
+        --python_out=. \
+        --grpc_python_out=. \
+        browser.proto
+    echo "Proto files generated"
+fi
+
 # Start the gRPC health check server
 echo "Starting gRPC controller health check server on port ${PORT:-5000}"
 cd /app
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the ASGI front end: every route answers with the Flask app's
+status and body over the same fake apphosts, and open circuits and gRPC
+errors surface with the same HTTP statuses.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import grpc
+from starlette.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import asgi
+from test_server import Method, RpcError, Stub, browser_pb2, make_controller
+from server import create_http_api
+
+
+class AsyncStub:
+    """grpc.aio view of a test_server Stub"""
+
+    def __init__(self, stub):
+        self.stub = stub
+
+    def __getattr__(self, method):
+        future = getattr(self.stub, method).future
+
+        async def call(request, timeout=None):
+            return await asyncio.wrap_future(future(request, timeout))
+
+        return call
+
+
+class StubbedAsyncController(asgi.AsyncController):
+    """AsyncController calling the registry's fake stubs instead of channels"""
+
+    @property
+    def stubs(self):
+        return {
+            name: AsyncStub(stub)
+            for name, stub in self.controller.apphost_clients.items()
+        }
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+asgi.AsyncController = StubbedAsyncController
+
+
+def navigated(request):
+    if "fail" in request.url:
+        return browser_pb2.NavigateResponse(success=False, error="net::ERR_FAILED")
+    if "crash" in request.url:
+        raise RpcError(grpc.StatusCode.INTERNAL, "Exception calling application")
+    return browser_pb2.NavigateResponse(
+        success=True, final_url=request.url, first_paint_ms=5, settled_ms=7
+    )
+
+
+def filtered(request):
+    return browser_pb2.RequestFilterResponse(
+        success=request.profile != "bad",
+        error="Unknown profile" if request.profile == "bad" else "",
+        profile=request.profile,
+    )
+
+
+def apphost():
+    return Stub(
+        Navigate=Method(navigated),
+        Preload=Method(
+            lambda request: browser_pb2.PreloadResponse(
+                success=True, final_url=request.url, load_ms=3
+            )
+        ),
+        Activate=Method(
+            lambda request: browser_pb2.ActivateResponse(
+                success=True, url="https://preloaded", swap_ms=1
+            )
+        ),
+        GetURL=Method(lambda request: browser_pb2.GetURLResponse(url="https://now")),
+        SetDisplayConfig=Method(
+            lambda request: browser_pb2.DisplayConfigResponse(
+                success=True, config=request
+            )
+        ),
+        SetStreamConfig=Method(
+            lambda request: browser_pb2.StreamConfigResponse(
+                success=True, config=request
+            )
+        ),
+        SetRequestFilter=Method(filtered),
+    )
+
+
+CALLS = [
+    ("get", "/health", None),
+    ("get", "/apphosts", None),
+    ("get", "/apphost/apphost1", None),
+    ("get", "/apphost/nope", None),
+    ("post", "/apphost/apphost1", {"url": "https://a", "settle_ms": 7}),
+    ("post", "/apphost/apphost1", {"url": "https://fail"}),
+    ("post", "/apphost/apphost1", {"url": "https://crash"}),
+    ("post", "/apphost/apphost1", {}),
+    ("post", "/apphost/nope", {"url": "https://a"}),
+    ("post", "/apphost/apphost2/preload", {"url": "https://p", "slot": 1}),
+    ("post", "/apphost/apphost2/preload", {}),
+    ("post", "/apphost/apphost2/activate", {}),
+    ("post", "/apphosts/navigate", {"url": "https://all"}),
+    ("post", "/apphosts/navigate", {"url": "https://crash"}),
+    ("post", "/apphost/apphost1/display", {"width": 960, "height": 540}),
+    ("post", "/apphost/apphost1/display", {"width": 960}),
+    ("post", "/apphost/apphost1/stream", {"encoder": "h264", "gop": "x"}),
+    ("post", "/apphost/apphost1/stream", {"encoder": "h264", "slot": 1}),
+    ("post", "/apphosts/stream", {"encoder": "h264", "bitrate_kbps": 800}),
+    ("post", "/apphost/apphost1/filter", {"profile": "bad"}),
+    ("post", "/apphosts/filter", {"profile": "lite"}),
+    ("post", "/apphosts/filter", {}),
+    ("post", "/layout", {"cols": 2, "rows": 1, "width": 1920, "height": 1080}),
+    ("post", "/layout", {"cols": 0}),
+    ("post", "/apphost/nope/playlist", {"entries": []}),
+    ("get", "/playlists", None),
+    ("delete", "/apphost/apphost1/playlist", None),
+]
+
+
+def without_timings(value):
+    """A response body with its run-dependent timings taken out"""
+    if isinstance(value, dict):
+        return {
+            key: without_timings(item)
+            for key, item in value.items()
+            if key not in ("elapsed_ms", "open_s", "last_seen_s")
+        }
+    if isinstance(value, list):
+        return [without_timings(item) for item in value]
+    return value
+
+
+def call(client, method, path, body):
+    if body is None:
+        response = getattr(client, method)(path)
+    else:
+        response = getattr(client, method)(path, json=body)
+    data = response.get_json() if hasattr(response, "get_json") else response.json()
+    return response.status_code, without_timings(data)
+
+
+def both_apps(test):
+    """Run test(client) against the Flask and the ASGI app, fresh each time"""
+    results = []
+    for front_end in ("flask", "asgi"):
+        controller = make_controller(
+            {"apphost1": apphost(), "apphost2": apphost()},
+            slots={"apphost1": 2},
+        )
+        try:
+            if front_end == "flask":
+                client = create_http_api(controller).test_client()
+                client.controller = controller
+                results.append(test(client))
+            else:
+                with TestClient(asgi.create_asgi_app(controller)) as client:
+                    client.controller = controller
+                    results.append(test(client))
+        finally:
+            controller.registry.close()
+    return results
+
+
+def test_routes_match_flask():
+    flask, asgi_ = both_apps(lambda client: [call(client, *spec) for spec in CALLS])
+    for spec, expected, actual in zip(CALLS, flask, asgi_):
+        assert actual == expected, (spec, expected, actual)
+
+    statuses = [status for status, _ in asgi_]
+    assert statuses[CALLS.index(("post", "/apphost/apphost1", {}))] == 400
+    assert statuses[CALLS.index(("post", "/layout", {"cols": 0}))] == 400
+    failed = ("post", "/apphost/apphost1", {"url": "https://fail"})
+    assert statuses[CALLS.index(failed)] == 500
+
+
+def test_grpc_errors_are_500s():
+    def navigate(client):
+        return call(client, "post", "/apphost/apphost1", {"url": "https://crash"})
+
+    flask, asgi_ = both_apps(navigate)
+    assert flask == asgi_
+    status, body = asgi_
+    assert status == 500 and not body["success"]
+    assert "Exception calling application" in body["error"], body
+
+
+def test_open_circuit_fails_fast_with_500():
+    def navigate(client):
+        started = time.monotonic()
+        status, body = call(client, "post", "/apphost/apphost1", {"url": "https://a"})
+        return status, body, time.monotonic() - started
+
+    def open_circuit(client):
+        # The fixture's navigations answer at once; make this one hang
+        controller = client.controller
+        controller.registry.get("apphost1").stub.Navigate.delay = 5
+        controller.registry.get("apphost1").channel.breaker.trip("test")
+        return navigate(client)
+
+    flask, asgi_ = both_apps(open_circuit)
+    for status, body, elapsed in (flask, asgi_):
+        assert status == 500 and not body["success"]
+        assert "circuit open" in body["error"], body
+        assert elapsed < 0.5, "called through an open circuit"
+    assert flask[:2] == asgi_[:2]
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        started = time.monotonic()
+        try:
+            test()
+            print(f"✅ {test.__name__} ({(time.monotonic() - started) * 1000:.1f} ms)")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+"""
+Tests for managed apphost channels: the circuit breaker's counting, failing
+fast against a dead apphost, and closing again once grpc_health answers
+SERVING.
+"""
+
+import os
+import sys
+import time
+from concurrent import futures
+
+import grpc
+from grpc_health.v1 import health, health_pb2, health_pb2_grpc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from channels import CircuitBreaker, CircuitOpenError, ManagedChannel
+
+
+def start_apphost(port=0, status=health_pb2.HealthCheckResponse.SERVING):
+    """A gRPC server with only the health service; (server, servicer, port)"""
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    servicer = health.HealthServicer()
+    health_pb2_grpc.add_HealthServicer_to_server(servicer, server)
+    servicer.set("apphost", status)
+    port = server.add_insecure_port(f"127.0.0.1:{port}")
+    server.start()
+    return server, servicer, port
+
+
+def unused_port():
+    server, _, port = start_apphost()
+    server.stop(0).wait()
+    return port
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+def check(channel, timeout=5):
+    stub = health_pb2_grpc.HealthStub(channel.channel)
+    return stub.Check(health_pb2.HealthCheckRequest(service="apphost"), timeout=timeout)
+
+
+def test_breaker_trips_on_consecutive_failures():
+    breaker = CircuitBreaker("apphost1", failure_threshold=3)
+    breaker.record(grpc.StatusCode.UNAVAILABLE)
+    breaker.record(grpc.StatusCode.DEADLINE_EXCEEDED)
+    breaker.record(grpc.StatusCode.OK)
+    breaker.record(grpc.StatusCode.UNAVAILABLE)
+    breaker.record(grpc.StatusCode.CANCELLED)
+    breaker.record(grpc.StatusCode.INVALID_ARGUMENT)
+    assert not breaker.open, "an answered call should reset the count"
+
+    for _ in range(3):
+        breaker.record(grpc.StatusCode.UNAVAILABLE)
+    assert breaker.open and breaker.trips == 1
+    try:
+        breaker.check()
+    except CircuitOpenError as e:
+        assert e.code() == grpc.StatusCode.UNAVAILABLE
+        assert "3 consecutive UNAVAILABLE" in e.details()
+    else:
+        raise AssertionError("open circuit let a call through")
+
+    breaker.reset()
+    assert not breaker.open and breaker.failures == 0
+    assert breaker.status()["rejected"] == 1
+
+
+def test_dead_apphost_fails_fast():
+    channel = ManagedChannel(
+        f"127.0.0.1:{unused_port()}", failure_threshold=3, probe_interval=0.05
+    )
+    try:
+        try:
+            check(channel)
+        except grpc.RpcError as e:
+            assert e.code() == grpc.StatusCode.UNAVAILABLE
+        wait_for(lambda: channel.breaker.open)
+
+        started = time.monotonic()
+        try:
+            check(channel, timeout=30)
+        except CircuitOpenError:
+            pass
+        else:
+            raise AssertionError("call reached a dead apphost")
+        assert time.monotonic() - started < 0.1
+
+        stub = health_pb2_grpc.HealthStub(channel.channel)
+        future = stub.Check.future(health_pb2.HealthCheckRequest(service="apphost"))
+        assert isinstance(future.exception(), CircuitOpenError)
+        assert channel.status()["circuit"] == "open"
+    finally:
+        channel.close()
+
+
+def test_circuit_closes_when_apphost_serves_again():
+    port = unused_port()
+    channel = ManagedChannel(f"127.0.0.1:{port}", probe_interval=0.05)
+    server = None
+    try:
+        wait_for(lambda: channel.breaker.open)
+        server, _, _ = start_apphost(port)
+        wait_for(lambda: not channel.breaker.open)
+        assert check(channel).status == health_pb2.HealthCheckResponse.SERVING
+    finally:
+        channel.close()
+        if server:
+            server.stop(0)
+
+
+def test_not_serving_keeps_circuit_open():
+    server, servicer, port = start_apphost(
+        status=health_pb2.HealthCheckResponse.NOT_SERVING
+    )
+    channel = ManagedChannel(f"127.0.0.1:{port}", probe_interval=0.05)
+    try:
+        check(channel)
+        channel.breaker.trip("test")
+        time.sleep(0.3)
+        assert channel.breaker.open, "closed while the apphost was NOT_SERVING"
+
+        servicer.set("apphost", health_pb2.HealthCheckResponse.SERVING)
+        wait_for(lambda: not channel.breaker.open)
+    finally:
+        channel.close()
+        server.stop(0)
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        started = time.monotonic()
+        try:
+            test()
+            print(f"✅ {test.__name__} ({(time.monotonic() - started) * 1000:.1f} ms)")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the HTTP request parsing shared by the Flask and ASGI front ends:
+assignments and stream configs are rejected before any request is built.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from http_api import (
+    boolean,
+    int32,
+    parse_assignments,
+    parse_display_config,
+    parse_slot,
+    parse_stream_config,
+)
+
+
+def rejects(parse, *args):
+    try:
+        parse(*args)
+    except ValueError as e:
+        return str(e)
+    raise AssertionError(f"accepted {args!r}")
+
+
+def test_int32_range():
+    assert int32("2147483647") == 2**31 - 1
+    assert int32(0) == 0
+    rejects(int32, 2**31)
+    rejects(int32, 1099511627776)
+    rejects(int32, -1)
+
+
+def test_boolean_spellings():
+    assert boolean(True) and boolean("true") and boolean("1") and boolean(1)
+    assert not boolean(False) and not boolean("false") and not boolean("0")
+    assert not boolean(0) and not boolean(" No ")
+    rejects(boolean, "maybe")
+    rejects(boolean, 2)
+
+
+def test_assignments_are_checked_up_front():
+    assignments, options = parse_assignments(
+        {
+            "assignments": {
+                "apphost1": "https://a",
+                "apphost2": {"url": "https://b", "wait_until_load": "false"},
+            },
+            "timeout_ms": "20000",
+            "wait_until_load": "true",
+            "ignored": 1,
+        }
+    )
+    assert options == {"timeout_ms": 20000, "wait_until_load": True}
+    assert assignments["apphost2"] == {"url": "https://b", "wait_until_load": False}
+
+    error = rejects(
+        parse_assignments,
+        {"assignments": {"apphost1": "https://a"}, "timeout_ms": 1099511627776},
+    )
+    assert "timeout_ms" in error
+    error = rejects(
+        parse_assignments,
+        {"assignments": {"apphost1": {"url": "https://a", "slot": 2**40}}},
+    )
+    assert "for apphost1" in error
+
+
+def test_stream_config_range():
+    assert parse_stream_config({"encoder": "h264", "gop": "60"}) == {
+        "encoder": "h264",
+        "gop": 60,
+    }
+    rejects(parse_stream_config, {"bitrate_kbps": 2**31})
+
+
+def test_slot_is_optional():
+    assert parse_stream_config({"slot": "2"}) == {"slot": 2}
+    assert parse_slot({}) is None and parse_slot({"slot": None}) is None
+    assert parse_slot({"slot": 1}) == 1
+    rejects(parse_slot, {"slot": "first"})
+
+
+def test_display_config():
+    assert parse_display_config({"width": "960", "height": 540}) == (960, 540, 0.0)
+    assert "'height'" in rejects(parse_display_config, {"width": 960})
+    rejects(parse_display_config, {"width": 0, "height": 540})
+    rejects(parse_display_config, {"width": 2**31, "height": 540})
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        started = time.monotonic()
+        try:
+            test()
+            print(f"✅ {test.__name__} ({(time.monotonic() - started) * 1000:.1f} ms)")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+"""
+Tests for controller playlists: preload ahead of each switch, activate on
+time, and fall back to navigation when preloading fails.
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from playlist import Playlist
+
+
+class RecordingController:
+    """Controller stand-in that records calls with their time"""
+
+    def __init__(self, failing_preloads=()):
+        self.failing_preloads = set(failing_preloads)
+        self.calls = []
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+
+    def _record(self, method, url):
+        with self.lock:
+            self.calls.append((method, url, time.monotonic() - self.started))
+
+    def preload_apphost(self, apphost_name, url, slot=0):
+        self._record("preload", url)
+        if url in self.failing_preloads:
+            return False, "net::ERR_NAME_NOT_RESOLVED"
+        return True, url
+
+    def activate_apphost(self, apphost_name, url="", slot=0):
+        self._record("activate", url)
+        return True, url
+
+    def navigate_apphost(self, apphost_name, url, slot=0):
+        self._record("navigate", url)
+        return True, url
+
+
+def test_playlist_preloads_before_each_switch():
+    controller = RecordingController()
+    entries = [
+        {"url": "https://a", "duration": 0.2},
+        {"url": "https://b", "duration": 0.2},
+    ]
+    playlist = Playlist(controller, "apphost1", entries, preload_lead=0.1, loop=False)
+    playlist.start()
+    playlist.thread.join(timeout=2)
+
+    assert [(method, url) for method, url, _ in controller.calls] == [
+        ("preload", "https://a"),
+        ("activate", "https://a"),
+        ("preload", "https://b"),
+        ("activate", "https://b"),
+    ]
+    preload_b, activate_b = controller.calls[2][2], controller.calls[3][2]
+    assert 0.05 < activate_b - preload_b < 0.2, (preload_b, activate_b)
+    assert 0.15 < activate_b < 0.35, activate_b
+    assert playlist.status()["url"] == "https://b"
+    assert playlist.switches == 2 and playlist.fallbacks == 0
+
+
+def test_failed_preload_falls_back_to_navigate():
+    controller = RecordingController(failing_preloads={"https://b"})
+    entries = [
+        {"url": "https://a", "duration": 0.1},
+        {"url": "https://b", "duration": 0.1},
+    ]
+    playlist = Playlist(controller, "apphost1", entries, preload_lead=0.05, loop=False)
+    playlist.start()
+    playlist.thread.join(timeout=2)
+
+    assert [(method, url) for method, url, _ in controller.calls][2:] == [
+        ("preload", "https://b"),
+        ("navigate", "https://b"),
+    ]
+    assert playlist.fallbacks == 1 and playlist.last_error is None
+
+
+def test_looping_playlist_stops():
+    controller = RecordingController()
+    playlist = Playlist(
+        controller, "apphost1", [{"url": "https://a", "duration": 0.05}], preload_lead=0
+    )
+    playlist.start()
+    time.sleep(0.2)
+    playlist.stop()
+    assert not playlist.running
+    assert playlist.switches >= 3
+
+
+def test_invalid_entries_are_rejected():
+    for entries in ([], [{"url": "https://a"}], [{"url": "", "duration": 1}]):
+        try:
+            Playlist(RecordingController(), "apphost1", entries)
+        except ValueError:
+            continue
+        raise AssertionError(f"{entries} accepted")
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        started = time.monotonic()
+        try:
+            test()
+            print(f"✅ {test.__name__} ({(time.monotonic() - started) * 1000:.1f} ms)")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
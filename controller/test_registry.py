@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the apphost registry: registration, refresh and moves, expiry,
+static APPHOSTS entries and the Heartbeat/Deregister servicer.
+"""
+
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from registry import ApphostRegistry, RegistryServicer, parse_apphosts
+
+
+class FakeChannel:
+    def __init__(self, address):
+        self.address = address
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def connect(address):
+    channel = FakeChannel(address)
+    return channel, f"stub:{address}"
+
+
+class Message(SimpleNamespace):
+    """Stand-in for the generated response messages"""
+
+    def __init__(self, **fields):
+        super().__init__(**{"error": "", "interval_s": 0.0, **fields})
+
+
+PB2 = SimpleNamespace(HeartbeatResponse=Message, DeregisterResponse=Message)
+
+
+def recording_registry(ttl=15):
+    registry = ApphostRegistry(connect, ttl=ttl)
+    events = []
+    registry.add_listener(
+        lambda apphost: events.append(("added", apphost.name, apphost.address)),
+        lambda apphost: events.append(("removed", apphost.name, apphost.address)),
+    )
+    return registry, events
+
+
+def test_parse_apphosts():
+    assert parse_apphosts("") == []
+    assert parse_apphosts("a=h1:3000, b=h2:3001,") == [
+        ("a", "h1:3000"),
+        ("b", "h2:3001"),
+    ]
+    try:
+        parse_apphosts("a=h1")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("accepted an address without a port")
+
+
+def test_heartbeat_registers_then_refreshes():
+    registry, events = recording_registry()
+    assert registry.heartbeat("apphost1", "h1:3000", "udp://tiler:2001", 2, 1920, 1080)
+    assert registry.stubs == {"apphost1": "stub:h1:3000"}
+    assert registry.targets == {"apphost1": "h1:3000"}
+    stubs = registry.stubs
+
+    assert not registry.heartbeat("apphost1", "h1:3000", ready=True, capacity=2)
+    assert registry.stubs is stubs, "a refresh should not republish"
+    assert registry.get("apphost1").ready
+    assert events == [("added", "apphost1", "h1:3000")]
+
+    [info] = registry.list()
+    assert info["name"] == "apphost1" and info["capacity"] == 2
+
+
+def test_address_change_replaces_channel():
+    registry, events = recording_registry()
+    registry.heartbeat("apphost1", "old:3000")
+    old = registry.get("apphost1")
+
+    assert registry.heartbeat("apphost1", "new:3000")
+    assert old.closed.is_set() and old.channel.closed
+    assert not registry.get("apphost1").channel.closed
+    assert registry.targets == {"apphost1": "new:3000"}
+    assert events == [
+        ("added", "apphost1", "old:3000"),
+        ("removed", "apphost1", "old:3000"),
+        ("added", "apphost1", "new:3000"),
+    ]
+
+
+def test_stale_entries_expire_but_static_ones_stay():
+    registry, events = recording_registry(ttl=0.05)
+    registry.heartbeat("apphost1", "h1:3000")
+    registry.heartbeat("pinned", "h2:3000", static=True)
+    time.sleep(0.1)
+    registry.heartbeat("apphost3", "h3:3000")
+
+    assert registry.expire() == ["apphost1"]
+    assert sorted(registry.stubs) == ["apphost3", "pinned"]
+    assert ("removed", "apphost1", "h1:3000") in events
+
+
+def test_reaper_expires_in_background():
+    registry, _ = recording_registry(ttl=0.06)
+    registry.heartbeat("apphost1", "h1:3000")
+    registry.start()
+    try:
+        deadline = time.monotonic() + 2
+        while registry.get("apphost1") and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert registry.get("apphost1") is None
+    finally:
+        registry.close()
+
+
+def test_servicer_heartbeat_and_deregister():
+    registry, _ = recording_registry(ttl=9)
+    servicer = RegistryServicer(registry, PB2)
+
+    response = servicer.Heartbeat(
+        SimpleNamespace(
+            name="apphost1",
+            address="h1:3000",
+            stream_endpoint="shm:///dev/shm/apphost1/frames.ring",
+            capacity=4,
+            width=1280,
+            height=720,
+            ready=True,
+        ),
+        None,
+    )
+    assert response.accepted and response.interval_s == 3
+    assert registry.get("apphost1").capacity == 4
+
+    rejected = servicer.Heartbeat(SimpleNamespace(name="", address=""), None)
+    assert not rejected.accepted and rejected.error
+
+    assert servicer.Deregister(SimpleNamespace(name="apphost1"), None).success
+    assert not servicer.Deregister(SimpleNamespace(name="apphost1"), None).success
+    assert registry.stubs == {}
+
+
+def test_servicer_keeps_static_entries_pinned():
+    registry, _ = recording_registry()
+    registry.heartbeat("apphost1", "apphost1:3000", static=True)
+    servicer = RegistryServicer(registry, PB2)
+
+    request = SimpleNamespace(
+        name="apphost1",
+        address="10.0.0.7:3000",
+        stream_endpoint="udp://tiler:2001",
+        capacity=1,
+        width=1920,
+        height=1080,
+        ready=True,
+    )
+    assert servicer.Heartbeat(request, None).accepted
+    apphost = registry.get("apphost1")
+    assert apphost.address == "apphost1:3000" and apphost.static and apphost.ready
+    assert not servicer.Deregister(SimpleNamespace(name="apphost1"), None).success
+    assert registry.get("apphost1") is apphost
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        started = time.monotonic()
+        try:
+            test()
+            print(f"✅ {test.__name__} ({(time.monotonic() - started) * 1000:.1f} ms)")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+
+"""
+Tests for ControllerService and its Flask HTTP API against fake apphost
+stubs: status stream mirroring, concurrent dispatch, the streamed
+/apphosts/assign route and per-slot fan-outs.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent import futures
+
+import grpc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+# The apphost stubs are generated at build time; generate them if missing
+try:
+    import browser_pb2
+except ImportError:
+    generated = tempfile.mkdtemp()
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "grpc_tools.protoc",
+            f"-I{os.path.join(HERE, '..', 'apphost')}",
+            f"--python_out={generated}",
+            f"--grpc_python_out={generated}",
+            "browser.proto",
+        ],
+        check=True,
+    )
+    sys.path.append(generated)
+    import browser_pb2
+
+from channels import CircuitBreaker, CircuitOpenError
+from server import ControllerService, create_http_api
+
+
+class RpcError(grpc.RpcError):
+    def __init__(self, code, details=""):
+        super().__init__()
+        self._code = code
+        self._details = details
+
+    def code(self):
+        return self._code
+
+    def details(self):
+        return self._details
+
+    def __str__(self):
+        return f'<RpcError of RPC that terminated with:\n\tstatus = {self._code}\n\tdetails = "{self._details}">'
+
+
+class Method:
+    """A stub method answering with handler(request) after delay seconds
+
+    handler may raise RpcError. Calls past their timeout fail with
+    DEADLINE_EXCEEDED when the timeout runs out, and calls while the
+    channel's circuit is open fail at once, as through a ManagedChannel.
+    """
+
+    def __init__(self, handler, delay=0.0):
+        self.handler = handler
+        self.delay = delay
+        self.breaker = None
+        self.requests = []
+
+    def __call__(self, request, timeout=None):
+        return self.future(request, timeout).result()
+
+    def future(self, request, timeout=None):
+        self.requests.append(request)
+        future = futures.Future()
+        try:
+            if self.breaker:
+                self.breaker.check()
+        except CircuitOpenError as e:
+            future.set_exception(e)
+            return future
+
+        def finish():
+            try:
+                if timeout is not None and self.delay > timeout:
+                    raise RpcError(
+                        grpc.StatusCode.DEADLINE_EXCEEDED, "Deadline Exceeded"
+                    )
+                future.set_result(self.handler(request))
+            except grpc.RpcError as e:
+                future.set_exception(e)
+
+        wait = self.delay if timeout is None else min(self.delay, timeout)
+        threading.Timer(wait, finish).start()
+        return future
+
+
+class Stub:
+    """BrowserService stub stand-in built from Methods"""
+
+    def __init__(self, **methods):
+        self.__dict__.update(methods)
+
+
+class Channel:
+    """ManagedChannel stand-in: a circuit breaker guarding a Stub"""
+
+    def __init__(self, address, stub):
+        self.address = address
+        self.breaker = CircuitBreaker(address)
+        for method in vars(stub).values():
+            method.breaker = self.breaker
+
+    def status(self):
+        return {"channel": "READY", **self.breaker.status()}
+
+    def close(self):
+        pass
+
+
+def navigated(request):
+    return browser_pb2.NavigateResponse(
+        success=True, final_url=request.url, first_paint_ms=5
+    )
+
+
+def make_controller(stubs, slots=None):
+    """A ControllerService whose apphosts are the given stubs, by name"""
+    os.environ.pop("APPHOSTS", None)
+    controller = ControllerService()
+    controller.watching = False
+    controller.registry.connect = lambda address: (
+        Channel(address, stubs[address]),
+        stubs[address],
+    )
+    for name in stubs:
+        controller.registry.heartbeat(
+            name, name, capacity=(slots or {}).get(name, 1), static=True
+        )
+    return controller
+
+
+def events(text, sse=False):
+    """(event, payload) pairs of an NDJSON or SSE body"""
+    if not sse:
+        return [("line", json.loads(line)) for line in text.splitlines()]
+    parsed = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        parsed.append((fields["event"], json.loads(fields["data"])))
+    return parsed
+
+
+def assign_controller():
+    return make_controller(
+        {
+            "slow": Stub(Navigate=Method(navigated, delay=0.15)),
+            "fast": Stub(Navigate=Method(navigated)),
+            "broken": Stub(
+                Navigate=Method(
+                    lambda request: browser_pb2.NavigateResponse(
+                        success=False, error="net::ERR_NAME_NOT_RESOLVED"
+                    ),
+                    delay=0.05,
+                )
+            ),
+        }
+    )
+
+
+ASSIGNMENTS = {
+    "assignments": {
+        "slow": "https://slow.example",
+        "fast": {"url": "https://fast.example", "slot": 0},
+        "broken": "https://broken.example",
+        "missing": "https://missing.example",
+    },
+    "timeout_ms": 5000,
+}
+
+
+class StatusStream:
+    """WatchStatus stand-in serving each call's updates from a list of scripts
+
+    A script is a generator function of the call's request; each call takes
+    the next one.
+    """
+
+    def __init__(self, *scripts):
+        self.scripts = list(scripts)
+        self.calls = 0
+
+    def __call__(self, request, timeout=None):
+        self.calls += 1
+        return self.scripts.pop(0)(request)
+
+
+def status(url, sequence, event="load"):
+    return browser_pb2.StatusUpdate(
+        event=event, url=url, browser_ready=True, sequence=sequence
+    )
+
+
+def wait_for(condition, timeout=3):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_watcher_mirrors_updates_and_reconnects():
+    seen_two = threading.Event()
+    lost = threading.Event()
+
+    def first(request):
+        yield status("https://a.example", 1, "initial")
+        yield status("https://b.example", 2)
+        seen_two.set()
+        lost.wait(3)
+        raise RpcError(grpc.StatusCode.UNAVAILABLE, "Socket closed")
+
+    def second(request):
+        yield status("https://c.example", 3, "initial")
+        apphost.closed.wait(3)
+        # What closing the channel does to a stream
+        raise ValueError("Cannot invoke RPC on closed channel!")
+
+    stream = StatusStream(first, second)
+    controller = make_controller(
+        {
+            "apphost1": Stub(
+                WatchStatus=stream,
+                GetStatus=Method(
+                    lambda request: browser_pb2.GetStatusResponse(slot_count=2)
+                ),
+            )
+        }
+    )
+    apphost = controller.registry.get("apphost1")
+    watcher = threading.Thread(target=controller._watch_apphost, args=(apphost,))
+    try:
+        watcher.start()
+        assert seen_two.wait(3)
+        state = controller._live_state("apphost1")
+        assert (state["url"], state["event"], state["sequence"]) == (
+            "https://b.example",
+            "load",
+            2,
+        )
+        assert controller.apphost_urls["apphost1"] == "https://b.example"
+        # An APPHOSTS entry learns its slot count before subscribing
+        assert apphost.capacity == 2
+
+        lost.set()
+        wait_for(lambda: controller._live_state("apphost1") is None)
+        # The last URL stays known while the stream is down
+        assert controller.apphost_urls["apphost1"] == "https://b.example"
+
+        # Resubscribed after the first backoff, a second
+        wait_for(lambda: controller._live_state("apphost1") is not None)
+        assert stream.calls == 2
+        assert controller._live_state("apphost1")["sequence"] == 3
+        assert controller.apphost_urls["apphost1"] == "https://c.example"
+    finally:
+        apphost.closed.set()
+        watcher.join(3)
+        controller.registry.close()
+    assert not watcher.is_alive()
+    assert stream.calls == 2, "resubscribed to a closed apphost"
+
+
+def test_dispatch_takes_as_long_as_the_slowest_apphost():
+    def failing(request):
+        raise RpcError(grpc.StatusCode.UNAVAILABLE, "Connection refused")
+
+    controller = make_controller(
+        {
+            "slow": Stub(Navigate=Method(navigated, delay=0.3)),
+            "medium": Stub(Navigate=Method(navigated, delay=0.2)),
+            "failing": Stub(Navigate=Method(failing, delay=0.1)),
+            "fast": Stub(Navigate=Method(navigated)),
+        }
+    )
+    try:
+        requests = {
+            name: browser_pb2.NavigateRequest(url=f"https://{name}.example")
+            for name in ("gone", "slow", "medium", "failing", "fast")
+        }
+
+        started = time.monotonic()
+        dispatched = list(controller._dispatch("Navigate", requests, deadline=5))
+        elapsed = time.monotonic() - started
+
+        # Sequential calls would take the sum, 0.6 s
+        assert 0.3 <= elapsed < 0.45, elapsed
+        order = [key for key, _, _, _ in dispatched]
+        assert order == ["gone", "fast", "failing", "medium", "slow"]
+        results = {key: (response, error) for key, response, error, _ in dispatched}
+        assert results["gone"] == (None, "Apphost gone not found")
+        assert results["failing"] == (None, "Connection refused")
+        for name in ("slow", "medium", "fast"):
+            response, error = results[name]
+            assert error is None and response.final_url == f"https://{name}.example"
+        elapsed_ms = {key: ms for key, _, _, ms in dispatched}
+        assert elapsed_ms["slow"] >= 300 and elapsed_ms["fast"] < 100
+    finally:
+        controller.registry.close()
+
+
+def test_dispatch_deadline_fails_only_the_late_apphost():
+    controller = make_controller(
+        {
+            "late": Stub(Navigate=Method(navigated, delay=5)),
+            "fast": Stub(Navigate=Method(navigated)),
+        }
+    )
+    try:
+        requests = {
+            name: browser_pb2.NavigateRequest(url="https://a")
+            for name in ("late", "fast")
+        }
+        started = time.monotonic()
+        results = {
+            key: (response, error)
+            for key, response, error, _ in controller._dispatch(
+                "Navigate", requests, deadline=0.2
+            )
+        }
+        assert time.monotonic() - started < 0.5
+        assert results["late"] == (None, "Deadline Exceeded")
+        assert results["fast"][0].success and results["fast"][1] is None
+    finally:
+        controller.registry.close()
+
+
+def test_assign_streams_ndjson_in_completion_order():
+    controller = assign_controller()
+    try:
+        client = create_http_api(controller).test_client()
+        response = client.post("/apphosts/assign", json=ASSIGNMENTS)
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        assert response.headers["Cache-Control"] == "no-cache"
+
+        lines = [payload for _, payload in events(response.get_data(as_text=True))]
+        *results, done = lines
+        assert [result["apphost"] for result in results] == [
+            "missing",
+            "fast",
+            "broken",
+            "slow",
+        ]
+        assert results[0]["error"] == "Apphost missing not found"
+        assert results[1]["success"] and results[1]["url"] == "https://fast.example"
+        assert results[2]["error"] == "net::ERR_NAME_NOT_RESOLVED"
+        assert results[3]["elapsed_ms"] >= 150
+        assert done["done"] and (done["succeeded"], done["failed"]) == (2, 2)
+        assert controller.apphost_urls["fast"] == "https://fast.example"
+    finally:
+        controller.registry.close()
+
+
+def test_assign_streams_server_sent_events():
+    controller = assign_controller()
+    try:
+        client = create_http_api(controller).test_client()
+        for kwargs in (
+            {"headers": {"Accept": "text/event-stream"}},
+            {"query_string": {"format": "sse"}},
+        ):
+            response = client.post("/apphosts/assign", json=ASSIGNMENTS, **kwargs)
+            assert response.mimetype == "text/event-stream"
+            streamed = events(response.get_data(as_text=True), sse=True)
+            assert [event for event, _ in streamed] == ["result"] * 4 + ["done"]
+            assert streamed[-1][1]["succeeded"] == 2
+    finally:
+        controller.registry.close()
+
+
+def test_bad_assignments_get_400_before_streaming():
+    controller = assign_controller()
+    try:
+        client = create_http_api(controller).test_client()
+        for body in (
+            {},
+            {"assignments": {}},
+            {"assignments": {"fast": "https://a"}, "timeout_ms": 2**40},
+            {"assignments": {"fast": {"slot": 1}}},
+            {"assignments": {"fast": {"url": "https://a", "slot": -1}}},
+            {"assignments": {"fast": {"url": "https://a", "wait_until_load": "no?"}}},
+            {"assignments": {"fast": "https://a"}, "deadline": "soon"},
+        ):
+            response = client.post("/apphosts/assign", json=body)
+            assert response.status_code == 400, body
+            assert response.mimetype == "application/json"
+            assert "error" in response.get_json()
+        assert controller.registry.get("fast").stub.Navigate.requests == []
+    finally:
+        controller.registry.close()
+
+
+def test_per_slot_copies_requests_out_to_every_slot():
+    controller = make_controller({"one": Stub(), "three": Stub()}, slots={"three": 3})
+    try:
+        request = browser_pb2.DisplayConfig(width=960, height=540)
+        requests = {"one": request, "three": request}
+
+        per_slot = controller._per_slot(requests)
+        assert sorted(per_slot) == [
+            ("one", 0),
+            ("three", 0),
+            ("three", 1),
+            ("three", 2),
+        ]
+        for (_, slot), copy in per_slot.items():
+            assert copy.slot == slot and copy.width == 960
+        assert request.slot == 0, "the shared request was changed"
+
+        # One slot is addressed as given, even past an apphost's count;
+        # the apphost rejects it
+        assert sorted(controller._per_slot(requests, slot=2)) == [
+            ("one", 2),
+            ("three", 2),
+        ]
+    finally:
+        controller.registry.close()
+
+
+def test_merge_slots_reports_each_apphost_and_its_slots():
+    def result_of(response, error, elapsed_ms):
+        if error is None and not response.success:
+            error = response.error
+        return {"success": error is None, "error": error, "elapsed_ms": elapsed_ms}
+
+    ok = browser_pb2.DisplayConfigResponse(success=True)
+    refused = browser_pb2.DisplayConfigResponse(success=False, error="too wide")
+    dispatched = [
+        (("three", 2), None, "Deadline Exceeded", 900),
+        (("one", 0), ok, None, 10),
+        (("three", 1), refused, None, 30),
+        (("three", 0), ok, None, 20),
+    ]
+    controller = make_controller({})
+    merged = controller._merge_slots(
+        {"gone": {"success": False}}, dispatched, result_of
+    )
+    controller.registry.close()
+
+    assert merged["gone"] == {"success": False}
+    assert merged["one"] == {
+        "success": True,
+        "error": None,
+        "elapsed_ms": 10,
+        "slots": [{"slot": 0, "success": True, "error": None, "elapsed_ms": 10}],
+    }
+    three = merged["three"]
+    assert not three["success"]
+    assert three["error"] == "slot 1: too wide"
+    assert three["elapsed_ms"] == 900
+    assert [slot["slot"] for slot in three["slots"]] == [0, 1, 2]
+    assert [slot["success"] for slot in three["slots"]] == [True, False, False]
+
+
+def test_layout_resizes_every_slot():
+    def resized(request):
+        return browser_pb2.DisplayConfigResponse(success=True, config=request)
+
+    stubs = {
+        "one": Stub(SetDisplayConfig=Method(resized)),
+        "two": Stub(SetDisplayConfig=Method(resized)),
+    }
+    controller = make_controller(stubs, slots={"two": 2})
+    try:
+        results = controller.apply_layout(2, 1, 1920, 1080)
+        assert [len(results[name]["slots"]) for name in ("one", "two")] == [1, 2]
+        assert all(results[name]["width"] == 960 for name in results)
+        assert sorted(r.slot for r in stubs["two"].SetDisplayConfig.requests) == [0, 1]
+    finally:
+        controller.registry.close()
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        started = time.monotonic()
+        try:
+            test()
+            print(f"✅ {test.__name__} ({(time.monotonic() - started) * 1000:.1f} ms)")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
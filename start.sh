@@ -142,6 +142,8 @@ services:
       - tiler-network
     volumes:
       - ./static-tiler:/app
+      - ./apphost/framering.py:/opt/apphost/framering.py:ro
+      - ./apphost/capture.py:/opt/apphost/capture.py:ro
       - /dev/shm:/dev/shm
 EOF
 
@@ -169,6 +171,8 @@ cat >> "$COMPOSE_FILE" << EOF
       GST_PLUGIN_SYSTEM_PATH: /opt/nvidia/deepstream/deepstream/lib/gst-plugins:/usr/lib/x86_64-linux-gnu/gstreamer-1.0
       # GStreamer debug level (set to 2+ for troubleshooting)
       GST_DEBUG: "0"
+      # Tiler implementation: deepstream (GPU) or cpu (tiler.py, frame rings)
+      TILER_BACKEND: ${TILER_BACKEND:-deepstream}
       # CRITICAL: Library paths for codec plugins
       LD_LIBRARY_PATH: /opt/nvidia/deepstream/deepstream/lib:/usr/local/lib/x86_64-linux-gnu:/usr/local/cuda/lib64
       # Python
@@ -201,6 +205,9 @@ cat >> "$COMPOSE_FILE" << EOF
       - tiler-network
     environment:
       - PORT=5000
+      - CONTROLLER_HTTP=${CONTROLLER_HTTP:-asgi}
+    volumes:
+      - ./apphost/browser.proto:/app/browser.proto:ro
     restart: unless-stopped
     depends_on:
       - static-tiler
@@ -227,6 +234,12 @@ for i in $(seq 1 $NUM_APPHOSTS); do
       - DISPLAY=:99
       - PORT=$port
       - SERVICE_NAME=apphost${i}
+      - CONTROLLER_ADDRESS=controller:5000
+      - RESOLUTION=${APPHOST_RESOLUTION:-1920x1080}
+      - DEVICE_SCALE_FACTOR=${APPHOST_SCALE:-1}
+      - PAGE_SLOTS=${APPHOST_PAGE_SLOTS:-1}
+      - HTTP_CACHE_DIR=${APPHOST_HTTP_CACHE_DIR:-}
+      - REQUEST_FILTER=${APPHOST_REQUEST_FILTER:-none}
     ports:
       - "$port:$port"
       - "$grpc_port:$grpc_port"
@@ -234,6 +247,7 @@ for i in $(seq 1 $NUM_APPHOSTS); do
       - tiler-network
     volumes:
       - /dev/shm:/dev/shm
+      - apphost-http-cache:/var/cache/apphost-http
     restart: unless-stopped
 EOF
 done
@@ -244,6 +258,10 @@ cat >> "$COMPOSE_FILE" << EOF
 networks:
   tiler-network:
     driver: bridge
+
+volumes:
+  apphost-http-cache:
+    driver: local
 EOF
 
 # Generate volume definitions for all apphosts
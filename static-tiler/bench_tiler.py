@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+"""
+Throughput benchmark for the CPU tiler.
+Runs producer processes publishing 1080p frames into frame rings at the
+apphost frame rate and measures how fast the compositor keeps up: canvas
+compose time, effective output fps and source frames scaled per second,
+for each grid size and scaler. With --changing N only the first N sources
+alternate content and the rest republish a static page, showing how
+compositing cost follows the number of changed cells.
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from tiler import Compositor
+
+from framering import FrameRingWriter, frame_size
+
+
+def producer(path, args, stop, changing):
+    size = frame_size(args.width, args.height, args.format)
+    writer = FrameRingWriter(path, size, 4)
+    frames = [os.urandom(size) for _ in range(2)]
+    if not changing:
+        frames[1] = frames[0]
+    interval = 1 / args.source_fps
+    next_frame = time.monotonic()
+    n = 0
+    while not stop.is_set():
+        writer.write(frames[n % 2], args.width, args.height, args.format)
+        n += 1
+        next_frame += interval
+        time.sleep(max(0, next_frame - time.monotonic()))
+    writer.close()
+
+
+def bench_grid(directory, grid, method, args):
+    count = grid * grid
+    paths = [
+        os.path.join(directory, f"apphost{n}", "frames.ring") for n in range(count)
+    ]
+    stop = multiprocessing.Event()
+    producers = [
+        multiprocessing.Process(
+            target=producer,
+            args=(path, args, stop, args.changing < 0 or n < args.changing),
+        )
+        for n, path in enumerate(paths)
+    ]
+    for process in producers:
+        process.start()
+    while not all(os.path.exists(path) for path in paths):
+        time.sleep(0.05)
+
+    compositor = Compositor(
+        paths, grid, grid, args.output_width, args.output_height, method
+    )
+    compositor.start()
+    time.sleep(1)  # warm up
+    scaled_before = sum(source.frames for source in compositor.sources)
+    cells_before = compositor.cells_composited
+
+    compose_time = 0.0
+    composed = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < args.duration:
+        t0 = time.perf_counter()
+        compositor.compose()
+        compose_time += time.perf_counter() - t0
+        composed += 1
+        time.sleep(max(0, 1 / args.output_fps - (time.perf_counter() - t0)))
+    elapsed = time.perf_counter() - started
+    scaled = sum(source.frames for source in compositor.sources) - scaled_before
+    cells = compositor.cells_composited - cells_before
+
+    compositor.stop()
+    stop.set()
+    for process in producers:
+        process.join()
+
+    print(
+        f"{grid}x{grid} {args.format} {method:8s} "
+        f"compose {compose_time / composed * 1000:6.2f} ms "
+        f"output {composed / elapsed:5.1f} fps "
+        f"scaled {scaled / elapsed:6.1f} frames/s "
+        f"(offered {count * args.source_fps}) "
+        f"dirty {cells / composed:4.1f}/{count} cells"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--output-width", type=int, default=3840)
+    parser.add_argument("--output-height", type=int, default=2160)
+    parser.add_argument("--output-fps", type=int, default=30)
+    parser.add_argument("--source-fps", type=int, default=30)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--grids", default="2,3,4")
+    parser.add_argument("--scalers", default="nearest,box")
+    parser.add_argument(
+        "--format", default="RGBA", help="source format: RGBA, BGRx, I420, NV12"
+    )
+    parser.add_argument(
+        "--changing",
+        type=int,
+        default=-1,
+        help="number of sources with changing content (default all)",
+    )
+    args = parser.parse_args()
+
+    for grid in (int(g) for g in args.grids.split(",")):
+        for method in args.scalers.split(","):
+            with tempfile.TemporaryDirectory(dir="/dev/shm") as directory:
+                bench_grid(directory, grid, method, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,47 @@
 #!/bin/bash
 
-echo "Starting GStreamer pipeline with raw UDP sources..."
+if [ "${TILER_BACKEND:-deepstream}" = "cpu" ]; then
+  echo "Starting CPU tiler from apphost frame rings..."
+  exec python3 /app/tiler.py
+fi
+
+# Apphost capture resolution (apphost RESOLUTION); raw UDP caps are fixed,
+# so runtime layout changes need the CPU tiler and frame rings
+SOURCE_WIDTH=${SOURCE_WIDTH:-1920}
+SOURCE_HEIGHT=${SOURCE_HEIGHT:-1080}
+# Apphost FRAME_FORMAT; with NV12 the per-source videoconvert is a passthrough
+SOURCE_FORMAT=${SOURCE_FORMAT:-RGBA}
+
+# Apphost FRAME_ENCODER: none (raw video), h264 or jpeg over RTP
+SOURCE_ENCODER=${SOURCE_ENCODER:-none}
+SOURCE_LATENCY_MS=${SOURCE_LATENCY_MS:-50}
+
+SOURCES=()
+for i in $(seq 0 15); do
+  port=$((2001 + i))
+  case "$SOURCE_ENCODER" in
+    h264)
+      SOURCES+=(udpsrc port=$port "caps=application/x-rtp,media=video,encoding-name=H264,clock-rate=90000,payload=96" ! \
+        rtpjitterbuffer latency=$SOURCE_LATENCY_MS ! rtph264depay ! h264parse ! nvv4l2decoder ! mux.sink_$i)
+      ;;
+    jpeg)
+      SOURCES+=(udpsrc port=$port "caps=application/x-rtp,media=video,encoding-name=JPEG,clock-rate=90000,payload=26" ! \
+        rtpjitterbuffer latency=$SOURCE_LATENCY_MS ! rtpjpegdepay ! jpegdec ! queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_$i)
+      ;;
+    *)
+      SOURCES+=(udpsrc port=$port ! "video/x-raw,width=${SOURCE_WIDTH},height=${SOURCE_HEIGHT},framerate=60/1,format=${SOURCE_FORMAT}" ! \
+        queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_$i)
+      ;;
+  esac
+done
+
+echo "Starting GStreamer pipeline with ${SOURCE_ENCODER} UDP sources..."
 
 gst-launch-1.0 \
-  nvstreammux name=mux width=1920 height=1080 batch-size=16 batched-push-timeout=40000 ! \
+  nvstreammux name=mux width=${SOURCE_WIDTH} height=${SOURCE_HEIGHT} batch-size=16 batched-push-timeout=40000 ! \
   nvmultistreamtiler rows=4 columns=4 width=3840 height=2160 ! \
   nvv4l2h264enc bitrate=8000000 idrinterval=10 iframeinterval=10 profile=4 tuning-info-id=3 ! \
   h264parse config-interval=-1 ! \
   mpegtsmux ! \
   tcpserversink host=0.0.0.0 port=6000 sync=false \
-  udpsrc port=2001 ! "video/x-raw,width=1920,height=1080,framerate=60/1,format=RGBA" ! queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_0 \
-  udpsrc port=2002 ! "video/x-raw,width=1920,height=1080,framerate=60/1,format=RGBA" ! queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_1 \
-  udpsrc port=2003 ! "video/x-raw,width=1920,height=1080,framerate=60/1,format=RGBA" ! queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_2 \
-  udpsrc port=2004 ! "video/x-raw,width=1920,height=1080,framerate=60/1,format=RGBA" ! queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_3 \
-  udpsrc port=2005 ! "video/x-raw,width=1920,height=1080,framerate=60/1,format=RGBA" ! queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_4 \
-  udpsrc port=2006 ! "video/x-raw,width=1920,height=1080,framerate=60/1,format=RGBA" ! queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_5 \
-  udpsrc port=2007 ! "video/x-raw,width=1920,height=1080,framerate=60/1,format=RGBA" ! queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_6 \
-  udpsrc port=2008 ! "video/x-raw,width=1920,height=1080,framerate=60/1,format=RGBA" ! queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_7 \
-  udpsrc port=2009 ! "video/x-raw,width=1920,height=1080,framerate=60/1,format=RGBA" ! queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_8 \
-  udpsrc port=2010 ! "video/x-raw,width=1920,height=1080,framerate=60/1,format=RGBA" ! queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_9 \
-  udpsrc port=2011 ! "video/x-raw,width=1920,height=1080,framerate=60/1,format=RGBA" ! queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_10 \
-  udpsrc port=2012 ! "video/x-raw,width=1920,height=1080,framerate=60/1,format=RGBA" ! queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_11 \
-  udpsrc port=2013 ! "video/x-raw,width=1920,height=1080,framerate=60/1,format=RGBA" ! queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_12 \
-  udpsrc port=2014 ! "video/x-raw,width=1920,height=1080,framerate=60/1,format=RGBA" ! queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_13 \
-  udpsrc port=2015 ! "video/x-raw,width=1920,height=1080,framerate=60/1,format=RGBA" ! queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_14 \
-  udpsrc port=2016 ! "video/x-raw,width=1920,height=1080,framerate=60/1,format=RGBA" ! queue ! videoconvert ! "video/x-raw,format=NV12" ! mux.sink_15
+  "${SOURCES[@]}"
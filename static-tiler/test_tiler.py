@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the CPU tiler: cell scaling, channel reordering, I420/NV12
+conversion, compositor cell placement, dirty-cell tracking and ingest
+from a frame ring.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from tiler import CellScaler, Compositor
+
+# tiler.py puts the apphost directory (framering.py) on the path
+from framering import FrameRingReader, FrameRingWriter, frame_size, plane_layout
+
+
+def gradient(width, height):
+    frame = np.zeros((height, width, 4), dtype=np.uint8)
+    frame[..., 0] = np.arange(width, dtype=np.uint8)[None, :]
+    frame[..., 1] = np.arange(height, dtype=np.uint8)[:, None]
+    frame[..., 2] = 7
+    frame[..., 3] = 255
+    return frame
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("condition not met")
+        time.sleep(0.01)
+
+
+def test_nearest_picks_source_pixels():
+    out = CellScaler(4, 2).scale(gradient(16, 8))
+    assert out[..., 0].tolist() == [[0, 4, 8, 12]] * 2
+    assert out[:, 0, 1].tolist() == [0, 4]
+
+
+def test_box_averages_blocks():
+    frame = np.zeros((4, 4, 4), dtype=np.uint8)
+    frame[0, 0] = frame[1, 1] = 200
+    out = CellScaler(2, 2, "box").scale(frame)
+    assert out[0, 0].tolist() == [100] * 4
+    assert out[1, 1].tolist() == [0] * 4
+
+
+def test_bgrx_is_swizzled_to_rgba():
+    frame = np.empty((2, 2, 4), dtype=np.uint8)
+    frame[...] = (1, 2, 3, 0)
+    out = CellScaler(2, 2).scale(frame, "BGRx")
+    assert out[0, 0].tolist() == [3, 2, 1, 0]
+
+
+def yuv_frame(directory, fmt, width, height, y, u, v):
+    """Publish a solid-color planar frame and read it back from a ring"""
+    data = bytearray(frame_size(width, height, fmt))
+    layout = plane_layout(width, height, fmt)
+    offset, stride, rows = layout[0]
+    data[offset : offset + stride * rows] = bytes([y]) * (stride * rows)
+    if fmt == "NV12":
+        offset, stride, rows = layout[1]
+        data[offset : offset + stride * rows] = bytes([u, v]) * (stride * rows // 2)
+    else:
+        for (offset, stride, rows), value in zip(layout[1:], (u, v)):
+            data[offset : offset + stride * rows] = bytes([value]) * (stride * rows)
+    path = os.path.join(directory, f"{fmt}.ring")
+    FrameRingWriter(path, len(data)).write(bytes(data), width, height, fmt)
+    return FrameRingReader(path).latest()
+
+
+def test_planar_frames_are_converted_to_rgba():
+    with tempfile.TemporaryDirectory() as directory:
+        # BT.601 limited-range red, and white
+        for fmt, (y, u, v), rgb in (
+            ("I420", (81, 90, 240), (255, 0, 0)),
+            ("NV12", (235, 128, 128), (255, 255, 255)),
+        ):
+            frame = yuv_frame(directory, fmt, 10, 6, y, u, v)
+            out = CellScaler(5, 3).scale_yuv(frame.planes(), fmt, 10, 6)
+            assert np.abs(out[..., :3].astype(int) - rgb).max() <= 2, out[0, 0]
+            assert (out[..., 3] == 255).all()
+
+
+def test_compositor_places_cells():
+    with tempfile.TemporaryDirectory() as directory:
+        paths, writers = [], []
+        for n in range(4):
+            path = os.path.join(directory, f"apphost{n + 1}", "frames.ring")
+            writers.append(FrameRingWriter(path, frame_size(8, 8)))
+            paths.append(path)
+
+        compositor = Compositor(paths, 2, 2, 8, 8)
+        compositor.start()
+        try:
+            for n, writer in enumerate(writers):
+                writer.write(bytes([n * 10 + 10]) * frame_size(8, 8), 8, 8)
+            wait_for(lambda: all(source.frames for source in compositor.sources))
+            canvas = compositor.compose()
+            assert canvas[0, 0, 0] == 10
+            assert canvas[0, 4, 0] == 20
+            assert canvas[4, 0, 0] == 30
+            assert canvas[7, 7, 0] == 40
+        finally:
+            compositor.stop()
+
+
+def test_compose_only_refreshes_changed_cells():
+    with tempfile.TemporaryDirectory() as directory:
+        paths, writers = [], []
+        for n in range(2):
+            path = os.path.join(directory, f"apphost{n + 1}", "frames.ring")
+            writers.append(FrameRingWriter(path, frame_size(4, 4)))
+            paths.append(path)
+
+        compositor = Compositor(paths, 2, 1, 8, 4)
+        compositor.start()
+        try:
+            for writer in writers:
+                writer.write(bytes([10]) * 64, 4, 4)
+            wait_for(lambda: all(source.version for source in compositor.sources))
+            compositor.compose()
+            assert compositor.damage == [(0, 0, 4, 4), (4, 0, 4, 4)]
+            compositor.compose()
+            assert compositor.damage == []
+
+            # Republishing an identical frame is not a change
+            writers[1].write(bytes([10]) * 64, 4, 4)
+            wait_for(lambda: compositor.sources[1].seq == 2)
+            compositor.compose()
+            assert compositor.damage == []
+            assert compositor.sources[1].unchanged == 1
+
+            writers[1].write(bytes([20]) * 64, 4, 4)
+            wait_for(lambda: compositor.sources[1].version == 2)
+            canvas = compositor.compose()
+            assert compositor.damage == [(4, 0, 4, 4)]
+            assert canvas[0, 4, 0] == 20
+            assert compositor.cells_composited == 3
+        finally:
+            compositor.stop()
+
+
+def test_ingest_follows_replaced_ring():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "apphost1", "frames.ring")
+        writer = FrameRingWriter(path, frame_size(4, 4))
+        compositor = Compositor([path], 1, 1, 4, 4)
+        compositor.start()
+        try:
+            source = compositor.sources[0]
+            for _ in range(3):
+                writer.write(bytes([50]) * 64, 4, 4)
+            wait_for(lambda: source.seq == 3)
+            first = source.reader
+
+            # A restarted apphost recreates the ring and starts again at seq 1
+            writer = FrameRingWriter(path, frame_size(4, 4))
+            writer.write(bytes([60]) * 64, 4, 4)
+            wait_for(lambda: compositor.compose()[0, 0, 0] == 60)
+            assert first.mm.closed, "the replaced ring is still mapped"
+            second = source.reader
+
+            # A removed ring is unmapped too, while the source waits for it
+            os.unlink(path)
+            wait_for(lambda: source.reader is None)
+            assert second.mm.closed
+        finally:
+            compositor.stop()
+
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        started = time.monotonic()
+        try:
+            test()
+            print(f"✅ {test.__name__} ({(time.monotonic() - started) * 1000:.1f} ms)")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
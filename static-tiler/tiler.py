@@ -0,0 +1,591 @@
+"""
+CPU tiler: composites apphost frame rings into one wall with NumPy.
+
+A GPU-less alternative to the DeepStream pipeline in run_pipeline.sh
+(TILER_BACKEND=cpu). One ingest thread per source follows that apphost's
+shared-memory frame ring and downscales each new frame into a cell-sized
+buffer; the compositor blits the cells into a preallocated canvas at the
+output frame rate and hands it to a software encoder or a raw sink.
+
+Apphosts on other nodes send encoded RTP instead (SOURCE_ENCODER=h264 or
+jpeg); each stream is decoded into a local ring at cell size first.
+"""
+
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+# framering.py is shared with the apphost and mounted from ./apphost
+sys.path.append("/opt/apphost")
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "apphost")
+)
+
+from capture import FramePump, enlarge_pipe
+from framering import PLANAR_FORMATS, FrameRingReader
+
+logger = logging.getLogger(__name__)
+
+# Byte order of each packed source format, as indices into RGBA
+CHANNEL_ORDER = {
+    "RGBA": (0, 1, 2, 3),
+    "RGBx": (0, 1, 2, 3),
+    "BGRA": (2, 1, 0, 3),
+    "BGRx": (2, 1, 0, 3),
+}
+
+# Y'CbCr -> RGB coefficients (Kr, Kb). Like GStreamer's default colorimetry,
+# frames taller than 576 lines are BT.709 and smaller ones BT.601.
+LUMA_COEFFICIENTS = {"bt709": (0.2126, 0.0722), "bt601": (0.299, 0.114)}
+
+
+class CellScaler:
+    """Resamples packed 4-channel frames into a fixed RGBA cell
+
+    All index arithmetic is precomputed per source geometry, so scaling a
+    frame is two vectorized gathers (rows, then columns and channel order
+    in one pass) into preallocated buffers. "box" averages 2x2 blocks
+    first when the source is at least twice the cell size, which keeps
+    text legible but costs several times as much as "nearest".
+
+    Planar I420/NV12 sources are sampled per plane and converted to RGBA
+    only at cell resolution (always nearest).
+    """
+
+    def __init__(self, cell_width, cell_height, method="nearest"):
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.method = method
+        self.out = np.zeros((cell_height, cell_width, 4), dtype=np.uint8)
+        self._geometry = None
+
+    def _prepare(self, width, height, fmt):
+        self._geometry = (width, height, fmt)
+        self.box = (
+            self.method == "box"
+            and width >= 2 * self.cell_width
+            and height >= 2 * self.cell_height
+        )
+        if self.box:
+            width, height = width // 2, height // 2
+            self.sums = np.zeros((height, width, 4), dtype=np.uint16)
+            self.half = np.zeros((height, width, 4), dtype=np.uint8)
+
+        rows = (np.arange(self.cell_height) * height) // self.cell_height
+        cols = (np.arange(self.cell_width) * width) // self.cell_width
+        channels = np.array(CHANNEL_ORDER[fmt])
+        self.rows = rows.astype(np.intp)
+        # Source byte offset within a row for every output byte of a row
+        self.row_bytes = (cols[:, None] * 4 + channels[None, :]).ravel().astype(np.intp)
+        self.picked = np.zeros((self.cell_height, width * 4), dtype=np.uint8)
+
+    def _prepare_yuv(self, width, height, fmt):
+        self._geometry = (width, height, fmt)
+        self.rows = (np.arange(self.cell_height) * height) // self.cell_height
+        self.cols = (np.arange(self.cell_width) * width) // self.cell_width
+        self.chroma_rows = self.rows // 2
+        self.chroma_cols = self.cols // 2
+
+        # Fixed-point coefficients with 6 fractional bits; every term of
+        # the conversion then fits int16 arithmetic
+        kr, kb = LUMA_COEFFICIENTS["bt709" if height > 576 else "bt601"]
+        kg = 1 - kr - kb
+        # Limited range: Y' in 16..235, Cb/Cr in 16..240
+        luma_scale, chroma_scale = 255 / 219 * 64, 255 / 224 * 64
+        self.luma_weight = round(luma_scale)
+        self.cr_weights = (
+            round(2 * (1 - kr) * chroma_scale),
+            round(-2 * kr * (1 - kr) / kg * chroma_scale),
+            0,
+        )
+        self.cb_weights = (
+            0,
+            round(-2 * kb * (1 - kb) / kg * chroma_scale),
+            round(2 * (1 - kb) * chroma_scale),
+        )
+
+        shape = (self.cell_height, self.cell_width)
+        chroma_width = (width + 1) // 2
+        self.luma_picked = np.zeros((self.cell_height, width), dtype=np.uint8)
+        self.luma = np.zeros(shape, dtype=np.uint8)
+        if fmt == "NV12":
+            self.chroma_picked = np.zeros(
+                (self.cell_height, chroma_width, 2), dtype=np.uint8
+            )
+            self.chroma = np.zeros(shape + (2,), dtype=np.uint8)
+            self.cb, self.cr = self.chroma[..., 0], self.chroma[..., 1]
+        else:
+            self.chroma_picked = np.zeros(
+                (self.cell_height, chroma_width), dtype=np.uint8
+            )
+            self.cb = np.zeros(shape, dtype=np.uint8)
+            self.cr = np.zeros(shape, dtype=np.uint8)
+        self.luma_term = np.zeros(shape, dtype=np.int16)
+        self.cb_term = np.zeros(shape, dtype=np.int16)
+        self.cr_term = np.zeros(shape, dtype=np.int16)
+        self.channel = np.zeros(shape, dtype=np.int16)
+        self.term = np.zeros(shape, dtype=np.int16)
+
+    def _pick(self, plane, rows, cols, picked, out):
+        np.take(plane, rows, axis=0, out=picked, mode="clip")
+        np.take(picked, cols, axis=1, out=out, mode="clip")
+
+    def scale_yuv(self, planes, fmt, width, height, out=None):
+        """Scale and convert I420/NV12 planes (Frame.planes()) into RGBA"""
+        if self._geometry != (width, height, fmt):
+            self._prepare_yuv(width, height, fmt)
+        out = self.out if out is None else out
+
+        self._pick(planes[0], self.rows, self.cols, self.luma_picked, self.luma)
+        if fmt == "NV12":
+            self._pick(
+                planes[1],
+                self.chroma_rows,
+                self.chroma_cols,
+                self.chroma_picked,
+                self.chroma,
+            )
+        else:
+            for plane, target in ((planes[1], self.cb), (planes[2], self.cr)):
+                self._pick(
+                    plane,
+                    self.chroma_rows,
+                    self.chroma_cols,
+                    self.chroma_picked,
+                    target,
+                )
+
+        np.subtract(self.luma, 16, out=self.luma_term, dtype=np.int16)
+        self.luma_term *= self.luma_weight
+        self.luma_term += 32  # rounds the >> 6 below
+        np.subtract(self.cb, 128, out=self.cb_term, dtype=np.int16)
+        np.subtract(self.cr, 128, out=self.cr_term, dtype=np.int16)
+
+        for index in range(3):
+            np.copyto(self.channel, self.luma_term)
+            for weight, term in (
+                (self.cr_weights[index], self.cr_term),
+                (self.cb_weights[index], self.cb_term),
+            ):
+                if weight:
+                    np.multiply(term, weight, out=self.term)
+                    self.channel += self.term
+            self.channel >>= 6
+            np.clip(self.channel, 0, 255, out=self.channel)
+            out[..., index] = self.channel
+        out[..., 3] = 255
+        return out
+
+    def scale(self, frame, fmt="RGBA", out=None):
+        """Scale a (height, width, 4) uint8 array into out (default self.out)"""
+        height, width = frame.shape[:2]
+        if self._geometry != (width, height, fmt):
+            self._prepare(width, height, fmt)
+
+        if self.box:
+            height, width = height // 2 * 2, width // 2 * 2
+            sums = self.sums
+            np.add(
+                frame[0:height:2, 0:width:2],
+                frame[1:height:2, 0:width:2],
+                out=sums,
+                dtype=np.uint16,
+            )
+            sums += frame[0:height:2, 1:width:2]
+            sums += frame[1:height:2, 1:width:2]
+            sums >>= 2
+            np.copyto(self.half, sums, casting="unsafe")
+            frame = self.half
+
+        rows = frame.reshape(frame.shape[0], -1)
+        np.take(rows, self.rows, axis=0, out=self.picked, mode="clip")
+        np.take(
+            self.picked,
+            self.row_bytes,
+            axis=1,
+            out=(self.out if out is None else out).reshape(self.cell_height, -1),
+            mode="clip",
+        )
+        return self.out if out is None else out
+
+
+class SourceIngest(threading.Thread):
+    """Follows one apphost frame ring and keeps its newest frame, scaled
+
+    Scaling happens on this thread into a back buffer which is swapped in
+    only if the ring slot was not overwritten meanwhile, so the compositor
+    never sees a torn cell. version only advances when the scaled cell
+    actually differs, so a producer republishing an identical page costs
+    the compositor nothing.
+    """
+
+    def __init__(self, index, ring_path, cell_width, cell_height, method="nearest"):
+        super().__init__(name=f"ingest-{index}", daemon=True)
+        self.index = index
+        self.ring_path = ring_path
+        self.scaler = CellScaler(cell_width, cell_height, method)
+        self.buffers = [
+            np.zeros((cell_height, cell_width, 4), dtype=np.uint8) for _ in range(2)
+        ]
+        self.lock = threading.Lock()
+        self.front = 0
+        self.seq = 0
+        self.version = 0
+        self.frames = 0
+        self.unchanged = 0
+        self.running = True
+        self.reader = None
+        self.last_seq = 0
+
+    def _open(self):
+        """(Re)attach to the ring; False if it does not exist yet
+
+        A replaced ring's mapping is unmapped before the new one is tried,
+        so a producer that restarts or goes away does not leave it behind.
+        """
+        if self.reader is not None:
+            if not self.reader.replaced():
+                return True
+            self.reader.close()
+            self.reader = None
+        try:
+            self.reader = FrameRingReader(self.ring_path)
+            self.last_seq = 0
+            logger.info(f"Source {self.index} attached to {self.ring_path}")
+            return True
+        except (FileNotFoundError, ValueError):
+            return False
+
+    def run(self):
+        while self.running:
+            if not self._open():
+                time.sleep(1)
+                continue
+            self._ingest()
+        if self.reader is not None:
+            self.reader.close()
+
+    def _ingest(self):
+        """Scale the ring's next frame into the back buffer and swap it in
+
+        The frame views the ring's mapping, so it must not outlive this
+        call: _open() unmaps a replaced ring.
+        """
+        frame = self.reader.wait_for_frame(after_seq=self.last_seq, timeout=0.5)
+        if frame is None:
+            return
+        if frame.format not in CHANNEL_ORDER and frame.format not in PLANAR_FORMATS:
+            logger.error(f"Source {self.index}: unsupported format {frame.format}")
+            time.sleep(1)
+            return
+        self.last_seq = frame.seq
+
+        back = 1 - self.front
+        if frame.format in PLANAR_FORMATS:
+            self.scaler.scale_yuv(
+                frame.planes(),
+                frame.format,
+                frame.width,
+                frame.height,
+                out=self.buffers[back],
+            )
+        else:
+            self.scaler.scale(frame.array(), frame.format, out=self.buffers[back])
+        if not frame.is_valid():
+            return
+        self.frames += 1
+        if self.version and np.array_equal(
+            self.buffers[back], self.buffers[self.front]
+        ):
+            self.seq = frame.seq
+            self.unchanged += 1
+            return
+        with self.lock:
+            self.front = back
+            self.seq = frame.seq
+            self.version += 1
+
+    def blit(self, target):
+        """Copy the newest scaled frame into target; returns its version"""
+        with self.lock:
+            np.copyto(target, self.buffers[self.front])
+            return self.version
+
+    def stop(self):
+        self.running = False
+
+
+class RtpDecoder:
+    """Decodes one apphost's RTP video stream into a local frame ring
+
+    gst-launch depayloads, decodes and scales straight to the cell size,
+    and a FramePump publishes the I420 result into a ring that the ingest
+    thread follows like any apphost ring.
+    """
+
+    CAPS = {
+        "h264": "application/x-rtp,media=video,encoding-name=H264,"
+        "clock-rate=90000,payload=96",
+        "jpeg": "application/x-rtp,media=video,encoding-name=JPEG,"
+        "clock-rate=90000,payload=26",
+    }
+    DECODE = {
+        "h264": ["rtph264depay", "!", "h264parse", "!", "avdec_h264"],
+        "jpeg": ["rtpjpegdepay", "!", "jpegdec"],
+    }
+
+    def __init__(self, encoder, port, ring_path, width, height, latency_ms=50):
+        if encoder not in self.CAPS:
+            raise ValueError(f"Unsupported source encoder: {encoder}")
+        self.encoder = encoder
+        self.port = port
+        self.ring_path = ring_path
+        self.width = width
+        self.height = height
+        self.latency_ms = latency_ms
+        self.process = None
+        self.pump = None
+
+    def start(self):
+        read_fd, write_fd = os.pipe()
+        enlarge_pipe(write_fd)
+        pipeline_cmd = [
+            "gst-launch-1.0",
+            "udpsrc",
+            f"port={self.port}",
+            f"caps={self.CAPS[self.encoder]}",
+            "!",
+            "rtpjitterbuffer",
+            f"latency={self.latency_ms}",
+            "!",
+            *self.DECODE[self.encoder],
+            "!",
+            "videoconvert",
+            "!",
+            "videoscale",
+            "!",
+            f"video/x-raw,format=I420,width={self.width},height={self.height}",
+            "!",
+            "fdsink",
+            f"fd={write_fd}",
+            "sync=false",
+        ]
+        logger.info(f"Decoder pipeline: {' '.join(pipeline_cmd)}")
+        self.process = subprocess.Popen(pipeline_cmd, pass_fds=(write_fd,))
+        os.close(write_fd)
+        self.pump = FramePump(read_fd, self.ring_path, self.width, self.height, "I420")
+        self.pump.start()
+
+    def stop(self):
+        if self.process:
+            self.process.terminate()
+            self.process.wait()
+        if self.pump:
+            self.pump.stop()
+
+
+class Compositor:
+    """Grid of ingest threads composited into one preallocated RGBA canvas
+
+    Only cells whose source produced a new version since the last compose
+    are copied, so compositing cost follows the amount of change rather
+    than the number of inputs. The (x, y, width, height) rectangles
+    refreshed by the last compose are left in damage for the sink.
+    """
+
+    def __init__(self, ring_paths, cols, rows, width, height, method="nearest"):
+        self.width = width
+        self.height = height
+        self.canvas = np.zeros((height, width, 4), dtype=np.uint8)
+        self.canvas[..., 3] = 255
+        cell_width, cell_height = width // cols, height // rows
+
+        self.sources = []
+        self.cells = []
+        self.rects = []
+        for index, ring_path in enumerate(ring_paths[: cols * rows]):
+            x = (index % cols) * cell_width
+            y = (index // cols) * cell_height
+            self.sources.append(
+                SourceIngest(index, ring_path, cell_width, cell_height, method)
+            )
+            self.cells.append(self.canvas[y : y + cell_height, x : x + cell_width])
+            self.rects.append((x, y, cell_width, cell_height))
+        self.versions = [0] * len(self.sources)
+        self.damage = []
+        self.cells_composited = 0
+
+    def start(self):
+        for source in self.sources:
+            source.start()
+
+    def stop(self):
+        for source in self.sources:
+            source.stop()
+
+    def compose(self):
+        """Refresh the cells whose source changed; returns the canvas"""
+        damage = []
+        for index, source in enumerate(self.sources):
+            if source.version == self.versions[index]:
+                continue
+            self.versions[index] = source.blit(self.cells[index])
+            damage.append(self.rects[index])
+        self.damage = damage
+        self.cells_composited += len(damage)
+        return self.canvas
+
+    def invalidate(self):
+        """Force every cell to be recomposited on the next compose"""
+        self.versions = [0] * len(self.sources)
+
+
+class RawSink:
+    """Writes raw RGBA canvases to a file, FIFO or stdout"""
+
+    def __init__(self, path):
+        self.stream = (
+            sys.stdout.buffer if path == "-" else open(path, "wb", buffering=0)
+        )
+
+    def write(self, canvas, damage=None):
+        self.stream.write(canvas.data)
+
+    def close(self):
+        if self.stream is not sys.stdout.buffer:
+            self.stream.close()
+
+
+class EncoderSink:
+    """Feeds canvases to a software H.264 encoder serving MPEG-TS over TCP
+
+    Same output as the DeepStream pipeline: tcpserversink on port 6000.
+    x264enc takes no damage hints, but unchanged regions are still cheap:
+    they encode as skip macroblocks in P-frames.
+    """
+
+    def __init__(self, width, height, fps, port=6000, bitrate_kbps=8000):
+        pipeline_cmd = [
+            "gst-launch-1.0",
+            "-e",
+            "fdsrc",
+            "fd=0",
+            "!",
+            "rawvideoparse",
+            "format=rgba",
+            f"width={width}",
+            f"height={height}",
+            f"framerate={fps}/1",
+            "!",
+            "videoconvert",
+            "!",
+            "x264enc",
+            "tune=zerolatency",
+            "speed-preset=ultrafast",
+            f"bitrate={bitrate_kbps}",
+            f"key-int-max={fps}",
+            "!",
+            "h264parse",
+            "config-interval=-1",
+            "!",
+            "mpegtsmux",
+            "!",
+            "tcpserversink",
+            "host=0.0.0.0",
+            f"port={port}",
+            "sync=false",
+        ]
+        logger.info(f"Encoder pipeline: {' '.join(pipeline_cmd)}")
+        self.process = subprocess.Popen(pipeline_cmd, stdin=subprocess.PIPE)
+
+    def write(self, canvas, damage=None):
+        self.process.stdin.write(canvas.data)
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+
+def serve():
+    """Run the CPU tiler from the same environment as run_pipeline.sh"""
+    num_inputs = int(os.environ.get("NUM_INPUTS", "16"))
+    cols = int(os.environ.get("GRID_COLS", "4"))
+    rows = int(os.environ.get("GRID_ROWS", "4"))
+    width = int(os.environ.get("OUTPUT_WIDTH", "3840"))
+    height = int(os.environ.get("OUTPUT_HEIGHT", "2160"))
+    fps = int(os.environ.get("OUTPUT_FPS", "30"))
+    pattern = os.environ.get("FRAME_RING_PATTERN", "/dev/shm/apphost{n}/frames.ring")
+    method = os.environ.get("TILER_SCALER", "nearest")
+
+    encoder = os.environ.get("SOURCE_ENCODER", "none")
+
+    decoders = []
+    if encoder == "none":
+        ring_paths = [pattern.format(n=n) for n in range(1, num_inputs + 1)]
+    else:
+        # Apphost n streams RTP to port 2000 + n, like the raw UDP transport
+        ring_dir = os.environ.get("TILER_RING_DIR", "/dev/shm/tiler")
+        latency_ms = int(os.environ.get("SOURCE_LATENCY_MS", "50"))
+        ring_paths = []
+        for n in range(1, num_inputs + 1):
+            ring_path = os.path.join(ring_dir, f"source{n}.ring")
+            decoders.append(
+                RtpDecoder(
+                    encoder,
+                    2000 + n,
+                    ring_path,
+                    width // cols,
+                    height // rows,
+                    latency_ms,
+                )
+            )
+            ring_paths.append(ring_path)
+    compositor = Compositor(ring_paths, cols, rows, width, height, method)
+
+    raw_output = os.environ.get("TILER_RAW_OUTPUT")
+    if raw_output:
+        sink = RawSink(raw_output)
+    else:
+        sink = EncoderSink(width, height, fps, int(os.environ.get("PORT", "6000")))
+
+    logger.info(
+        f"CPU tiler: {num_inputs} {encoder} inputs in {cols}x{rows}, "
+        f"{width}x{height}@{fps}"
+    )
+    for decoder in decoders:
+        decoder.start()
+    compositor.start()
+
+    interval = 1 / fps
+    next_frame = time.monotonic()
+    try:
+        while True:
+            canvas = compositor.compose()
+            sink.write(canvas, compositor.damage)
+            next_frame += interval
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Running behind: drop the backlog instead of bursting
+                next_frame = time.monotonic()
+    except (KeyboardInterrupt, BrokenPipeError):
+        logger.info("Shutting down CPU tiler...")
+    finally:
+        compositor.stop()
+        for decoder in decoders:
+            decoder.stop()
+        sink.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    serve()